@@ -0,0 +1,323 @@
+"""
+Headless batch analysis of DATA/CF1 pairs.
+
+Runs read -> curve -> impact -> braking distance for every DATA file on a process pool
+and writes one CSV/JSON row per recording. Does not import Qt or matplotlib.
+Parsed DATA files are kept in binary caches (see recording_cache), so later runs skip parsing,
+and results in a result store (see result_store), so unchanged recordings are not analyzed again.
+
+Usage:
+    python batch.py recordings/ "archive/**/*.data" --cf1 unit.CF1 -o results.csv
+    python batch.py recordings/ --cf1-map units.csv -o results.jsonl
+    python batch.py archive/ -r --cf1 unit.CF1 --cache-dir cache/ -o results.csv
+    python batch.py recordings/ --cf1 unit.CF1 --results-db results.sqlite -o results.csv
+
+Columns:
+    data_file, cf1_file     DATA file and the CF1 file used for it
+    curve_impact_index      Curve index of the impact point as plotted (the GUI shows it plus 1 as
+                            "Data #"); two before the data13 position calculate_impact_points reports
+    impact_time             Time of that point on the curve (s)
+    non_zero_count          Non-zero time differences of the filtered data
+    brake_pulses            non_zero_count minus curve_impact_index
+    braking_distance        brake_pulses times distance_per_pulse (cm)
+    distance_per_pulse      From the CF1 parameters (cm)
+    error                   Why the recording could not be analyzed (empty if it was)
+
+Exit status: 0 if every recording was analyzed, 1 if any failed, 2 if no DATA files were found.
+"""
+import argparse
+import csv
+import fnmatch
+import glob
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import data_processor
+from data_processor import DataProcessor, KEY_PARAMETERS
+from recording import Recording
+from recording_cache import load_recording
+from result_store import DEFAULT_PATH as DEFAULT_RESULTS_DB, ResultStore
+
+logger = logging.getLogger(__name__)
+
+# Output columns, in order
+FIELDS = (
+    'data_file', 'cf1_file', 'curve_impact_index', 'impact_time', 'non_zero_count',
+    'brake_pulses', 'braking_distance', 'distance_per_pulse', 'error'
+)
+
+DEFAULT_THRESHOLD = 2.0
+
+# Result stores of this process by database path
+_result_stores = {}
+
+
+def find_data_files(inputs, recursive=False):
+    """
+    Expand directories and glob patterns into a sorted list of DATA files
+    Args:
+        inputs: Directories, glob patterns or file paths
+        recursive: Also search subdirectories of the given directories
+    """
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            matches = glob.glob(pattern, recursive=recursive)
+        else:
+            matches = glob.glob(item, recursive=True) or [item]
+        for path in matches:
+            if os.path.isfile(path) and path.lower().endswith('.data'):
+                found.add(os.path.abspath(path))
+    return sorted(found)
+
+
+def load_cf1_map(map_file):
+    """
+    Read a DATA -> CF1 mapping from a CSV file (two columns: data pattern, CF1 path)
+    or a JSON object. Patterns are matched against the DATA file name or path with
+    fnmatch; relative CF1 paths are relative to the mapping file.
+    Returns: List of (pattern, cf1_path) in file order
+    """
+    base = os.path.dirname(os.path.abspath(map_file))
+    if map_file.lower().endswith('.json'):
+        with open(map_file, encoding='utf-8') as f:
+            pairs = list(json.load(f).items())
+    else:
+        with open(map_file, newline='', encoding='utf-8') as f:
+            pairs = [(row[0].strip(), row[1].strip()) for row in csv.reader(f)
+                     if len(row) >= 2 and row[0].strip() and not row[0].startswith('#')]
+    return [(pattern, os.path.join(base, cf1)) for pattern, cf1 in pairs]
+
+
+def resolve_cf1(data_file, cf1_map=None, default_cf1=None):
+    """
+    Find the CF1 file of a DATA file: first matching mapping entry, then the default CF1,
+    then the only CF1 file in the DATA file's directory. Returns None if none applies.
+    """
+    name = os.path.basename(data_file)
+    stem = os.path.splitext(name)[0]
+    for pattern, cf1 in cf1_map or ():
+        if pattern in (name, stem) or fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(data_file, pattern):
+            return cf1
+    if default_cf1:
+        return default_cf1
+    siblings = [path for path in glob.glob(os.path.join(os.path.dirname(data_file), '*'))
+                if path.lower().endswith('.cf1')]
+    return siblings[0] if len(siblings) == 1 else None
+
+
+def analyze_recording(data_file, cf1_file, threshold=DEFAULT_THRESHOLD, use_cache=True, cache_dir=None,
+                      results_db=None, with_curve=False, curve_dtype=np.float64):
+    """
+    Run the full analysis of one recording
+    Args:
+        use_cache, cache_dir: Binary cache of the parsed DATA file, see recording_cache.load_recording
+        results_db: Result store database; stored results are reused and new ones stored (None: no store)
+        with_curve: Also return the brake curve
+        curve_dtype: np.float64 or np.float32 for the returned curve (the result row is always float64)
+    Returns: Result row (see FIELDS); 'error' is set when the recording could not be analyzed.
+             With with_curve, a tuple (row, curve_data) where curve_data is None if no curve was generated.
+    """
+    row = dict.fromkeys(FIELDS)
+    row.update(data_file=data_file, cf1_file=cf1_file)
+    curve_data = None
+    try:
+        curve_data = _analyze_into(row, data_file, cf1_file, threshold, use_cache, cache_dir, results_db,
+                                   with_curve, curve_dtype)
+    except Exception as e:
+        row['error'] = str(e)
+    return (row, curve_data) if with_curve else row
+
+
+def _result_store(results_db):
+    if results_db is None:
+        return None
+    if results_db not in _result_stores:
+        _result_stores[results_db] = ResultStore(results_db)
+    return _result_stores[results_db]
+
+
+def _fill_row(row, distance_per_pulse, non_zero_count, braking):
+    """Fill in the result columns from a braking result (None if no impact was detected)"""
+    row['distance_per_pulse'] = distance_per_pulse
+    row['non_zero_count'] = int(non_zero_count)
+    if braking is None:
+        row['error'] = "No impact point detected"
+        return
+    row.update(
+        curve_impact_index=int(braking['index']),
+        impact_time=float(braking['impact_time']),
+        brake_pulses=int(braking['braking_pulses']),
+        braking_distance=float(braking['braking_distance'])
+    )
+
+
+def _analyze_into(row, data_file, cf1_file, threshold, use_cache, cache_dir, results_db, with_curve, curve_dtype):
+    """Fill in the result row. Returns the curve data when with_curve is set and it has been generated"""
+    if cf1_file is None:
+        row['error'] = "No CF1 file for this recording"
+        return None
+
+    store = _result_store(results_db)
+    content_hash = store.content_hash(data_file) if store else None
+    if content_hash is not None:
+        cf1_params = DataProcessor.read_cf1_file(cf1_file, keys=KEY_PARAMETERS)
+        stored = store.get(content_hash, cf1_params, threshold) if cf1_params is not None else None
+        if stored is not None and stored['analyzed'] and (stored['curve'] is not None or not with_curve):
+            _fill_row(row, stored['distance_per_pulse'], stored['non_zero_count'], stored['braking'])
+            if not with_curve:
+                return None
+            return {axis: values.astype(curve_dtype) for axis, values in stored['curve'].items()}
+
+    data = load_recording(data_file, cache_dir, use_cache)
+    if data is None or len(data) == 0:
+        row['error'] = "No data read from DATA file"
+        return None
+    cf1_params = DataProcessor.read_cf1_file(cf1_file, keys=KEY_PARAMETERS)
+    if cf1_params is None:
+        row['error'] = "Could not read CF1 file"
+        return None
+
+    # Compact copy of the data; the curve is only built when it is returned
+    recording = Recording(data, cf1_params, data_file, curve_dtype)
+    del data
+    distance_per_pulse = recording.distance_per_pulse()
+    if distance_per_pulse <= 0:
+        row['distance_per_pulse'] = distance_per_pulse
+        row['error'] = "No valid curve data generated"
+        return None
+    curve_data = recording.curve() if with_curve else None
+
+    impact_data = recording.impact(threshold)
+    non_zero_count = np.count_nonzero(recording.data)
+    braking = recording.braking(impact_data) if impact_data else None
+    _fill_row(row, distance_per_pulse, non_zero_count, braking)
+    if content_hash is not None:
+        # Only float64 curves are stored, as the GUI draws them
+        stored_curve = curve_data if curve_data is not None and recording.curve_dtype == np.float64 else None
+        store.put(content_hash, cf1_params, threshold, impact_data, braking, non_zero_count,
+                  distance_per_pulse, stored_curve)
+    return curve_data
+
+
+def _analyze_task(task):
+    return analyze_recording(*task)
+
+
+def _analyze_curve_task(task):
+    # Curves for display: float32 halves their memory and the transfer from the worker
+    return analyze_recording(*task, with_curve=True, curve_dtype=np.float32)
+
+
+def _init_worker():
+    data_processor.set_quiet()
+
+
+class ResultWriter:
+    """Streams result rows to a CSV, JSON array or JSON lines file"""
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        self.count = 0
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(stream, fieldnames=FIELDS)
+            self.writer.writeheader()
+        elif fmt == 'json':
+            stream.write('[')
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.writer.writerow(row)
+        elif self.fmt == 'json':
+            self.stream.write((',\n ' if self.count else '\n ') + json.dumps(row))
+        else:
+            self.stream.write(json.dumps(row) + '\n')
+        self.count += 1
+
+    def close(self):
+        if self.fmt == 'json':
+            self.stream.write('\n]\n')
+        self.stream.flush()
+
+
+def run_batch(data_files, cf1_map=None, default_cf1=None, threshold=DEFAULT_THRESHOLD, workers=None,
+              use_cache=True, cache_dir=None, results_db=None):
+    """
+    Analyze recordings on a process pool
+    Yields: Result rows in the order of data_files
+    """
+    tasks = [(path, resolve_cf1(path, cf1_map, default_cf1), threshold, use_cache, cache_dir, results_db)
+             for path in data_files]
+    if workers == 1:
+        _init_worker()
+        yield from map(_analyze_task, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 8))
+        yield from executor.map(_analyze_task, tasks, chunksize=chunksize)
+
+
+def _output_format(path, fmt):
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path or '')[1].lower()
+    return {'.json': 'json', '.jsonl': 'jsonl'}.get(ext, 'csv')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze escalator brake recordings without the GUI")
+    parser.add_argument('inputs', nargs='+', help="DATA files, directories or glob patterns")
+    parser.add_argument('--cf1', help="CF1 file used for every recording without a mapping entry")
+    parser.add_argument('--cf1-map', help="CSV or JSON mapping of DATA name patterns to CF1 files")
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Impact threshold (default: %(default)s)")
+    parser.add_argument('-o', '--output', help="Output file (default: standard output)")
+    parser.add_argument('--format', choices=('csv', 'json', 'jsonl'),
+                        help="Output format (default: from the output file extension, else csv)")
+    parser.add_argument('-j', '--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Search directories recursively")
+    parser.add_argument('--cache-dir', help="Directory for the binary DATA caches (default: next to each DATA file)")
+    parser.add_argument('--no-cache', action='store_true', help="Always parse the DATA files; do not read or write caches")
+    parser.add_argument('--results-db', default=DEFAULT_RESULTS_DB,
+                        help="Result store database (default: %(default)s)")
+    parser.add_argument('--no-results', action='store_true',
+                        help="Analyze every recording again; do not read or write the result store")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+
+    data_files = find_data_files(args.inputs, args.recursive)
+    if not data_files:
+        logger.error("No DATA files found")
+        return 2
+    cf1_map = load_cf1_map(args.cf1_map) if args.cf1_map else None
+
+    stream = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    failed = 0
+    try:
+        writer = ResultWriter(stream, _output_format(args.output, args.format))
+        for row in run_batch(data_files, cf1_map, args.cf1, args.threshold, args.workers,
+                             not args.no_cache, args.cache_dir, None if args.no_results else args.results_db):
+            writer.write(row)
+            if row['error']:
+                failed += 1
+                logger.warning("%s: %s", row['data_file'], row['error'])
+        writer.close()
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    logger.warning("%d recordings analyzed, %d failed", len(data_files), failed)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
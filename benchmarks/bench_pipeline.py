@@ -0,0 +1,349 @@
+"""
+Benchmark and equivalence suite for the DataProcessor pipeline.
+
+Generates synthetic UTF-16 DATA and CF1 files from hundreds to millions of pulses and times
+every stage on its own and end to end, for the optimized ('vectorized') engines and the
+original ('reference') loops. The synthetic brake profile runs at constant speed, with a
+jitter that repeats every 8 pulses, until the impact onset; the pulse times then grow
+geometrically. The jitter cancels out of every b-value, so rule 2 detects the impact exactly
+IMPACT_OFFSET pulses after the onset.
+
+The equivalence checks compare every optimized path bit for bit with the reference
+implementation: on the synthetic files and on the bundled 20231107022804.data.
+
+Usage:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --sizes 1000 100000 2000000 --repeat 5 --json baseline.json
+    python benchmarks/bench_pipeline.py --baseline baseline.json
+    python benchmarks/bench_pipeline.py --check-only
+    python benchmarks/bench_pipeline.py --jit off --json numpy.json   (compare with --jit on)
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_processor  # noqa: E402
+from data_processor import (DataProcessor, ImpactAnalysis, StreamingImpactDetector,  # noqa: E402
+                            KEY_PARAMETERS)
+from follow import DataFollower  # noqa: E402
+from pipeline import AnalysisPipeline  # noqa: E402
+from recording_cache import load_recording  # noqa: E402
+
+BUNDLED_DATA = os.path.join(ROOT, '20231107022804.data')
+BUNDLED_CF1 = os.path.join(ROOT, '976s_109.CF1')
+
+DEFAULT_SIZES = (300, 3000, 30000, 300000, 3000000)
+THRESHOLDS = (1.0, 2.0, 3.0)
+
+# Synthetic brake profile
+NOMINAL_TICKS = 300                          # Pulse time at nominal speed (0.0125 ms units)
+JITTER = np.array([0, 1, 2, 1, 0, -1, -2, -1])  # Repeats every 8 pulses, so b = 0 before the onset
+BRAKE_PULSES = 30                            # Pulses from the impact onset to standstill
+IMPACT_OFFSET = 4                            # Detected impact index minus onset
+CF1_PARAMETERS = {'P0251': 670, 'P0360': 1500, 'P0361': 4, 'P0544': 5017}
+
+
+def brake_profile(n_pulses):
+    """
+    Time differences of a synthetic brake test
+    Returns: Tuple (values, expected impact index)
+    """
+    n_pulses = max(n_pulses, BRAKE_PULSES + 16)
+    onset = n_pulses - BRAKE_PULSES
+    values = NOMINAL_TICKS + JITTER[np.arange(n_pulses) % 8]
+    values[onset:] += np.round(5 * 1.3 ** np.arange(BRAKE_PULSES)).astype(np.int64)
+    return values.astype(np.int64), onset + IMPACT_OFFSET
+
+
+def write_data_file(path, values):
+    """UTF-16 DATA file like the controller writes: BOM, header line, one value per line, final 0"""
+    lines = ['828'] + [str(v) for v in values.tolist()] + ['0']
+    with open(path, 'wb') as f:
+        f.write(b'\xff\xfe' + ('\r\n'.join(lines) + '\r\n').encode('utf-16-le'))
+
+
+def write_cf1_file(path, n_parameters):
+    """UTF-16 CF1 file with n_parameters parameter lines, including the key parameters"""
+    lines = ['PARAMETER;VALUE;DEFAULT;FUNCTION;PARAMETER DESCRIPTION;VALUE DESCRIPTION;']
+    for number in range(max(n_parameters, 600)):
+        name = f'P{number:04d}'
+        value = CF1_PARAMETERS.get(name, number % 97)
+        lines.append(f'{name};{value};;;SYNTHETIC PARAMETER {number};;')
+    with open(path, 'wb') as f:
+        f.write(b'\xff\xfe' + ('\r\n'.join(lines) + '\r\n').encode('utf-16-le'))
+
+
+def make_recording(workdir, size):
+    """Write the synthetic DATA and CF1 files of one size. Returns (data_path, cf1_path, expected impact)"""
+    values, expected_impact = brake_profile(size)
+    data_path = os.path.join(workdir, f'synthetic_{size}.data')
+    cf1_path = os.path.join(workdir, f'synthetic_{size}.CF1')
+    write_data_file(data_path, values)
+    write_cf1_file(cf1_path, min(max(size // 10, 600), 100000))
+    return data_path, cf1_path, expected_impact
+
+
+def end_to_end(data_path, cf1_path, mode, threshold=2.0):
+    """Read -> distance per pulse -> curve -> impact -> braking distance, like batch.analyze_recording"""
+    data = DataProcessor.read_data_file(data_path, mode=mode)
+    keys = None if mode == 'reference' else KEY_PARAMETERS
+    cf1_params = DataProcessor.read_cf1_file(cf1_path, keys=keys, use_cache=False)
+    distance_per_pulse = DataProcessor.calculate_distance_per_pulse(cf1_params)
+    curve_data = DataProcessor.generate_brake_curve(data, cf1_params, mode=mode)
+    impact_data = DataProcessor.calculate_impact_points(data, threshold, mode=mode)
+    if impact_data:
+        return DataProcessor.calculate_braking(curve_data['x'], impact_data['impact_index'],
+                                               impact_data['non_zero_count'], distance_per_pulse)
+    return None
+
+
+def measure(fn, repeat):
+    """Run fn repeat times. Returns the wall times in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench_size(workdir, size, repeat, reference_max):
+    """Time every stage for one synthetic size. Returns the result records"""
+    data_path, cf1_path, _ = make_recording(workdir, size)
+    data = DataProcessor.read_data_file(data_path)
+    cf1_params = DataProcessor.read_cf1_file(cf1_path, use_cache=False)
+    modes = ('vectorized', 'reference') if size <= reference_max else ('vectorized',)
+
+    stages = []
+    for mode in modes:
+        stages.append(('read_data_file', mode, lambda mode=mode: DataProcessor.read_data_file(data_path, mode=mode)))
+    # Write the binary cache and fill the CF1 cache once
+    load_recording(data_path, cache_dir=workdir)
+    DataProcessor.read_cf1_file(cf1_path)
+    stages += [
+        ('read_data_file', 'bcache', lambda: load_recording(data_path, cache_dir=workdir)),
+        ('read_cf1_file', 'full', lambda: DataProcessor.read_cf1_file(cf1_path, use_cache=False)),
+        ('read_cf1_file', 'keys', lambda: DataProcessor.read_cf1_file(cf1_path, keys=KEY_PARAMETERS, use_cache=False)),
+        ('read_cf1_file', 'cached', lambda: DataProcessor.read_cf1_file(cf1_path)),
+        ('calculate_distance_per_pulse', '-', lambda: DataProcessor.calculate_distance_per_pulse(cf1_params)),
+    ]
+    for mode in modes:
+        stages.append(('generate_brake_curve', mode,
+                       lambda mode=mode: DataProcessor.generate_brake_curve(data, cf1_params, mode=mode)))
+    for mode in modes:
+        stages.append(('calculate_impact_points', mode,
+                       lambda mode=mode: DataProcessor.calculate_impact_points(data, 2.0, mode=mode)))
+    for mode in modes:
+        stages.append(('end_to_end', mode, lambda mode=mode: end_to_end(data_path, cf1_path, mode)))
+
+    results = []
+    for stage, mode, fn in stages:
+        times = measure(fn, repeat)
+        results.append({
+            'size': size, 'stage': stage, 'mode': mode,
+            'best_s': min(times), 'median_s': statistics.median(times), 'runs': times
+        })
+    return results
+
+
+def _same_array(a, b):
+    """Bit-for-bit equality of two arrays (dtype, shape and bytes)"""
+    a, b = np.asarray(a), np.asarray(b)
+    return a.dtype == b.dtype and a.shape == b.shape and a.tobytes() == b.tobytes()
+
+
+def _same_curve(a, b):
+    return _same_array(a['x'], b['x']) and _same_array(a['y'], b['y'])
+
+
+def _same_impact(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return (a['impact_index'] == b['impact_index'] and a['non_zero_count'] == b['non_zero_count']
+            and a['threshold'] == b['threshold'] and a['debug_info'] == b['debug_info'])
+
+
+def check_equivalence(data_path, cf1_path, workdir, expected_impact=None):
+    """
+    Compare every optimized path with the reference implementation
+    Returns: List of (check name, passed)
+    """
+    checks = []
+    reference = DataProcessor.read_data_file(data_path, mode='reference')
+    cf1_reference = DataProcessor.read_cf1_file(cf1_path, use_cache=False)
+
+    # Reading
+    checks.append(('read_data_file', _same_array(DataProcessor.read_data_file(data_path), reference)))
+    load_recording(data_path, cache_dir=workdir)
+    cached = load_recording(data_path, cache_dir=workdir)
+    checks.append(('load_recording', np.array_equal(cached, reference) and len(cached) == len(reference)))
+    follower = DataFollower(data_path)
+    follower.poll(final=True)
+    checks.append(('DataFollower', _same_array(follower.data, reference)))
+
+    key_reference = {key: cf1_reference.get(key) for key in set(KEY_PARAMETERS) | {'P0361'}}
+    selective = DataProcessor.read_cf1_file(cf1_path, keys=KEY_PARAMETERS, use_cache=False)
+    checks.append(('read_cf1_file keys', {key: selective.get(key) for key in key_reference} == key_reference))
+    DataProcessor.read_cf1_file(cf1_path)
+    checks.append(('read_cf1_file cached', DataProcessor.read_cf1_file(cf1_path) == cf1_reference))
+
+    # Curve
+    curve_reference = DataProcessor.generate_brake_curve(reference, cf1_reference, mode='reference')
+    checks.append(('generate_brake_curve', _same_curve(
+        DataProcessor.generate_brake_curve(reference, cf1_reference), curve_reference)))
+    checks.append(('generate_brake_curve from cache', _same_curve(
+        DataProcessor.generate_brake_curve(cached, cf1_reference), curve_reference)))
+    pipeline = AnalysisPipeline(reference, cf1_reference)
+    checks.append(('AnalysisPipeline.curve', _same_curve(pipeline.curve(), curve_reference)))
+    if len(reference):
+        follower.set_distance_per_pulse(DataProcessor.calculate_distance_per_pulse(cf1_reference))
+        checks.append(('DataFollower curve', _same_array(follower.time_points, curve_reference['x'])
+                       and _same_array(follower.speeds, curve_reference['y'])))
+
+    # Impact detection
+    analysis = ImpactAnalysis(reference)
+    for threshold in THRESHOLDS:
+        impact_reference = DataProcessor.calculate_impact_points(reference, threshold, mode='reference')
+        checks.append((f'calculate_impact_points t={threshold}',
+                       _same_impact(DataProcessor.calculate_impact_points(reference, threshold), impact_reference)))
+        checks.append((f'ImpactAnalysis t={threshold}', _same_impact(analysis.result(threshold), impact_reference)))
+        candidates = analysis.candidates(threshold)
+        earliest = min(candidates, key=lambda candidate: candidate['first_window']) if candidates else None
+        checks.append((f'ImpactAnalysis.candidates t={threshold}', _same_impact(earliest, impact_reference)))
+
+        detector = StreamingImpactDetector(threshold)
+        for value in reference:
+            detector.feed(value)
+        chunked = StreamingImpactDetector(threshold)
+        for start in range(0, len(reference), 1000):
+            chunked.feed_many(reference[start:start + 1000])
+        checks.append((f'StreamingImpactDetector t={threshold}',
+                       _same_impact(detector.result(), impact_reference)
+                       and _same_impact(chunked.result(), impact_reference)))
+
+        pipeline.set_threshold(threshold)
+        braking = pipeline.braking()
+        if impact_reference:
+            braking_reference = DataProcessor.calculate_braking(
+                curve_reference['x'], impact_reference['impact_index'], impact_reference['non_zero_count'],
+                DataProcessor.calculate_distance_per_pulse(cf1_reference))
+            passed = braking is not None and all(braking[key] == value for key, value in braking_reference.items())
+        else:
+            passed = braking is None
+        checks.append((f'AnalysisPipeline.braking t={threshold}', passed))
+
+    if expected_impact is not None:
+        impact = DataProcessor.calculate_impact_points(reference, 2.0, mode='reference')
+        checks.append(('known impact point', impact is not None and impact['impact_index'] == expected_impact))
+    return checks
+
+
+def compare_with_baseline(results, baseline_file, tolerance):
+    """Print the speed ratio to a baseline JSON file. Returns the number of regressions"""
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = {(r['size'], r['stage'], r['mode']): r['best_s'] for r in json.load(f)['results']}
+    regressions = 0
+    print(f"\nCompared with {baseline_file} (regression above {tolerance:.2f}x):")
+    for result in results:
+        before = baseline.get((result['size'], result['stage'], result['mode']))
+        if not before:
+            continue
+        ratio = result['best_s'] / before
+        flag = ''
+        if ratio > tolerance:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{result['size']:>9} {result['stage']:<30} {result['mode']:<10} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DataProcessor pipeline and check equivalence")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Pulses per synthetic recording (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage (default: %(default)s)")
+    parser.add_argument('--reference-max', type=int, default=300000,
+                        help="Largest size also timed with the reference loops (default: %(default)s)")
+    parser.add_argument('--check-max', type=int, default=300000,
+                        help="Largest synthetic size checked for equivalence (default: %(default)s)")
+    parser.add_argument('--check-only', action='store_true', help="Only run the equivalence checks")
+    parser.add_argument('--json', help="Write the results to this JSON file (a baseline)")
+    parser.add_argument('--baseline', help="Compare the timings with this JSON file")
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help="Slowdown against the baseline reported as a regression (default: %(default)s)")
+    parser.add_argument('--workdir', help="Keep the generated files in this directory")
+    parser.add_argument('--jit', choices=('auto', 'on', 'off'), default='auto',
+                        help="Numba kernels of the vectorized engines (default: when Numba is installed)")
+    args = parser.parse_args(argv)
+
+    data_processor.set_quiet()
+    try:
+        data_processor.set_jit({'auto': None, 'on': True, 'off': False}[args.jit])
+    except ImportError as e:
+        parser.error(f"--jit on: {e}")
+    print(f"Numba kernels: {'on' if data_processor.jit_enabled() else 'off'}")
+    temp = None
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        workdir = args.workdir
+    else:
+        temp = tempfile.TemporaryDirectory()
+        workdir = temp.name
+
+    try:
+        results = []
+        if not args.check_only:
+            print(f"{'size':>9} {'stage':<30} {'mode':<10} {'best ms':>10} {'median ms':>10}")
+            for size in args.sizes:
+                for result in bench_size(workdir, size, args.repeat, args.reference_max):
+                    results.append(result)
+                    print(f"{size:>9} {result['stage']:<30} {result['mode']:<10} "
+                          f"{result['best_s'] * 1000:10.3f} {result['median_s'] * 1000:10.3f}")
+
+        equivalence = []
+        sources = [('bundled', BUNDLED_DATA, BUNDLED_CF1, None)]
+        for size in args.sizes:
+            if size <= args.check_max:
+                data_path, cf1_path, expected_impact = make_recording(workdir, size)
+                sources.append((f'synthetic_{size}', data_path, cf1_path, expected_impact))
+        print("\nEquivalence with the reference implementation:")
+        for name, data_path, cf1_path, expected_impact in sources:
+            checks = check_equivalence(data_path, cf1_path, workdir, expected_impact)
+            failed = [check for check, passed in checks if not passed]
+            equivalence += [{'source': name, 'check': check, 'passed': passed} for check, passed in checks]
+            print(f"{name:<20} {len(checks) - len(failed)}/{len(checks)} passed"
+                  + (f"  FAILED: {', '.join(failed)}" if failed else ''))
+
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance) if args.baseline else 0
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'python': sys.version,
+                    'numpy': np.__version__,
+                    'jit': data_processor.jit_enabled(),
+                    'platform': platform.platform(),
+                    'repeat': args.repeat,
+                    'results': results,
+                    'equivalence': equivalence
+                }, f, indent=2)
+    finally:
+        if temp is not None:
+            temp.cleanup()
+
+    failures = sum(not check['passed'] for check in equivalence)
+    return 1 if failures or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
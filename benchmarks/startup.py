@@ -0,0 +1,100 @@
+"""
+Startup-time benchmark for the Brake Curve Analyzer GUI.
+
+Launches the application in fresh interpreters and reports, per run:
+- import: time to import main.py
+- first_window: time from launch until the main window has been shown and painted
+- plot_ready: time from launch until the matplotlib canvas exists
+
+Usage:
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --offscreen --json startup.json
+    python benchmarks/startup.py --importtime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints wall-clock timestamps of each milestone
+CHILD = r'''
+import json, sys, time
+marks = {}
+t = time.time()
+import main
+marks['import_done'] = time.time()
+marks['import'] = marks['import_done'] - t
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+window = main.BrakeCurveApp()
+window.show()
+app.processEvents()
+marks['first_window'] = time.time()
+window.init_plot_area()
+app.processEvents()
+marks['plot_ready'] = time.time()
+print(json.dumps(marks))
+'''
+
+
+def run_once(offscreen=False):
+    """Launch one application instance. Returns the milestone times in seconds"""
+    env = dict(os.environ)
+    if offscreen:
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+    launched = time.time()
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    marks = json.loads(output.strip().splitlines()[-1])
+    return {
+        'import': marks['import'],
+        'first_window': marks['first_window'] - launched,
+        'plot_ready': marks['plot_ready'] - launched
+    }
+
+
+def import_profile(top=15):
+    """Slowest imports of main.py by cumulative time, from python -X importtime"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure GUI startup time")
+    parser.add_argument('--runs', type=int, default=5, help="Number of launches (default: %(default)s)")
+    parser.add_argument('--offscreen', action='store_true', help="Use the Qt offscreen platform")
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    parser.add_argument('--importtime', action='store_true', help="Also list the slowest imports")
+    args = parser.parse_args(argv)
+
+    runs = [run_once(args.offscreen) for _ in range(args.runs)]
+    summary = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+    for key, value in summary.items():
+        print(f"{key:>13}: {value * 1000:8.1f} ms (median of {len(runs)})")
+
+    if args.importtime:
+        print("\nSlowest imports (cumulative):")
+        for seconds, name in import_profile():
+            print(f"{seconds * 1000:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version, 'median': summary, 'runs': runs}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
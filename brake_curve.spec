@@ -7,11 +7,19 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['PyQt5', 'numpy', 'matplotlib'],
+    # matplotlib is imported lazily by BrakeCurveApp.init_plot_area
+    hiddenimports=['matplotlib.backends.backend_qt5agg'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Packages the application never uses; leaving them out shrinks the bundle and its unpack time
+    excludes=[
+        'pandas', 'scipy', 'tkinter', '_tkinter', 'IPython', 'jupyter_client', 'notebook',
+        'matplotlib.backends.backend_tkagg', 'matplotlib.backends.backend_webagg',
+        'matplotlib.tests', 'numpy.tests', 'PIL.ImageTk',
+        'PyQt5.QtWebEngineWidgets', 'PyQt5.QtWebEngineCore', 'PyQt5.QtQml', 'PyQt5.QtQuick',
+        'PyQt5.QtMultimedia', 'PyQt5.QtNetwork', 'PyQt5.QtSql', 'PyQt5.QtBluetooth',
+    ],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -0,0 +1,90 @@
+"""
+Incremental, frame-budgeted drawing of a brake curve.
+
+The curve is revealed at a fixed playback rate (points per second of wall time). Each frame
+draws only the points added since the previous frame on top of the cached canvas, using
+blitting. When frames get expensive the frame interval grows, so each frame adds more points
+and the playback speed stays the same.
+"""
+import time
+
+# Playback rate of the original animation: 10 points every 50 ms
+DEFAULT_RATE = 200
+# Longest playback for very long recordings (seconds)
+MAX_DURATION = 10.0
+
+
+class CurveAnimator:
+    def __init__(self, canvas, ax, curve_line, x, y, target_frame_ms=20, max_frame_ms=100):
+        """
+        Args:
+            canvas: FigureCanvas to blit to
+            ax: Axes holding the curve
+            curve_line: Line2D of the full curve; hidden while the animation runs
+            x, y: Curve data as displayed
+            target_frame_ms: Preferred interval between frames
+            max_frame_ms: Longest interval between frames
+        """
+        self.canvas = canvas
+        self.ax = ax
+        self.curve_line = curve_line
+        self.x = x
+        self.y = y
+        self.target_frame_ms = target_frame_ms
+        self.max_frame_ms = max_frame_ms
+        self.rate = max(DEFAULT_RATE, len(x) / MAX_DURATION)
+        self.index = 0
+        self.interval_ms = target_frame_ms
+        self.background = None
+        self.segment = None
+        self.started = None
+        self.finished = False
+
+    def start(self):
+        """Hide the curve, fix the axis limits and cache the background (axes, impact line, title)"""
+        self.ax.set_xlim(0, self.x[-1])
+        self.ax.set_ylim(0, self.y.max() * 1.1)
+        self.curve_line.set_visible(False)
+        self.segment, = self.ax.plot([], [], color=self.curve_line.get_color(),
+                                     linewidth=self.curve_line.get_linewidth(), animated=True)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.started = time.perf_counter()
+
+    def step(self):
+        """
+        Draw the points due since the last frame
+        Returns: True when the whole curve has been drawn
+        """
+        if self.finished:
+            return True
+        frame_start = time.perf_counter()
+        due = min(len(self.x), int((frame_start - self.started) * self.rate) + 1)
+        if due > self.index:
+            # Start one point back so consecutive segments join up
+            first = max(0, self.index - 1)
+            self.segment.set_data(self.x[first:due], self.y[first:due])
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.segment)
+            self.canvas.blit(self.ax.bbox)
+            # The new segment becomes part of the background of the next frame
+            self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+            self.index = due
+
+        # Leave the event loop some headroom: slow frames stretch the interval
+        frame_ms = (time.perf_counter() - frame_start) * 1000
+        self.interval_ms = int(min(self.max_frame_ms, max(self.target_frame_ms, frame_ms * 2)))
+
+        if self.index >= len(self.x):
+            self.stop()
+        return self.finished
+
+    def stop(self):
+        """Remove the animation artist and show the full curve again"""
+        if self.segment is not None:
+            self.segment.remove()
+            self.segment = None
+        self.background = None
+        self.curve_line.set_visible(True)
+        self.finished = True
+        self.canvas.draw_idle()
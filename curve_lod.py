@@ -0,0 +1,128 @@
+"""
+Level-of-detail display of long curves.
+
+MinMaxPyramid keeps, for every level k, the index of the minimum and of the maximum sample in
+each bucket of 2**k samples. A view of any x-range then needs only about two points per screen
+column, picked from the level whose buckets are about one column wide. Every bucket keeps its
+extremes, so narrow spikes such as the impact region stay visible at any zoom.
+
+The pyramid only stores indices: it stays valid when y is rescaled by a positive factor, which
+is what editing the CF1 parameters does to the speed curve.
+"""
+import numpy as np
+
+# Below this many points per pixel column the raw data is drawn
+RAW_POINTS_PER_PIXEL = 2
+
+
+def _indices(n):
+    """0 .. n-1 as int32 when that is wide enough, which halves the size of the levels"""
+    return np.arange(n, dtype=np.int32 if n < 2**31 else np.int64)
+
+
+class MinMaxPyramid:
+    def __init__(self, x, y):
+        """
+        Args:
+            x: Sorted x values (curve time axis)
+            y: y values as displayed
+        """
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.levels = self._build(self.y)
+
+    @staticmethod
+    def _build(y):
+        """Index arrays (imin, imax) for bucket sizes 2, 4, 8, ... until one bucket is left"""
+        levels = []
+        imin = imax = _indices(len(y))
+        while len(imin) > 1:
+            if len(imin) % 2:
+                # Odd count: the last bucket pairs with itself
+                imin = np.append(imin, imin[-1])
+                imax = np.append(imax, imax[-1])
+            a, b = imin[0::2], imin[1::2]
+            imin = np.where(y[b] < y[a], b, a)
+            a, b = imax[0::2], imax[1::2]
+            imax = np.where(y[b] > y[a], b, a)
+            levels.append((imin, imax))
+        return levels
+
+    def extend(self, x, y):
+        """
+        Switch to longer x/y arrays that start with the current ones (a growing recording).
+        Only the last bucket of every level and the new buckets are recomputed.
+        """
+        old_n = len(self.x)
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        if old_n == 0:
+            self.levels = self._build(self.y)
+            return
+
+        y = self.y
+        # Index of the first entry of the previous level that changed
+        dirty = old_n - 1
+        prev_min = prev_max = _indices(len(y))
+        levels = []
+        k = 0
+        while len(prev_min) > 1:
+            bucket = dirty >> 1
+            tail_min, tail_max = prev_min[2 * bucket:], prev_max[2 * bucket:]
+            if len(tail_min) % 2:
+                tail_min = np.append(tail_min, tail_min[-1])
+                tail_max = np.append(tail_max, tail_max[-1])
+            a, b = tail_min[0::2], tail_min[1::2]
+            new_min = np.where(y[b] < y[a], b, a)
+            a, b = tail_max[0::2], tail_max[1::2]
+            new_max = np.where(y[b] > y[a], b, a)
+            if k < len(self.levels):
+                old_min, old_max = self.levels[k]
+                new_min = np.concatenate((old_min[:bucket], new_min))
+                new_max = np.concatenate((old_max[:bucket], new_max))
+            levels.append((new_min, new_max))
+            prev_min, prev_max = new_min, new_max
+            dirty = bucket
+            k += 1
+        self.levels = levels
+
+    def set_y(self, y):
+        """Replace y by a positively rescaled version of itself without rebuilding the levels"""
+        self.y = np.asarray(y)
+
+    def view(self, x0=None, x1=None, width=1000):
+        """
+        Points to draw for the x-range [x0, x1] on a plot `width` pixels wide
+        Returns: Tuple (x, y); includes one point beyond each end so the line reaches the edges
+        """
+        n = len(self.x)
+        if n == 0:
+            return self.x, self.y
+        i0 = 0 if x0 is None else max(0, int(np.searchsorted(self.x, x0)) - 1)
+        i1 = n if x1 is None else min(n, int(np.searchsorted(self.x, x1, side='right')) + 1)
+        width = max(1, int(width))
+        if i1 - i0 <= RAW_POINTS_PER_PIXEL * width:
+            return self.x[i0:i1], self.y[i0:i1]
+
+        # Smallest level with at most about one bucket per pixel column
+        level = min(len(self.levels), int(np.ceil(np.log2((i1 - i0) / width))))
+        imin, imax = self.levels[level - 1]
+        # Buckets lying entirely inside [i0, i1)
+        size = 1 << level
+        b0, b1 = (i0 + size - 1) >> level, i1 >> level
+        lo, hi = imin[b0:b1], imax[b0:b1]
+        # Min and max of each bucket in x order
+        pairs = np.column_stack((np.minimum(lo, hi), np.maximum(lo, hi))).ravel()
+        # The partly covered buckets at both ends: extremes of their samples inside the range
+        head_end = min(b0 * size, i1)
+        tail_start = max(b1 * size, head_end)
+        edges = [self._extremes(i0, head_end), self._extremes(tail_start, i1)]
+        index = np.unique(np.concatenate(([i0], edges[0], pairs, edges[1], [i1 - 1])))
+        return self.x[index], self.y[index]
+
+    def _extremes(self, start, stop):
+        """Indices of the minimum and maximum of y[start:stop] (none for an empty range)"""
+        if stop <= start:
+            return np.empty(0, dtype=np.int64)
+        part = self.y[start:stop]
+        return np.array([start + int(np.argmin(part)), start + int(np.argmax(part))])
@@ -1,270 +1,865 @@
+import logging
 import numpy as np
 import os
+import re
+from collections import OrderedDict
+
+from instrument import span, traced
+
+logger = logging.getLogger(__name__)
+
+# Rule 2 sliding window size
+WINDOW_SIZE = 16
+
+# CF1 parameters used by the analysis
+KEY_PARAMETERS = ('P0251', 'P0360', 'P0361', 'P0544')
+
+# Character classes for the DATA byte parser
+_DIGIT, _NEWLINE, _SPACE, _INVALID, _AMBIGUOUS = range(5)
+_CHAR_CLASSES = np.full(256, _INVALID, dtype=np.uint8)
+_CHAR_CLASSES[ord('0'):ord('9') + 1] = _DIGIT
+# Whitespace removed by str.strip(): \t \v \f \r, \x1c-\x1f and space
+_CHAR_CLASSES[[9, 11, 12, 13, 28, 29, 30, 31, 32]] = _SPACE
+_CHAR_CLASSES[ord('\n')] = _NEWLINE
+# Characters int() may accept (signs, underscores, non-ASCII digits and whitespace)
+_CHAR_CLASSES[[ord('+'), ord('-'), ord('_')]] = _AMBIGUOUS
+_CHAR_CLASSES[128:] = _AMBIGUOUS
+
+# Full CF1 parses by (path, mtime, size), least recently used first
+CF1_CACHE_SIZE = 64
+_cf1_cache = OrderedDict()
+
+# Available engines for read_data_file
+READ_MODES = ('vectorized', 'reference')
+
+# Available engines for calculate_impact_points
+IMPACT_MODES = ('vectorized', 'reference')
+
+# Available engines for generate_brake_curve
+CURVE_MODES = ('vectorized', 'reference')
+
+# Numba kernels for the sequential loops of the vectorized engines (see set_jit):
+# None uses them when Numba is installed, True requires them, False never uses them
+_jit = {'': None, 'auto': None, '1': True, '0': False}.get(os.environ.get('BRAKE_CURVE_JIT', ''), None)
+_jit_kernels = None  # Compiled kernels once loaded, False if Numba is not installed
+
+
+def set_quiet(quiet=True):
+    """
+    Silence the diagnostics of DataProcessor.
+    While quiet, only warnings and errors are logged and the debug strings are never built.
+    """
+    logger.setLevel(logging.WARNING if quiet else logging.NOTSET)
+
+
+def set_jit(enabled=None):
+    """
+    Choose how the vectorized engines run the DATA filter and the impact window scan.
+    Args:
+        enabled: True for the Numba kernels (ImportError if Numba is not installed),
+                 False for the NumPy code, None for the kernels when Numba is installed
+    The default comes from the environment variable BRAKE_CURVE_JIT ('1', '0' or 'auto').
+    """
+    global _jit
+    if enabled and _load_jit_kernels() is None:
+        raise ImportError("Numba is not installed")
+    _jit = enabled
+
+
+def jit_enabled():
+    """Whether the Numba kernels are used (loads Numba on first call unless they are switched off)"""
+    return _kernels() is not None
+
+
+def _filter_end_loop(raw_numbers):
+    """filter_end as a loop over int64 values, compiled by _load_jit_kernels"""
+    n = len(raw_numbers)
+    start = 16 if n >= 16 else 0
+    for i in range(start, n):
+        if raw_numbers[i] == 0:
+            return i
+        if i > 0 and raw_numbers[i] + 50 < raw_numbers[i - 1]:
+            return i + 1
+    return n
+
+
+def _first_impact_window_loop(time_diffs, threshold):
+    """First rule 2 window of int64 time differences (-1 if none), compiled by _load_jit_kernels"""
+    for i in range(len(time_diffs) - WINDOW_SIZE + 1):
+        if time_diffs[i + WINDOW_SIZE - 1] == 0:
+            return -1
+        above_threshold = 0
+        for j in range(4):
+            b_low = time_diffs[i + j + 8] - time_diffs[i + j]
+            b_high = time_diffs[i + j + 12] - time_diffs[i + j + 4]
+            # c is 0 for a zero divisor, as in the reference loop
+            c = b_high / b_low if b_low != 0 else 0.0
+            if c > threshold:
+                above_threshold += 1
+        if above_threshold >= 3:
+            return i
+    return -1
+
+
+def _load_jit_kernels():
+    """
+    Compile the loops with Numba on first use. The machine code is cached next to this module
+    (cache=True), so later runs load it instead of compiling.
+    Returns: Dictionary of kernels, or None if Numba is not installed
+    """
+    global _jit_kernels
+    if _jit_kernels is None:
+        try:
+            import numba
+        except ImportError:
+            _jit_kernels = False
+        else:
+            _jit_kernels = {
+                'filter_end': numba.njit(cache=True, nogil=True)(_filter_end_loop),
+                'first_impact_window': numba.njit(cache=True, nogil=True)(_first_impact_window_loop)
+            }
+    return _jit_kernels or None
+
+
+def _kernels():
+    """Kernels to use under the current setting, None for the NumPy code"""
+    if _jit is False:
+        return None
+    kernels = _load_jit_kernels()
+    if kernels is None and _jit:
+        raise ImportError("Numba is not installed")
+    return kernels
+
 
 class DataProcessor:
     @staticmethod
-    def read_data_file(file_path):
+    def _parse_text_reference(text):
+        """Original line-by-line parser. Returns (raw_numbers, line_count)"""
+        raw_numbers = []
+        line_count = 0
+        
+        for line in text.split('\n'):
+            line_count += 1
+            try:
+                line = line.strip()
+                if line:  # Only check if line is not empty
+                    value = int(line)
+                    raw_numbers.append(value)
+            except ValueError:
+                continue
+        
+        return raw_numbers, line_count
+
+    @staticmethod
+    def _parse_bytes_vectorized(content, encoding):
+        """
+        Parse one integer per line straight from the raw bytes with NumPy.
+        Gives the same values as int(line.strip()) on every line of the decoded text.
+        Returns (raw_numbers, line_count), or None when the content needs the reference parser
+        (signs, underscores, non-ASCII characters or numbers too long for int64).
+        """
+        if encoding == 'utf-16-le':
+            if len(content) % 2:
+                return None
+            pairs = np.frombuffer(content, dtype=np.uint8).reshape(-1, 2)
+            # Only latin1 code points after the BOM, so the low bytes are the characters
+            if pairs[1:, 1].any():
+                return None
+            units = np.ascontiguousarray(pairs[:, 0])
+            classes = _CHAR_CLASSES[units]
+            # The BOM stays in the decoded text and makes its line invalid
+            classes[0] = _INVALID
+        else:
+            units = np.frombuffer(content, dtype=np.uint8)
+            classes = _CHAR_CLASSES[units]
+
+        if (classes == _AMBIGUOUS).any():
+            return None
+
+        newline_pos = np.flatnonzero(classes == _NEWLINE)
+        line_count = len(newline_pos) + 1
+
+        values = DataProcessor._parse_plain_lines(units, classes, newline_pos)
+        if values is not None:
+            return values, line_count
+
+        # Digit runs
+        digit_pos = np.flatnonzero(classes == _DIGIT)
+        if digit_pos.size == 0:
+            return np.array([], dtype=np.int64), line_count
+        run_start = np.empty(digit_pos.size, dtype=bool)
+        run_start[0] = True
+        np.not_equal(np.diff(digit_pos), 1, out=run_start[1:])
+        starts = np.flatnonzero(run_start)
+        lengths = np.diff(starts, append=digit_pos.size)
+
+        # A line is a number when it holds exactly one digit run and no other characters
+        run_lines = np.searchsorted(newline_pos, digit_pos[starts])
+        invalid_lines = np.searchsorted(newline_pos, np.flatnonzero(classes == _INVALID))
+        runs_per_line = np.bincount(run_lines, minlength=line_count)
+        invalid_per_line = np.bincount(invalid_lines, minlength=line_count)
+        valid = (runs_per_line[run_lines] == 1) & (invalid_per_line[run_lines] == 0)
+        starts = starts[valid]
+        lengths = lengths[valid]
+        if lengths.size and lengths.max() > 18:
+            return None
+
+        # Horner's scheme over the digit positions of all numbers at once
+        digits = units[digit_pos].astype(np.int64) - 48
+        values = digits[starts]
+        for k in range(1, int(lengths.max()) if lengths.size else 0):
+            longer = lengths > k
+            values[longer] = values[longer] * 10 + digits[starts[longer] + k]
+        return values, line_count
+
+    @staticmethod
+    def _parse_plain_lines(units, classes, newline_pos):
+        """
+        Single C-level conversion for the usual layout: after an optional invalid first line
+        (the BOM line), every line is empty or digits ended by \\n or \\r\\n.
+        Returns the values, or None when the content does not have this layout.
+        """
+        invalid_pos = np.flatnonzero(classes == _INVALID)
+        start = 0
+        if invalid_pos.size:
+            if not newline_pos.size or invalid_pos[-1] > newline_pos[0]:
+                return None
+            start = newline_pos[0] + 1
+        body = units[start:]
+        body_newlines = newline_pos[newline_pos >= start] - start
+
+        # \r only directly before \n, no other whitespace
+        cr_pos = np.flatnonzero(body == 13)
+        if np.count_nonzero(classes[start:] == _SPACE) != cr_pos.size:
+            return None
+        if cr_pos.size and (cr_pos[-1] + 1 >= len(body) or (body[cr_pos + 1] != 10).any()):
+            return None
+
+        # Digits per line
+        begins = np.concatenate(([0], body_newlines + 1))
+        ends = np.append(body_newlines, len(body))
+        has_cr = np.zeros(len(ends), dtype=bool)
+        has_cr[:-1] = (ends[:-1] > begins[:-1]) & (body[ends[:-1] - 1] == 13)
+        digit_counts = ends - begins - has_cr
+        if digit_counts.size and digit_counts.max() > 18:
+            return None
+
+        count = np.count_nonzero(digit_counts)
+        if count == 0:
+            return np.array([], dtype=np.int64)
+        values = np.fromstring(body.tobytes(), dtype=np.int64, sep=' ')
+        return values if len(values) == count else None
+
+    @staticmethod
+    def _filter_reference(raw_numbers):
+        """Original filtering loop. Returns the list of accepted values"""
+        numbers = []
+        if len(raw_numbers) >= 16:
+            # Always include first 16 values
+            numbers.extend(raw_numbers[:16])
+            
+            # Process remaining values
+            last_value = numbers[-1]
+            for i in range(16, len(raw_numbers)):
+                current_value = raw_numbers[i]
+                
+                # Stop if we encounter a zero
+                if current_value == 0:
+                    break
+                    
+                # Include current value and stop if it decreases
+                if current_value+50 < last_value:
+                    numbers.append(current_value)
+                    break
+                
+                numbers.append(current_value)
+                last_value = current_value
+        else:
+            # If less than 16 values, process until zero or decrease
+            last_value = None
+            for value in raw_numbers:
+                if value == 0:
+                    break
+                if last_value is not None and (value+50) < last_value:  #bugfix：有时前一个会比后一个大50
+                    numbers.append(value)  # Include the decreasing value
+                    break
+                numbers.append(value)
+                last_value = value
+        return numbers
+
+    @staticmethod
+    def filter_end(raw_numbers):
+        """
+        Number of leading values kept by the DATA filtering rules:
+        - First 16 values are always kept (when there are at least 16)
+        - Stop before the first zero after that
+        - Stop after the first value that is more than 50 below its predecessor
+        """
+        raw_numbers = np.asarray(raw_numbers, dtype=np.int64)
+        kernels = _kernels()
+        if kernels is not None:
+            return int(kernels['filter_end'](raw_numbers))
+        n = len(raw_numbers)
+        start = 16 if n >= 16 else 0
+        
+        zeros = np.flatnonzero(raw_numbers[start:] == 0)
+        zero_at = start + int(zeros[0]) if zeros.size else n
+        
+        first = max(start, 1)
+        if zero_at <= first:
+            return zero_at
+        drops = np.flatnonzero(raw_numbers[first:zero_at] + 50 < raw_numbers[first - 1:zero_at - 1])
+        if drops.size:
+            # Include the decreasing value
+            return first + int(drops[0]) + 1
+        return zero_at
+
+    @staticmethod
+    @traced('read_data_file')
+    def read_data_file(file_path, with_summary=False, mode='vectorized'):
         """
         Read time difference data from DATA file with special handling:
         - First 16 values are always read
         - After that, stop reading when a value is less than previous value (include that value)
         - Stop reading when encountering zero
+        Args:
+            file_path: Path of the DATA file
+            with_summary: Also return a dictionary describing the file and the filtering
+            mode: 'vectorized' (NumPy byte parser) or 'reference' (original line loop)
+        Returns: Array of time differences, or (array, summary) if with_summary is set
         """
         try:
-            print(f"\nDEBUG: Reading DATA file:")
-            print(f"File path: {file_path}")
+            if mode not in READ_MODES:
+                raise ValueError(f"Unknown DATA read mode: {mode}")
+
+            logger.debug("Reading DATA file: %s", file_path)
             
-            with open(file_path, 'rb') as f:
+            with span('read_data_file.read', 'detail'), open(file_path, 'rb') as f:
                 content = f.read()
+            
+            # Check for UTF-16 BOM
+            if content.startswith(b'\xff\xfe'):
+                encoding = 'utf-16-le'
+            else:
+                encoding = 'latin1'
+            logger.debug("Using %s encoding", encoding)
+            
+            parsed = None
+            with span('read_data_file.parse', 'detail'):
+                if mode == 'vectorized':
+                    parsed = DataProcessor._parse_bytes_vectorized(content, encoding)
+                    if parsed is None:
+                        logger.debug("Falling back to the line parser")
                 
-                # Check for UTF-16 BOM
-                if content.startswith(b'\xff\xfe'):
-                    text = content.decode('utf-16-le')
-                    print("Detected UTF-16 LE encoding")
+                if parsed is None:
+                    raw_numbers, line_count = DataProcessor._parse_text_reference(content.decode(encoding))
                 else:
-                    text = content.decode('latin1')
-                    print("Using latin1 encoding")
-                
-                # Process the text content
-                raw_numbers = []
-                line_count = 0
-                
-                # First read all valid numbers
-                for line in text.split('\n'):
-                    line_count += 1
-                    try:
-                        line = line.strip()
-                        if line:  # Only check if line is not empty
-                            value = int(line)
-                            raw_numbers.append(value)
-                    except ValueError:
-                        continue
-                
-                # Apply the special filtering logic
-                numbers = []
-                if len(raw_numbers) >= 16:
-                    # Always include first 16 values
-                    numbers.extend(raw_numbers[:16])
-                    
-                    # Process remaining values
-                    last_value = numbers[-1]
-                    for i in range(16, len(raw_numbers)):
-                        current_value = raw_numbers[i]
-                        
-                        # Stop if we encounter a zero
-                        if current_value == 0:
-                            break
-                            
-                        # Include current value and stop if it decreases
-                        if current_value+50 < last_value:
-                            numbers.append(current_value)
-                            break
-                        
-                        numbers.append(current_value)
-                        last_value = current_value
+                    raw_numbers, line_count = parsed
+            
+            # Apply the special filtering logic
+            with span('read_data_file.filter', 'detail'):
+                if parsed is None:
+                    numbers = np.array(DataProcessor._filter_reference(raw_numbers))
                 else:
-                    # If less than 16 values, process until zero or decrease
-                    last_value = None
-                    for value in raw_numbers:
-                        if value == 0:
-                            break
-                        if last_value is not None and (value+50) < last_value:  #bugfix：有时前一个会比后一个大50
-                            numbers.append(value)  # Include the decreasing value
-                            break
-                        numbers.append(value)
-                        last_value = value
-                
-                print(f"DATA file processing summary:")
-                print(f"Total lines: {line_count}")
-                print(f"Raw values: {len(raw_numbers)}")
-                print(f"Processed values: {len(numbers)}")
-                if numbers:
-                    print(f"First 16 values: {numbers[:16]}")
-                    print(f"Last few values: {numbers[-5:]}")
-                    print(f"Time range: {min(numbers)} - {max(numbers)} (0.0125ms units)")
-                
-                return np.array(numbers)
+                    raw_numbers = np.asarray(raw_numbers, dtype=np.int64)
+                    numbers = raw_numbers[:DataProcessor.filter_end(raw_numbers)].copy()
+            
+            logger.info("DATA file processing summary: %d lines, %d raw values, %d processed values",
+                        line_count, len(raw_numbers), len(numbers))
+            if len(numbers) and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("First 16 values: %s", numbers[:16].tolist())
+                logger.debug("Last few values: %s", numbers[-5:].tolist())
+                logger.debug("Time range: %d - %d (0.0125ms units)", numbers.min(), numbers.max())
+            
+            if with_summary:
+                summary = {
+                    'file_path': file_path,
+                    'encoding': encoding,
+                    'total_lines': line_count,
+                    'raw_values': len(raw_numbers),
+                    'processed_values': len(numbers),
+                    'time_range': (int(numbers.min()), int(numbers.max())) if len(numbers) else None
+                }
+                return numbers, summary
+            return numbers
                 
         except Exception as e:
-            print(f"Error reading DATA file: {str(e)}")
-            return None
+            logger.error("Error reading DATA file: %s", e)
+            return (None, None) if with_summary else None
+
+    @staticmethod
+    def _parse_cf1_line(line, params):
+        """Parse one stripped CF1 line into params. Returns the parameter name that was set, or None"""
+        parts = line.split(';')
+        if len(parts) >= 2 and parts[1].strip():
+            param_num = parts[0].strip()
+            try:
+                # Special handling for P0361
+                if param_num == 'P0361':
+                    # If P0361 is not found or is 0, use default value 4
+                    value = int(parts[1].strip())
+                    if value == 0:
+                        logger.info("P0361 is 0, using default value 4")
+                        value = 4
+                else:
+                    value = int(parts[1].strip())
+                params[param_num] = value
+                return param_num
+            except ValueError:
+                if param_num == 'P0361':
+                    logger.info("P0361 not found or invalid, using default value 4")
+                    params[param_num] = 4
+                    return param_num
+        return None
 
     @staticmethod
-    def read_cf1_file(file_path):
+    def _decode_cf1(file_path):
+        """Read a CF1 file and decode it to text"""
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        
+        # Check for UTF-16 BOM
+        if content.startswith(b'\xff\xfe'):
+            return content.decode('utf-16-le')
+        return content.decode('latin1')
+
+    @staticmethod
+    def _parse_cf1_text(text, keys=None):
+        """
+        Parse CF1 text into a parameter dictionary.
+        With keys, only the lines of those parameters are parsed and the scan stops
+        as soon as all of them are found.
+        """
+        params = {}
+        if keys is None:
+            # Process the text content
+            for line in text.split('\n'):
+                line = line.strip()
+                if line.startswith('P'):
+                    DataProcessor._parse_cf1_line(line, params)
+        else:
+            wanted = set(keys) | {'P0361'}
+            pattern = re.compile(r'^[^\S\n]*(?:%s)[^\S\n]*;' % '|'.join(map(re.escape, sorted(wanted))),
+                                 re.MULTILINE)
+            for match in pattern.finditer(text):
+                end = text.find('\n', match.start())
+                line = text[match.start():end if end >= 0 else len(text)].strip()
+                wanted.discard(DataProcessor._parse_cf1_line(line, params))
+                if not wanted:
+                    break
+        
+        # If P0361 is still not set, set default value
+        if 'P0361' not in params:
+            logger.info("P0361 not found in file, using default value 4")
+            params['P0361'] = 4
+        return params
+
+    @staticmethod
+    def read_cf1_file(file_path, keys=None, use_cache=True):
         """
         Read parameters from CF1 file
+        Args:
+            file_path: Path of the CF1 file
+            keys: Parameter names to extract (default: all parameters)
+            use_cache: Parse the whole file once and answer every later read of an unchanged file
+                       (same path, mtime and size) from the cached parse, whatever the keys
         Returns: Dictionary of parameters
         """
-        params = {}
         try:
-            with open(file_path, 'rb') as f:
-                content = f.read()
-                
-                # Check for UTF-16 BOM
-                if content.startswith(b'\xff\xfe'):
-                    text = content.decode('utf-16-le')
+            cache_key = None
+            if use_cache:
+                stat = os.stat(file_path)
+                cache_key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+            
+            if cache_key is None:
+                params = DataProcessor._parse_cf1_text(DataProcessor._decode_cf1(file_path), keys)
+            else:
+                # The full parse is cached, so later reads of any keys of the same file are lookups
+                cached = _cf1_cache.get(cache_key)
+                if cached is None:
+                    cached = DataProcessor._parse_cf1_text(DataProcessor._decode_cf1(file_path))
+                    _cf1_cache[cache_key] = cached
+                    while len(_cf1_cache) > CF1_CACHE_SIZE:
+                        _cf1_cache.popitem(last=False)
                 else:
-                    text = content.decode('latin1')
-                
-                # Process the text content
-                for line in text.split('\n'):
-                    line = line.strip()
-                    if line.startswith('P'):
-                        parts = line.split(';')
-                        if len(parts) >= 2 and parts[1].strip():
-                            param_num = parts[0].strip()
-                            try:
-                                # Special handling for P0361
-                                if param_num == 'P0361':
-                                    # If P0361 is not found or is 0, use default value 4
-                                    value = int(parts[1].strip())
-                                    if value == 0:
-                                        print("P0361 is 0, using default value 4")
-                                        value = 4
-                                    else:
-                                        value = int(parts[1].strip())
-                                else:
-                                    value = int(parts[1].strip())
-                                params[param_num] = value
-                            except ValueError:
-                                if param_num == 'P0361':
-                                    print("P0361 not found or invalid, using default value 4")
-                                    params[param_num] = 4
-                                continue
-                
-                # If P0361 is still not set, set default value
-                if 'P0361' not in params:
-                    print("P0361 not found in file, using default value 4")
-                    params['P0361'] = 4
-                
-                # Only print key parameters
-                print("\nKey parameters found:")
-                for key in ['P0251', 'P0360', 'P0361', 'P0544']:
-                    print(f"{key}: {params.get(key, 'Not found')}")
-                
-                return params
+                    _cf1_cache.move_to_end(cache_key)
+                if keys is None:
+                    params = dict(cached)
+                else:
+                    params = {key: cached[key] for key in set(keys) | {'P0361'} if key in cached}
+            
+            # Only log key parameters
+            logger.info("Key parameters found: P0251=%s, P0360=%s, P0361=%s, P0544=%s",
+                        *(params.get(key, 'Not found') for key in KEY_PARAMETERS))
+            
+            return params
         except Exception as e:
-            print(f"Error reading CF1 file: {str(e)}")
+            logger.error("Error reading CF1 file: %s", e)
             return None
 
+    @staticmethod
+    def clear_cf1_cache():
+        """Forget all cached CF1 parses"""
+        _cf1_cache.clear()
+
+    @staticmethod
+    def distance_details(cf1_params):
+        """
+        Work out the distance per pulse and how it was calculated
+        Returns: Dictionary with the calculation case (1 or 2), the parameters used,
+                 distance_per_pulse in centimeters (0 if invalid) and an error message or None
+        """
+        # Get parameters
+        speed = cf1_params.get('P0251', 0)  # mm/s
+        pulses = cf1_params.get('P0544', 0)  # Hz
+        details = {
+            'case': None,
+            'P0251': speed,
+            'P0544': pulses,
+            'distance_per_pulse': 0,
+            'error': None
+        }
+        
+        if pulses == 0:
+            details['error'] = "P0544 cannot be zero"
+            return details
+        
+        if speed == 0:
+            details['error'] = "P0251 cannot be zero"
+            return details
+        
+        # Check if P0544 has non-zero thousands digit
+        thousands_digit = (pulses // 1000) % 10
+        
+        if thousands_digit > 0:
+            # Case 1: Use P0360 and P0361
+            motor_speed = cf1_params.get('P0360', 0)  # rpm
+            holes = cf1_params.get('P0361', 0)  # holes per rev
+            details.update({'case': 1, 'P0360': motor_speed, 'P0361': holes})
+            
+            if motor_speed == 0 or holes == 0:
+                details['error'] = "P0360 and P0361 cannot be zero when P0544 has non-zero thousands digit"
+                return details
+            
+            # Formula: P251 * 6 / (P360 * P361)
+            details['distance_per_pulse'] = (speed * 6) / (motor_speed * holes)  # Result in cm
+        else:
+            # Case 2: Direct calculation without P0360 and P0361
+            details['case'] = 2
+            details['distance_per_pulse'] = speed / pulses / 10  # Result in cm
+        
+        return details
+
     @staticmethod
     def calculate_distance_per_pulse(cf1_params):
         """Calculate distance per pulse in centimeters"""
         try:
-            # Get parameters
-            speed = cf1_params.get('P0251', 0)  # mm/s
-            pulses = cf1_params.get('P0544', 0)  # Hz
-            
-            if pulses == 0:
-                print("Error: P0544 cannot be zero")
-                return 0
-            
-            if speed == 0:
-                print("Error: P0251 cannot be zero")
+            details = DataProcessor.distance_details(cf1_params)
+            if details['error']:
+                logger.error("Error: %s", details['error'])
                 return 0
             
-            # Check if P0544 has non-zero thousands digit
-            thousands_digit = (pulses // 1000) % 10
-            
-            print(f"\nParameters for distance calculation:")
-            print(f"P251 (Speed): {speed} mm/s")
-            print(f"P544: {pulses}")
-            
-            if thousands_digit > 0:
-                # Case 1: Use P0360 and P0361
-                motor_speed = cf1_params.get('P0360', 0)  # rpm
-                holes = cf1_params.get('P0361', 0)  # holes per rev
-                
-                if motor_speed == 0 or holes == 0:
-                    print("Error: P0360 and P0361 cannot be zero when P0544 has non-zero thousands digit")
-                    return 0
-                
-                print(f"P360 (Motor speed): {motor_speed} rpm")
-                print(f"P361 (Holes per rev): {holes}")
-                # Formula: P251 * 6 / (P360 * P361)
-                distance = (speed * 6) / (motor_speed * holes)  # Result in cm
-                print(f"Distance calculation (Case 1): ({speed}*6)/({motor_speed}*{holes}) = {distance:.3f} cm")
-                
-                # Remove duplicate calculation details
-                return distance
+            distance = details['distance_per_pulse']
+            if details['case'] == 1:
+                logger.debug("Distance calculation (Case 1): (%s*6)/(%s*%s) = %.3f cm",
+                             details['P0251'], details['P0360'], details['P0361'], distance)
             else:
-                # Case 2: Direct calculation without P0360 and P0361
-                distance = speed / pulses / 10  # Result in cm
-                print(f"Distance calculation (Case 2): {speed}/{pulses}/10 = {distance:.3f} cm")
-                return distance
+                logger.debug("Distance calculation (Case 2): %s/%s/10 = %.3f cm",
+                             details['P0251'], details['P0544'], distance)
+            return distance
             
         except Exception as e:
-            print(f"Error calculating distance per pulse: {str(e)}")
+            logger.error("Error calculating distance per pulse: %s", e)
             return 0
 
     @staticmethod
-    def generate_brake_curve(data, cf1_params):
-        """Generate brake curve data"""
+    def time_axis(data):
+        """
+        Convert time differences to seconds and build the curve time axis
+        Args:
+            data: Array of time differences (units of 0.0125ms)
+        Returns:
+            Tuple (t_seconds, time_points) in seconds
+        """
+        times = np.asarray(data)
+        t_seconds = times * 0.0125 / 1000  # Convert to seconds
+        # cumsum adds sequentially, so the time axis matches a running total exactly
+        return t_seconds, np.cumsum(t_seconds)
+
+    @staticmethod
+    def nearest_index(time_points, t):
+        """Index of the time point closest to t in a sorted time axis (binary search)"""
+        i = int(np.searchsorted(time_points, t))
+        if i <= 0:
+            return 0
+        if i >= len(time_points):
+            return len(time_points) - 1
+        # Ties go to the earlier point, like argmin
+        return i - 1 if t - time_points[i - 1] <= time_points[i] - t else i
+
+    @staticmethod
+    def speeds_from_seconds(t_seconds, distance_per_pulse):
+        """Speed in mm/s for every time difference, 0 where the time difference is not positive"""
+        speeds = np.zeros(len(t_seconds))
+        valid = t_seconds > 0
+        # Case 1 and case 2 share the same speed formula
+        np.divide(distance_per_pulse * 100, t_seconds, out=speeds, where=valid)
+        return speeds
+
+    @staticmethod
+    def _curve_reference(times, distance_per_pulse):
+        """Original per-point curve generation loop"""
+        speeds = []  # mm/s
+        total_time = 0
+        time_points = []
+
+        for t in times:
+            if t > 0:
+                # Convert time from 0.0125ms units to seconds
+                t_seconds = t * 0.0125 / 1000  # Convert to seconds
+                speed = (distance_per_pulse * 100) / t_seconds  # Convert to mm/s
+            else:
+                speed = 0
+
+            speeds.append(speed)
+            total_time += t * 0.0125 / 1000  # Add time in seconds
+            time_points.append(total_time)
+
+        return np.array(time_points), np.array(speeds)
+
+    @staticmethod
+    @traced('generate_brake_curve')
+    def generate_brake_curve(data, cf1_params, mode='vectorized'):
+        """
+        Generate brake curve data
+        Args:
+            data: Array of time differences (units of 0.0125ms)
+            cf1_params: Dictionary of CF1 parameters
+            mode: 'vectorized' (array operations) or 'reference' (original loop)
+        Returns:
+            Dictionary with time points 'x' (s) and speeds 'y' (mm/s)
+        """
         try:
+            if mode not in CURVE_MODES:
+                raise ValueError(f"Unknown curve generation mode: {mode}")
+
             # Calculate distance per pulse
             distance_per_pulse = DataProcessor.calculate_distance_per_pulse(cf1_params)
             if distance_per_pulse <= 0:
-                print("Error: Invalid distance per pulse")
+                logger.error("Error: Invalid distance per pulse")
                 return {'x': np.array([]), 'y': np.array([])}
             
             # Convert time differences to speed
             times = np.array(data)  # units of 0.0125ms
-            speeds = []  # mm/s
-            total_time = 0
-            time_points = []
-            
-            # Check if using Case 1 or Case 2
-            thousands_digit = (cf1_params.get('P0544', 0) // 1000) % 10
-            
-            print("\nProcessing time differences:")
-            print(f"Distance per pulse: {distance_per_pulse} cm")
-            print(f"First few raw times: {times[:5]} (units of 0.0125ms)")
+            if times.size == 0:
+                logger.error("Error: No time differences to process")
+                return {'x': np.array([]), 'y': np.array([])}
             
-            for t in times:
-                if t > 0:
-                    # Convert time from 0.0125ms units to seconds
-                    t_seconds = t * 0.0125 / 1000  # Convert to seconds
-                    
-                    if thousands_digit > 0:
-                        # Case 1: Speed calculation
-                        speed = (distance_per_pulse * 100) / t_seconds  # Convert to mm/s
-                    else:
-                        # Case 2: Speed calculation
-                        speed = (distance_per_pulse * 100) / t_seconds  # Convert to mm/s
-                    
-                    if len(speeds) < 5:  # Debug first few calculations
-                        print(f"Time: {t} units = {t_seconds*1000:.3f} ms")
-                        print(f"Speed calculation: ({distance_per_pulse}*100)/({t_seconds}) = {speed:.3f} mm/s")
-                else:
-                    speed = 0
-                
-                speeds.append(speed)
-                total_time += t * 0.0125 / 1000  # Add time in seconds
-                time_points.append(total_time)
+            if mode == 'reference':
+                with span('generate_brake_curve.reference', 'detail'):
+                    time_points, speeds = DataProcessor._curve_reference(times, distance_per_pulse)
+            else:
+                with span('generate_brake_curve.time_axis', 'detail'):
+                    t_seconds, time_points = DataProcessor.time_axis(times)
+                with span('generate_brake_curve.speeds', 'detail'):
+                    speeds = DataProcessor.speeds_from_seconds(t_seconds, distance_per_pulse)
             
-            print(f"\nCurve generation complete:")
-            print(f"Total points: {len(speeds)}")
-            print(f"Time range: {time_points[0]:.3f} - {time_points[-1]:.3f} seconds")
-            print(f"Speed range: {min(speeds):.3f} - {max(speeds):.3f} mm/s")
+            summary = {
+                'distance_per_pulse': distance_per_pulse,
+                'points': len(speeds),
+                'time_range': (float(time_points[0]), float(time_points[-1])),
+                'speed_range': (float(speeds.min()), float(speeds.max()))
+            }
+            logger.info("Curve generation complete: %d points, %.3f - %.3f s, %.3f - %.3f mm/s",
+                        summary['points'], *summary['time_range'], *summary['speed_range'])
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("First few raw times: %s (units of 0.0125ms)", times[:5].tolist())
+                logger.debug("First few speeds: %s (mm/s)", speeds[:5].tolist())
             
             return {
-                'x': np.array(time_points),
-                'y': np.array(speeds)
+                'x': time_points,
+                'y': speeds,
+                'summary': summary
             }
             
-        except Exception as e:
-            print(f"Error generating brake curve: {str(e)}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Error generating brake curve")
             return {'x': np.array([]), 'y': np.array([])}
 
     @staticmethod
-    def calculate_impact_points(time_diffs, threshold=2.0):
+    def smoothing_window(smoothing):
+        """
+        Moving average length for a smoothing factor (CALCULATION_CONFIG['curve_smoothing'])
+        The factor is read as the alpha of exponential smoothing: a moving average over
+        2/alpha - 1 points has the same mean lag. The length is made odd to keep the average centered.
+        Returns: Number of points, 1 for no smoothing (factor 0 or not below 1)
+        """
+        if not 0 < smoothing < 1:
+            return 1
+        window = int(round(2 / smoothing - 1))
+        return window if window % 2 else window + 1
+
+    @staticmethod
+    @traced('smooth_curve')
+    def smooth_curve(curve_data, smoothing):
+        """
+        Centered moving average of the speeds, from one cumulative sum (O(n) for any window).
+        Evens out the spread between pulses of unevenly spaced flywheel holes; near both ends
+        the average is taken over the points that exist.
+        Args:
+            curve_data: Curve as returned by generate_brake_curve
+            smoothing: Smoothing factor, see smoothing_window
+        Returns: Dictionary with the same time points 'x' and the smoothed speeds 'y' (mm/s)
+        """
+        speeds = np.asarray(curve_data['y'])
+        half = DataProcessor.smoothing_window(smoothing) // 2
+        if half == 0 or speeds.size == 0:
+            return {'x': curve_data['x'], 'y': speeds}
+        n = len(speeds)
+        width = 2 * half + 1
+        sums = np.empty(n + 1)
+        sums[0] = 0
+        np.cumsum(speeds, out=sums[1:])
+
+        smoothed = np.empty(n)
+        if n >= width:
+            inner = smoothed[half:n - half]
+            np.subtract(sums[width:], sums[:-width], out=inner)
+            inner /= width
+        # Shorter windows at both ends
+        edges = np.r_[0:min(half, n), max(n - half, min(half, n)):n]
+        low = np.maximum(edges - half, 0)
+        high = np.minimum(edges + half + 1, n)
+        smoothed[edges] = (sums[high] - sums[low]) / (high - low)
+        return {'x': curve_data['x'], 'y': smoothed.astype(speeds.dtype, copy=False)}
+
+    @staticmethod
+    def window_values(time_diffs):
+        """
+        Calculate b and c values of every 16-sample window at once (rule 2)
+        Args:
+            time_diffs: Array of time differences
+        Returns:
+            Tuple (b_values, c_values) with shapes (n_windows, 8) and (n_windows, 4).
+            Only windows before the first zero entering the window are included.
+        """
+        time_diffs = np.asarray(time_diffs, dtype=np.int64)
+        n_windows = len(time_diffs) - WINDOW_SIZE + 1
+
+        # The window stops sliding when the value entering it is zero
+        zeros = np.flatnonzero(time_diffs[WINDOW_SIZE - 1:] == 0)
+        if zeros.size:
+            n_windows = int(zeros[0])
+        if n_windows <= 0:
+            return np.empty((0, 8), dtype=np.int64), np.empty((0, 4))
+
+        windows = np.lib.stride_tricks.sliding_window_view(
+            time_diffs[:n_windows + WINDOW_SIZE - 1], WINDOW_SIZE)
+        b_values = windows[:, 8:] - windows[:, :8]
+        c_values = np.zeros((n_windows, 4))
+        np.divide(b_values[:, 4:], b_values[:, :4], out=c_values,
+                  where=b_values[:, :4] != 0)
+        return b_values, c_values
+
+    @staticmethod
+    def _find_impact_vectorized(time_diffs, threshold, chunk_size=65536):
+        """Find the first impact window with NumPy, one chunk of windows at a time (or with the Numba kernel)"""
+        time_diffs = np.asarray(time_diffs, dtype=np.int64)
+        kernels = _kernels()
+        if kernels is not None:
+            i = int(kernels['first_impact_window'](time_diffs, float(threshold)))
+            if i < 0:
+                return None, {}
+            window_data = time_diffs[i:i + WINDOW_SIZE]
+            b_values, c_values = DataProcessor.window_values(window_data)
+            return i + 13, {
+                'window_data': window_data.tolist(),
+                'b_values': b_values[0].tolist(),
+                'c_values': c_values[0].tolist(),
+                'above_threshold_count': int(np.count_nonzero(c_values[0] > threshold))
+            }
+
+        n_windows = len(time_diffs) - WINDOW_SIZE + 1
+        step = max(1, chunk_size)
+
+        for start in range(0, n_windows, step):
+            stop = min(start + step, n_windows)
+            chunk = time_diffs[start:stop + WINDOW_SIZE - 1]
+            b_values, c_values = DataProcessor.window_values(chunk)
+            above_threshold = np.count_nonzero(c_values > threshold, axis=1)
+            hits = np.flatnonzero(above_threshold >= 3)
+
+            if hits.size:
+                i = int(hits[0])
+                debug_info = {
+                    'window_data': chunk[i:i + WINDOW_SIZE].tolist(),
+                    'b_values': b_values[i].tolist(),
+                    'c_values': c_values[i].tolist(),
+                    'above_threshold_count': int(above_threshold[i])
+                }
+                return start + i + 13, debug_info
+
+            # A zero entered the window inside this chunk
+            if len(b_values) < stop - start:
+                break
+
+        return None, {}
+
+    @staticmethod
+    def _find_impact_reference(time_diffs, threshold):
+        """Find the first impact window with the original per-window loop"""
+        window_size = WINDOW_SIZE
+        impact_index = None
+        debug_info = {}
+
+        for i in range(len(time_diffs) - window_size + 1):
+            window = time_diffs[i:i+window_size]
+
+            # Stop if we encounter a zero
+            if window[-1] == 0:
+                break
+
+            # Calculate b values (b1 to b8)
+            b_values = []
+            for j in range(8):
+                b = window[j+8] - window[j]
+                b_values.append(b)
+
+            # Calculate c values (c1 to c4)
+            c_values = []
+            for j in range(4):
+                if b_values[j] == 0:  # Avoid division by zero
+                    c = 0
+                else:
+                    c = b_values[j+4] / b_values[j]
+                c_values.append(c)
+
+            # Check threshold condition
+            above_threshold = sum(c > threshold for c in c_values)
+
+            if above_threshold >= 3:
+                impact_index = i + 13  # data13 position in current window
+
+                # Store debug information
+                debug_info = {
+                    'window_data': window.tolist(),
+                    'b_values': b_values,
+                    'c_values': c_values,
+                    'above_threshold_count': above_threshold
+                }
+                break
+
+        return impact_index, debug_info
+
+    @staticmethod
+    @traced('calculate_impact_points')
+    def calculate_impact_points(time_diffs, threshold=2.0, mode='vectorized'):
         """
         Calculate impact points according to rule 2
         Args:
             time_diffs: Array of time differences
             threshold: Threshold value for impact detection (default: 2.0)
+            mode: 'vectorized' (NumPy sliding windows) or 'reference' (original loop)
         Returns:
             Dictionary containing:
             - impact_index: Index of impact point
@@ -272,74 +867,329 @@ class DataProcessor:
             - debug_info: Dictionary containing calculation details
         """
         try:
-            if len(time_diffs) < 16:
-                print("Not enough data points for impact detection")
+            if mode not in IMPACT_MODES:
+                raise ValueError(f"Unknown impact detection mode: {mode}")
+
+            time_diffs = np.asarray(time_diffs, dtype=np.int64)
+            if len(time_diffs) < WINDOW_SIZE:
+                logger.info("Not enough data points for impact detection")
                 return None
-                
-            window_size = 16
-            impact_index = None
-            debug_info = {}
             
             # Count non-zero values
             non_zero_count = np.sum(time_diffs != 0)
             
-            for i in range(len(time_diffs) - window_size + 1):
-                window = time_diffs[i:i+window_size]
-                
-                # Stop if we encounter a zero
-                if window[-1] == 0:
-                    break
-                
-                # Calculate b values (b1 to b8)
-                b_values = []
-                for j in range(8):
-                    b = window[j+8] - window[j]
-                    b_values.append(b)
-                
-                # Calculate c values (c1 to c4)
-                c_values = []
-                for j in range(4):
-                    if b_values[j] == 0:  # Avoid division by zero
-                        c = 0
-                    else:
-                        c = b_values[j+4] / b_values[j]
-                    c_values.append(c)
-                
-                # Check threshold condition
-                above_threshold = sum(c > threshold for c in c_values)
-                
-                if above_threshold >= 3:
-                    impact_index = i + 13  # data13 position in current window
-                    
-                    # Store debug information
-                    debug_info = {
-                        'window_data': window.tolist(),
-                        'b_values': b_values,
-                        'c_values': c_values,
-                        'above_threshold_count': above_threshold
-                    }
-                    break
+            with span('calculate_impact_points.windows', 'detail', mode=mode):
+                if mode == 'reference':
+                    impact_index, debug_info = DataProcessor._find_impact_reference(time_diffs, threshold)
+                else:
+                    impact_index, debug_info = DataProcessor._find_impact_vectorized(time_diffs, threshold)
             
             if impact_index is not None:
-                print(f"\nImpact Detection Details:")
-                print(f"Impact detected at data point {impact_index + 1}")
-                print(f"Window data: {debug_info['window_data']}")
-                print(f"B values: {[f'b{i+1}={v:.3f}' for i, v in enumerate(debug_info['b_values'])]}")
-                print(f"C values: {[f'c{i+1}={v:.3f}' for i, v in enumerate(debug_info['c_values'])]}")
-                print(f"Values above threshold ({threshold}): {debug_info['above_threshold_count']}")
-                print(f"Non-zero data points: {non_zero_count}")
+                logger.info("Impact detected at data point %d (%d non-zero data points)",
+                            impact_index + 1, non_zero_count)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Window data: %s", debug_info['window_data'])
+                    logger.debug("B values: %s", ', '.join(f'b{i+1}={v:.3f}' for i, v in enumerate(debug_info['b_values'])))
+                    logger.debug("C values: %s", ', '.join(f'c{i+1}={v:.3f}' for i, v in enumerate(debug_info['c_values'])))
+                    logger.debug("Values above threshold (%s): %s", threshold, debug_info['above_threshold_count'])
                 
                 return {
                     'impact_index': impact_index,
                     'non_zero_count': non_zero_count,
+                    'threshold': threshold,
                     'debug_info': debug_info
                 }
             else:
-                print("No impact point detected")
+                logger.info("No impact point detected")
                 return None
                 
-        except Exception as e:
-            print(f"Error calculating impact points: {str(e)}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
-            return None 
\ No newline at end of file
+        except Exception:
+            logger.exception("Error calculating impact points")
+            return None
+
+    @staticmethod
+    def calculate_braking(time_points, impact_index, non_zero_count, distance_per_pulse):
+        """
+        Braking distance from a detected impact point
+        Args:
+            time_points: Curve time axis (s)
+            impact_index: Impact index from calculate_impact_points (data13 position)
+            non_zero_count: Count of non-zero data points
+            distance_per_pulse: Distance per pulse in centimeters
+        Returns:
+            Dictionary with the plotted impact index, impact_time (s), braking_pulses
+            and braking_distance (cm)
+        """
+        # The impact line is drawn two points before data13
+        index = max(0, impact_index - 2)  # Ensure index doesn't go below 0
+        braking_pulses = non_zero_count - index
+        return {
+            'index': index,
+            'impact_time': time_points[index],
+            'braking_pulses': braking_pulses,
+            'braking_distance': braking_pulses * distance_per_pulse
+        }
+
+
+class ImpactAnalysis:
+    """
+    Rule 2 window values of one DATA array, computed once.
+    Answers "first impact index for threshold x" for any threshold without
+    going back over the data: at least 3 of the 4 c-values are above x exactly
+    when the 3rd-largest c-value of the window is above x.
+    Only two values per window are kept; the b- and c-values of a reported window are
+    computed again when needed.
+    """
+
+    def __init__(self, time_diffs):
+        # Kept in its own (possibly compact) type; window_values works in int64
+        self.time_diffs = np.asarray(time_diffs)
+        self.non_zero_count = np.sum(self.time_diffs != 0)
+        _, c_values = DataProcessor.window_values(self.time_diffs)
+
+        # 3rd-largest c-value of every window
+        self.third_largest = np.sort(c_values, axis=1)[:, 1]
+        # Running maximum is sorted, so the first window above x is a binary search
+        self.running_max = np.maximum.accumulate(self.third_largest) \
+            if len(self.third_largest) else self.third_largest
+
+    def first_windows(self, thresholds):
+        """Index of the first impact window for each threshold (-1 if none)"""
+        thresholds = np.asarray(thresholds, dtype=float)
+        windows = np.searchsorted(self.running_max, thresholds, side='right')
+        return np.where(windows < len(self.running_max), windows, -1)
+
+    def impact_indices(self, thresholds):
+        """Impact index (data13 position) for each threshold (-1 if none)"""
+        windows = self.first_windows(thresholds)
+        return np.where(windows >= 0, windows + 13, -1)
+
+    def impact_index(self, threshold):
+        """Impact index for a single threshold, None if no impact is detected"""
+        index = int(self.impact_indices(threshold))
+        return index if index >= 0 else None
+
+    def sweep(self, thresholds=None):
+        """
+        Impact index over a range of thresholds
+        Args:
+            thresholds: Thresholds to check (default: 0.1 to 10 in steps of 0.1)
+        Returns:
+            Tuple (thresholds, impact_indices)
+        """
+        if thresholds is None:
+            thresholds = np.round(np.arange(1, 101) * 0.1, 1)
+        thresholds = np.asarray(thresholds, dtype=float)
+        return thresholds, self.impact_indices(thresholds)
+
+    def result(self, threshold):
+        """
+        Impact result for one threshold in the format of calculate_impact_points
+        Returns: Dictionary with impact_index, non_zero_count and debug_info, or None
+        """
+        if len(self.time_diffs) < WINDOW_SIZE:
+            return None
+
+        window = int(self.first_windows(threshold))
+        if window < 0:
+            return None
+        return self._window_results([window], threshold)[0]
+
+    def candidates(self, threshold, gap=WINDOW_SIZE):
+        """
+        Every impact event for one threshold, strongest first
+        Windows meeting rule 2 at most `gap` windows apart form one event. The strength of an
+        event is its margin: how far the largest 3rd-largest c-value of its windows is above
+        the threshold.
+        Args:
+            threshold: Threshold value for impact detection
+            gap: Largest distance in windows between two windows of the same event
+        Returns:
+            List of dictionaries in the format of calculate_impact_points, for the first window
+            of each event (so the earliest event is what calculate_impact_points reports), plus:
+            - rank: Position in the list (0: strongest)
+            - margin: Largest 3rd-largest c-value of the event minus the threshold
+            - first_window, last_window, peak_window: Window indices of the event
+        """
+        hits = np.flatnonzero(self.third_largest > threshold)
+        if hits.size == 0:
+            return []
+
+        # Event number of every hit window
+        starts_at = np.concatenate(([0], np.flatnonzero(np.diff(hits) > gap) + 1))
+        ends_at = np.concatenate((starts_at[1:], [len(hits)])) - 1
+        events = np.repeat(np.arange(len(starts_at)), np.diff(np.append(starts_at, len(hits))))
+
+        # Strongest window of every event: first of its event after sorting by descending margin
+        margins = self.third_largest[hits] - threshold
+        by_margin = np.lexsort((-margins, events))
+        peaks = by_margin[starts_at]
+        order = np.lexsort((hits[starts_at], -margins[peaks]))
+
+        results = self._window_results(hits[starts_at][order], threshold)
+        for rank, (result, event) in enumerate(zip(results, order)):
+            result.update(
+                rank=rank,
+                margin=float(margins[peaks[event]]),
+                first_window=int(hits[starts_at[event]]),
+                last_window=int(hits[ends_at[event]]),
+                peak_window=int(hits[peaks[event]])
+            )
+        return results
+
+    def _window_results(self, windows, threshold):
+        """Results in the format of calculate_impact_points for the given windows"""
+        windows = np.asarray(windows, dtype=np.intp)
+        window_data = self.time_diffs[windows[:, None] + np.arange(WINDOW_SIZE)].astype(np.int64)
+        b_values = window_data[:, 8:] - window_data[:, :8]
+        c_values = np.zeros((len(windows), 4))
+        np.divide(b_values[:, 4:], b_values[:, :4], out=c_values, where=b_values[:, :4] != 0)
+        above_threshold = np.count_nonzero(c_values > threshold, axis=1)
+        return [{
+            'impact_index': int(window) + 13,
+            'non_zero_count': self.non_zero_count,
+            'threshold': threshold,
+            'debug_info': {
+                'window_data': window_data[i].tolist(),
+                'b_values': b_values[i].tolist(),
+                'c_values': c_values[i].tolist(),
+                'above_threshold_count': int(above_threshold[i])
+            }
+        } for i, window in enumerate(windows)]
+
+
+class StreamingImpactDetector:
+    """
+    Rule 2 impact detection on a stream of time differences.
+    Keeps the last 16 samples in a ring buffer and the c-values of the last 4 windows,
+    so every sample costs O(1). Detection stops at the impact window or when a zero
+    enters the window, like calculate_impact_points; samples keep being counted after that.
+    Fed with a whole array, result() is identical to calculate_impact_points(array, threshold).
+    """
+
+    # Chunks at least this long are scanned with NumPy instead of sample by sample
+    VECTORIZE_MIN = 64
+
+    def __init__(self, threshold=2.0):
+        self.threshold = threshold
+        self.count = 0
+        self.non_zero_count = 0
+        self.impact_index = None
+        self.debug_info = {}
+        self.finished = False  # Impact found or a zero entered the window
+        self._ring = [0] * WINDOW_SIZE
+        self._c = [0.0] * 4   # c-value of window k is at k % 4
+
+    def feed(self, sample):
+        """
+        Add one time difference
+        Returns: Impact index (data13 position) if this sample completes the impact window, else None
+        """
+        x = int(sample)
+        p = self.count
+        self.count += 1
+        if x != 0:
+            self.non_zero_count += 1
+        if self.finished:
+            return None
+
+        ring = self._ring
+        ring[p & 15] = x
+        if p >= 12:
+            # c of window p-12 = b(p-8) / b(p-12), where b(k) = x[k+8] - x[k]
+            b_new = x - ring[(p - 8) & 15]
+            b_old = ring[(p - 4) & 15] - ring[(p - 12) & 15]
+            self._c[p & 3] = b_new / b_old if b_old != 0 else 0.0
+        if p < WINDOW_SIZE - 1:
+            return None
+
+        # The window stops sliding when the value entering it is zero
+        if x == 0:
+            self.finished = True
+            return None
+
+        threshold = self.threshold
+        c = self._c
+        above_threshold = (c[0] > threshold) + (c[1] > threshold) + (c[2] > threshold) + (c[3] > threshold)
+        if above_threshold >= 3:
+            self._set_impact(p - WINDOW_SIZE + 1)
+            return self.impact_index
+        return None
+
+    def feed_many(self, samples):
+        """
+        Add a chunk of time differences
+        Returns: Impact index if the impact window lies in this chunk, else None
+        """
+        samples = np.asarray(samples, dtype=np.int64).ravel()
+        if self.finished:
+            self.count += len(samples)
+            self.non_zero_count += int(np.count_nonzero(samples))
+            return None
+        if len(samples) < self.VECTORIZE_MIN:
+            for i, sample in enumerate(samples.tolist()):
+                if self.feed(sample) is not None:
+                    # Only count the rest of the chunk
+                    self.feed_many(samples[i + 1:])
+                    return self.impact_index
+            return None
+
+        # Scan the windows completed by this chunk, with the last 15 samples in front of it
+        n_tail = min(self.count, WINDOW_SIZE - 1)
+        offset = self.count - n_tail
+        combined = np.concatenate((np.array(self._tail(n_tail), dtype=np.int64), samples))
+        window_index, debug_info = DataProcessor._find_impact_vectorized(combined, self.threshold)
+
+        self.count += len(samples)
+        self.non_zero_count += int(np.count_nonzero(samples))
+        if window_index is not None:
+            self.impact_index = offset + window_index
+            self.debug_info = debug_info
+            self.finished = True
+            return self.impact_index
+        if np.any(combined[WINDOW_SIZE - 1:] == 0):
+            self.finished = True
+            return None
+        self._load_ring(combined[-WINDOW_SIZE:])
+        return None
+
+    def _tail(self, n):
+        """Last n samples in stream order"""
+        return [self._ring[(self.count - n + j) & 15] for j in range(n)]
+
+    def _load_ring(self, last):
+        """Restore the ring and c-values from the last 16 samples (stream positions count-16 .. count-1)"""
+        for j, x in enumerate(last.tolist()):
+            self._ring[(self.count - len(last) + j) & 15] = x
+        ring = self._ring
+        for p in range(self.count - 4, self.count):
+            b_new = ring[p & 15] - ring[(p - 8) & 15]
+            b_old = ring[(p - 4) & 15] - ring[(p - 12) & 15]
+            self._c[p & 3] = b_new / b_old if b_old != 0 else 0.0
+
+    def _set_impact(self, window_start):
+        window = self._tail(WINDOW_SIZE)
+        b_values = [window[j + 8] - window[j] for j in range(8)]
+        c_values = [b_values[j + 4] / b_values[j] if b_values[j] != 0 else 0.0 for j in range(4)]
+        self.impact_index = window_start + 13  # data13 position in the window
+        self.debug_info = {
+            'window_data': window,
+            'b_values': b_values,
+            'c_values': c_values,
+            'above_threshold_count': sum(c > self.threshold for c in c_values)
+        }
+        self.finished = True
+
+    def result(self):
+        """
+        Impact found so far, in the format of calculate_impact_points
+        Returns: Dictionary with impact_index, non_zero_count, threshold and debug_info, or None
+        """
+        if self.impact_index is None or self.count < WINDOW_SIZE:
+            return None
+        return {
+            'impact_index': self.impact_index,
+            'non_zero_count': self.non_zero_count,
+            'threshold': self.threshold,
+            'debug_info': self.debug_info
+        }
@@ -0,0 +1,249 @@
+"""
+Headless export of brake curve plots and a combined PDF report.
+
+Recordings are analyzed and drawn on a process pool with the Agg backend; Qt is not imported.
+Every worker draws all its recordings on one figure, updating the artists instead of creating a
+new figure per plot, and saves a PNG and/or PDF per recording. The report is written by the
+main process: each worker returns the few thousand points needed to draw its page, and the
+pages are streamed into one multi-page PDF in input order.
+
+Every page shows the curve, the impact line and the braking-distance annotation of the GUI.
+
+Usage:
+    python export.py recordings/ --cf1 unit.CF1 -o plots/ --report report.pdf
+    python export.py archive/ -r --cf1-map units.csv -o plots/ --format png pdf -j 8
+"""
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import batch
+from curve_lod import MinMaxPyramid
+from data_processor import DataProcessor, KEY_PARAMETERS
+from pipeline import curve_title
+
+logger = logging.getLogger(__name__)
+
+# A4 landscape
+PAGE_SIZE = (11.69, 8.27)
+DEFAULT_DPI = 100
+FORMATS = ('png', 'pdf')
+
+# Renderer of this worker process, see _init_export_worker
+_renderer = None
+
+
+def braking_summary(row):
+    """Braking annotation of a batch result row"""
+    if row['error']:
+        return row['error']
+    return (f"Impact Point: Data #{row['curve_impact_index'] + 1}\n"
+            f"Non-zero Data Points: {row['non_zero_count']}\n"
+            f"Brake Pulses: {row['brake_pulses']}\n"
+            f"Braking Distance: {row['braking_distance']:.2f} cm\n"
+            f"Impact Time: {row['impact_time']:.3f} s")
+
+
+def make_page(row, curve_data, cf1_params, width):
+    """
+    What a page shows: title, annotation, impact time and the curve points needed at `width` pixels
+    Returns: Dictionary with name, title, summary, impact_time, x and y (m/s; None without a curve)
+    """
+    name = os.path.basename(row['data_file'])
+    braking = None
+    if row['impact_time'] is not None:
+        braking = {'impact_time': row['impact_time'], 'braking_distance': row['braking_distance']}
+    x = y = None
+    if curve_data is not None and len(curve_data['x']):
+        x, y = MinMaxPyramid(curve_data['x'], curve_data['y']/10000).view(width=width)
+    return {
+        'name': name,
+        'title': curve_title(cf1_params, braking, name) if cf1_params else f'Brake Curve: {name}',
+        'summary': braking_summary(row),
+        'impact_time': row['impact_time'],
+        'x': x,
+        'y': y
+    }
+
+
+class PageRenderer:
+    """One Agg figure whose artists are updated for every page"""
+
+    def __init__(self, dpi=DEFAULT_DPI):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=PAGE_SIZE, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.grid(True)
+        self.ax.set_xlabel('Time (s)')
+        self.ax.set_ylabel('Speed (m/s)')
+        self.curve_line, = self.ax.plot([], [])
+        self.impact_line = self.ax.axvline(x=0, color='red', linestyle='--', label='Impact Point')
+        self.summary = self.ax.text(0.01, 0.02, '', transform=self.ax.transAxes, va='bottom', ha='left',
+                                    fontsize=9, color='#1565C0',
+                                    bbox={'boxstyle': 'round', 'facecolor': '#E3F2FD', 'edgecolor': 'none'})
+        self.ax.legend(loc='upper right')
+
+    @property
+    def width(self):
+        """Plot width in pixels, which sets how many curve points a page needs"""
+        return self.ax.bbox.width
+
+    def draw(self, page):
+        """Show one page"""
+        has_curve = page['x'] is not None
+        self.curve_line.set_data(page['x'] if has_curve else [], page['y'] if has_curve else [])
+        if has_curve and page['impact_time'] is not None:
+            self.impact_line.set_xdata([page['impact_time'], page['impact_time']])
+            self.impact_line.set_visible(True)
+        else:
+            self.impact_line.set_visible(False)
+        self.summary.set_text(page['summary'])
+        self.ax.set_title(page['title'], fontsize=12)
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view()
+
+    def save(self, path):
+        self.figure.savefig(path)
+
+
+def _init_export_worker(dpi):
+    global _renderer
+    batch._init_worker()
+    _renderer = PageRenderer(dpi)
+
+
+def _export_task(task):
+    """
+    Analyze one recording, save its plot files and describe its report page
+    Returns: Tuple (row, page or None, output paths)
+    """
+    data_file, cf1_file, threshold, use_cache, cache_dir, results_db, stem, out_dir, formats, with_page = task
+    row, curve_data = batch.analyze_recording(data_file, cf1_file, threshold, use_cache, cache_dir, results_db,
+                                              with_curve=True)
+    cf1_params = DataProcessor.read_cf1_file(cf1_file, keys=KEY_PARAMETERS) if cf1_file else None
+    page = make_page(row, curve_data, cf1_params, _renderer.width)
+
+    outputs = []
+    if out_dir and formats:
+        _renderer.draw(page)
+        for fmt in formats:
+            path = os.path.join(out_dir, f'{stem}.{fmt}')
+            try:
+                _renderer.save(path)
+                outputs.append(path)
+            except OSError as e:
+                logger.error("Could not write %s: %s", path, e)
+    return row, page if with_page else None, outputs
+
+
+def _unique_stems(data_files):
+    """Output file names without extension; recordings with the same name get a numbered suffix"""
+    stems, seen = [], {}
+    for path in data_files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        count = seen.get(stem, 0)
+        seen[stem] = count + 1
+        stems.append(stem if count == 0 else f'{stem}_{count + 1}')
+    return stems
+
+
+def run_export(data_files, out_dir=None, formats=('png',), report=None, cf1_map=None, default_cf1=None,
+               threshold=batch.DEFAULT_THRESHOLD, workers=None, dpi=DEFAULT_DPI, use_cache=True, cache_dir=None,
+               results_db=None):
+    """
+    Export plots of recordings on a process pool
+    Args:
+        out_dir: Directory for one file per recording and format (None: no per-recording files)
+        formats: File formats of the per-recording files, see FORMATS
+        report: Path of the combined multi-page PDF (None: no report)
+        Other arguments as for batch.run_batch
+    Yields: Tuple (row, output paths) per recording, in the order of data_files
+    """
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tasks = [(path, batch.resolve_cf1(path, cf1_map, default_cf1), threshold, use_cache, cache_dir, results_db,
+              stem, out_dir, tuple(formats), report is not None)
+             for path, stem in zip(data_files, _unique_stems(data_files))]
+
+    pdf = renderer = None
+    if report is not None:
+        from matplotlib.backends.backend_pdf import PdfPages
+        renderer = PageRenderer(dpi)
+        pdf = PdfPages(report)
+    try:
+        if workers == 1:
+            _init_export_worker(dpi)
+            results = map(_export_task, tasks)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_export_worker, initargs=(dpi,))
+            chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 8))
+            results = executor.map(_export_task, tasks, chunksize=chunksize)
+        try:
+            for row, page, outputs in results:
+                if pdf is not None:
+                    renderer.draw(page)
+                    pdf.savefig(renderer.figure)
+                yield row, outputs
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    finally:
+        if pdf is not None:
+            pdf.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export brake curve plots and a PDF report without the GUI")
+    parser.add_argument('inputs', nargs='+', help="DATA files, directories or glob patterns")
+    parser.add_argument('--cf1', help="CF1 file used for every recording without a mapping entry")
+    parser.add_argument('--cf1-map', help="CSV or JSON mapping of DATA name patterns to CF1 files")
+    parser.add_argument('-t', '--threshold', type=float, default=batch.DEFAULT_THRESHOLD,
+                        help="Impact threshold (default: %(default)s)")
+    parser.add_argument('-o', '--output-dir', help="Directory for one plot file per recording")
+    parser.add_argument('--format', nargs='+', choices=FORMATS, default=['png'],
+                        help="Formats of the per-recording files (default: png)")
+    parser.add_argument('--report', help="Combined multi-page PDF report")
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI, help="Resolution of PNG files (default: %(default)s)")
+    parser.add_argument('-j', '--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Search directories recursively")
+    parser.add_argument('--cache-dir', help="Directory for the binary DATA caches (default: next to each DATA file)")
+    parser.add_argument('--no-cache', action='store_true', help="Always parse the DATA files; do not read or write caches")
+    parser.add_argument('--results-db', default=batch.DEFAULT_RESULTS_DB,
+                        help="Result store database (default: %(default)s)")
+    parser.add_argument('--no-results', action='store_true',
+                        help="Analyze every recording again; do not read or write the result store")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    if not args.output_dir and not args.report:
+        parser.error("nothing to export: give --output-dir and/or --report")
+    data_files = batch.find_data_files(args.inputs, args.recursive)
+    if not data_files:
+        logger.error("No DATA files found")
+        return 2
+    cf1_map = batch.load_cf1_map(args.cf1_map) if args.cf1_map else None
+
+    failed = 0
+    for done, (row, outputs) in enumerate(run_export(
+            data_files, args.output_dir, args.format, args.report, cf1_map, args.cf1, args.threshold,
+            args.workers, args.dpi, not args.no_cache, args.cache_dir,
+            None if args.no_results else args.results_db), 1):
+        if row['error']:
+            failed += 1
+            logger.warning("%s: %s", row['data_file'], row['error'])
+        logger.info("[%d/%d] %s", done, len(data_files), os.path.basename(row['data_file']))
+
+    logger.info("%d recordings exported, %d with errors%s", len(data_files), failed,
+                f"; report: {args.report}" if args.report else "")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
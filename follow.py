@@ -0,0 +1,221 @@
+"""
+Follow a DATA file that is still being written.
+
+DataFollower.poll() reads only the bytes appended since the previous poll and runs every
+stage incrementally: decoding (a UTF-16 code unit split across two reads is kept for the
+next poll), line parsing, the DATA filtering rules, the time axis, the speeds and rule 2
+impact detection. After the final poll the accepted data, time axis and impact result are
+identical to read_data_file / time_axis / calculate_impact_points on the whole file.
+"""
+import codecs
+import logging
+import os
+
+import numpy as np
+
+from data_processor import DataProcessor, StreamingImpactDetector
+
+logger = logging.getLogger(__name__)
+
+# Values always kept by the DATA filter
+FILTER_PREFIX = 16
+
+
+class _GrowingArray:
+    """Append-only array with amortized O(1) appends"""
+
+    def __init__(self, dtype):
+        self._buffer = np.empty(1024, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self._buffer.dtype)
+        end = self._size + len(values)
+        if end > len(self._buffer):
+            grown = np.empty(max(end, 2 * len(self._buffer)), dtype=self._buffer.dtype)
+            grown[:self._size] = self._buffer[:self._size]
+            self._buffer = grown
+        self._buffer[self._size:end] = values
+        self._size = end
+
+    def clear(self):
+        self._size = 0
+
+    @property
+    def values(self):
+        return self._buffer[:self._size]
+
+
+class DataFollower:
+    def __init__(self, file_path, threshold=2.0, distance_per_pulse=0):
+        """
+        Args:
+            file_path: DATA file being written
+            threshold: Impact threshold
+            distance_per_pulse: Distance per pulse in cm, for the speeds
+        """
+        self.file_path = file_path
+        self.threshold = threshold
+        self.distance_per_pulse = distance_per_pulse
+        self.reset()
+
+    def reset(self):
+        """Forget everything read so far (the next poll starts at the beginning of the file)"""
+        self.offset = 0
+        self.encoding = None
+        self._head = b''          # First bytes, until the encoding is known
+        self._decoder = None
+        self._partial_line = ''   # Text after the last newline
+        self._prefix = []          # Raw values until FILTER_PREFIX have been read
+        self._last_value = None
+        self.finished = False      # The DATA filter stopped: later values are never used
+        self._data = _GrowingArray(np.int64)
+        self._t_seconds = _GrowingArray(np.float64)
+        self._time_points = _GrowingArray(np.float64)
+        self._speeds = _GrowingArray(np.float64)
+        self.detector = StreamingImpactDetector(self.threshold)
+
+    @property
+    def data(self):
+        """Accepted time differences so far"""
+        return self._data.values
+
+    @property
+    def time_points(self):
+        return self._time_points.values
+
+    @property
+    def speeds(self):
+        """Speeds in mm/s for the current distance per pulse"""
+        return self._speeds.values
+
+    def set_threshold(self, threshold):
+        """Restart impact detection with another threshold over the data read so far"""
+        if threshold != self.threshold:
+            self.threshold = threshold
+            self.detector = StreamingImpactDetector(threshold)
+            self.detector.feed_many(self.data)
+
+    def set_distance_per_pulse(self, distance_per_pulse):
+        """Recompute the speeds for another distance per pulse"""
+        if distance_per_pulse != self.distance_per_pulse:
+            self.distance_per_pulse = distance_per_pulse
+            self._speeds.clear()
+            self._speeds.append(DataProcessor.speeds_from_seconds(self._t_seconds.values, distance_per_pulse))
+
+    def impact(self):
+        """Impact found so far, in the format of calculate_impact_points, or None"""
+        return self.detector.result()
+
+    def poll(self, final=False):
+        """
+        Read what was appended to the file since the last poll
+        Args:
+            final: The file is complete; also use its last line when it has no newline
+        Returns: Number of newly accepted values
+        """
+        size = os.path.getsize(self.file_path)
+        if size < self.offset:
+            logger.info("%s shrank; reading it again from the start", self.file_path)
+            self.reset()
+        if size == self.offset and not final:
+            return 0
+
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        self.offset += len(chunk)
+        return self._feed_bytes(chunk, final)
+
+    def _feed_bytes(self, chunk, final):
+        if self._decoder is None:
+            self._head += chunk
+            if len(self._head) < 2 and not final:
+                return 0
+            self.encoding = 'utf-16-le' if self._head.startswith(b'\xff\xfe') else 'latin1'
+            self._decoder = codecs.getincrementaldecoder(self.encoding)()
+            chunk, self._head = self._head, b''
+
+        text = self._partial_line + self._decoder.decode(chunk, final=final)
+        lines_end = len(text) if final else text.rfind('\n') + 1
+        self._partial_line = text[lines_end:]
+        if lines_end == 0 and not final:
+            return 0
+        return self._feed_values(self._parse_lines(text[:lines_end]), final)
+
+    @staticmethod
+    def _parse_lines(text):
+        """Values of the lines in text, like the line parser of read_data_file"""
+        if text.startswith('\ufeff'):
+            # The decoded BOM makes the first line invalid; drop it so the rest can use the byte parser
+            newline = text.find('\n')
+            text = text[newline + 1:] if newline >= 0 else ''
+        parsed = None
+        try:
+            parsed = DataProcessor._parse_bytes_vectorized(text.encode('latin1'), 'latin1')
+        except UnicodeEncodeError:
+            pass
+        if parsed is None:
+            values, _ = DataProcessor._parse_text_reference(text)
+        else:
+            values, _ = parsed
+        return np.asarray(values, dtype=np.int64)
+
+    def _feed_values(self, raw, final):
+        """Apply the DATA filtering rules to newly parsed values"""
+        if self.finished:
+            return 0
+
+        if self._prefix is not None:
+            self._prefix.extend(raw.tolist())
+            if len(self._prefix) < FILTER_PREFIX:
+                if not final:
+                    return 0
+                # Short file: the filter of read_data_file for less than 16 values
+                self.finished = True
+                return self._accept(np.array(DataProcessor._filter_reference(self._prefix), dtype=np.int64))
+            # The first 16 values are always kept
+            raw = np.array(self._prefix[FILTER_PREFIX:], dtype=np.int64)
+            accepted = self._accept(np.array(self._prefix[:FILTER_PREFIX], dtype=np.int64))
+            self._last_value = self._prefix[FILTER_PREFIX - 1]
+            self._prefix = None
+        else:
+            accepted = 0
+
+        if len(raw) == 0:
+            return accepted
+
+        # Stop before the first zero and after the first value more than 50 below its predecessor
+        end = len(raw)
+        zeros = np.flatnonzero(raw == 0)
+        if zeros.size:
+            end = int(zeros[0])
+            self.finished = True
+        previous = np.concatenate(([self._last_value], raw[:end - 1])) if end else raw[:0]
+        drops = np.flatnonzero(raw[:end] + 50 < previous)
+        if drops.size:
+            end = int(drops[0]) + 1
+            self.finished = True
+        if end:
+            self._last_value = int(raw[end - 1])
+        return accepted + self._accept(raw[:end])
+
+    def _accept(self, values):
+        """Extend the data, time axis, speeds and impact detection"""
+        if len(values) == 0:
+            return 0
+        t_seconds, _ = DataProcessor.time_axis(values)
+        # Continue the running total from the last time point, so the sums stay sequential
+        start = self._time_points.values[-1:] if len(self._time_points) else [0.0]
+        time_points = np.cumsum(np.concatenate((start, t_seconds)))[1:]
+        self._data.append(values)
+        self._t_seconds.append(t_seconds)
+        self._time_points.append(time_points)
+        self._speeds.append(DataProcessor.speeds_from_seconds(t_seconds, self.distance_per_pulse))
+        impact_index = self.detector.feed_many(values)
+        if impact_index is not None:
+            logger.info("Impact detected at data point %d while following", impact_index + 1)
+        return len(values)
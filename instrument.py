@@ -0,0 +1,137 @@
+"""
+Timing instrumentation of the analysis stages.
+
+Code marks stages with span() or the traced() decorator. While instrumentation is off
+(the default) a span is a shared no-op object and a traced function costs one flag check.
+While it is on, every span records a Chrome trace event ("complete" event, 'ph': 'X');
+export_chrome_trace() writes them as JSON for chrome://tracing or https://ui.perfetto.dev.
+
+Categories: 'stage' for the stages shown in the GUI status bar, 'detail' for their steps,
+'render' for matplotlib drawing.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Oldest events are dropped beyond this many
+MAX_EVENTS = 100000
+
+_enabled = os.environ.get('BRAKE_CURVE_TRACE', '') not in ('', '0')
+_origin_ns = time.perf_counter_ns()
+_events = deque(maxlen=MAX_EVENTS)
+_last = OrderedDict()   # name -> last duration (s), most recent last; 'detail' spans excluded
+_thread_names = {}
+
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def clear():
+    """Forget all recorded spans"""
+    _events.clear()
+    _last.clear()
+
+
+def events():
+    """Recorded trace events, oldest first"""
+    return list(_events)
+
+
+def last_timings():
+    """Duration in seconds of the most recent span of every name (not 'detail' spans), most recent last"""
+    return OrderedDict(_last)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        thread = threading.current_thread()
+        _thread_names[thread.ident] = thread.name
+        event = {
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': (self.start - _origin_ns) / 1000,  # microseconds
+            'dur': (end - self.start) / 1000,
+            'pid': os.getpid(),
+            'tid': thread.ident,
+        }
+        if self.args:
+            event['args'] = self.args
+        _events.append(event)
+        if self.category != 'detail':
+            _last.pop(self.name, None)
+            _last[self.name] = (end - self.start) / 1e9
+        return False
+
+
+def span(name, category='stage', **args):
+    """
+    Context manager timing a block
+    Args:
+        name: Span name in the trace and the status bar
+        category: 'stage', 'detail' or 'render'
+        args: Values shown with the event in the trace viewer
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def traced(name=None, category='stage'):
+    """Decorator timing every call of a function as a span (default name: its qualified name)"""
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(label, category, None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def export_chrome_trace(path):
+    """Write the recorded spans as Chrome trace-event JSON. Returns the number of events"""
+    recorded = list(_events)
+    metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                for tid, name in list(_thread_names.items())]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': metadata + recorded, 'displayTimeUnit': 'ms'}, f)
+    return len(recorded)
@@ -1,15 +1,108 @@
 import sys
+import logging
+import multiprocessing
+import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QFileDialog, QPushButton, 
                             QVBoxLayout, QHBoxLayout, QWidget, QLabel, QGroupBox,
-                            QSpinBox, QDoubleSpinBox, QStyle, QFrame)
+                            QSpinBox, QDoubleSpinBox, QProgressBar, QCheckBox)
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QPalette, QColor
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import pandas as pd
-import numpy as np
+import instrument
+from config import CALCULATION_CONFIG
 from data_processor import DataProcessor
+from pipeline import AnalysisPipeline, curve_title
+from curve_animation import CurveAnimator
+from curve_lod import MinMaxPyramid
+from follow import DataFollower
+from recording import compact_array
+from recording_cache import load_recording
+from result_store import ResultStore
+from workers import JobRunner
+from instrument import span, traced
+
+# Poll interval of follow mode, which also bounds its plot refresh rate
+FOLLOW_INTERVAL_MS = 250
+
+# Status bar text while a background job of each kind runs
+JOB_LABELS = {
+    'data': "Loading DATA file",
+    'cf1': "Loading CF1 file",
+    'plot': "Computing curve",
+}
+
+# Refresh interval of the stage timings in the status bar while they are recorded
+TIMINGS_INTERVAL_MS = 500
+# Number of most recent stages shown in the status bar
+TIMINGS_SHOWN = 6
+
+
+@traced('load_data_job')
+def load_data_job(job, file_name, results, cf1_params, threshold):
+    """
+    Read a DATA file (from its binary cache when possible) and run the stages that depend only on the data.
+    The impact analysis is left for later when the result store already holds the result for the
+    given parameters and threshold.
+    """
+    job.report(0)
+    content_hash = results.content_hash(file_name)
+    data = load_recording(file_name)
+    if data is not None:
+        data = compact_array(data)
+    job.report(60)
+    pipeline = AnalysisPipeline(data)
+    if data is not None and len(data) > 0:
+        pipeline.time_axis()
+        job.report(80)
+        stored = results.get(content_hash, cf1_params, threshold) if content_hash and cf1_params else None
+        if stored is None or not stored['analyzed']:
+            pipeline.impact_analysis()
+    job.report(100)
+    return file_name, data, pipeline, content_hash
+
+
+def load_cf1_job(job, file_name):
+    job.report(0)
+    return file_name, DataProcessor.read_cf1_file(file_name)
+
+
+@traced('plot_job')
+def plot_job(job, pipeline, results, content_hash):
+    """
+    Compute the curve, its display pyramid and the braking result on a private pipeline copy.
+    Results are taken from the result store when it has them and stored otherwise.
+    """
+    job.report(0)
+    stored = None
+    if content_hash is not None:
+        stored = results.get(content_hash, pipeline.params, pipeline.threshold)
+        if stored is not None:
+            pipeline.restore(stored)
+    curve_data = pipeline.display_curve()
+    job.report(50)
+    with span('curve_lod'):
+        curve_lod = MinMaxPyramid(curve_data['x'], curve_data['y']/10000) if curve_data['x'].size else None
+    job.report(80)
+    pipeline.braking()
+    if pipeline.is_cached('impact_analysis'):
+        # Cheap once the windows are analyzed; with a stored result they are only analyzed on request
+        pipeline.candidates()
+    if content_hash is not None and curve_lod is not None and (
+            stored is None or not stored['analyzed'] or stored['curve'] is None):
+        store_result(results, content_hash, pipeline)
+    job.report(100)
+    return pipeline, curve_lod
+
+
+def store_result(results, content_hash, pipeline):
+    """Put the analysis of a pipeline into the result store (the braking result at the detected impact point)"""
+    impact_data = pipeline.impact()
+    braking = None
+    if impact_data:
+        _, time_points = pipeline.time_axis()
+        braking = DataProcessor.calculate_braking(time_points, impact_data['impact_index'],
+                                                  impact_data['non_zero_count'], pipeline.distance_per_pulse())
+    results.put(content_hash, pipeline.params, pipeline.threshold, impact_data, braking,
+                np.count_nonzero(pipeline.data), pipeline.distance_per_pulse(), pipeline.curve())
+
 
 class BrakeCurveApp(QMainWindow):
     def __init__(self):
@@ -27,6 +120,15 @@ class BrakeCurveApp(QMainWindow):
         self.cf1_btn = QPushButton("Select CF1 File")
         self.plot_btn = QPushButton("Generate Curve")
         self.animate_btn = QPushButton("Animate Curve")
+        self.follow_btn = QPushButton("Follow DATA File")
+        self.follow_btn.setCheckable(True)
+        self.compare_btn = QPushButton("Compare Recordings")
+        self.prev_candidate_btn = QPushButton("◀ Candidate")
+        self.next_candidate_btn = QPushButton("Candidate ▶")
+        self.smooth_check = QCheckBox("Smooth Curve")
+        self.timings_check = QCheckBox("Record Timings")
+        self.timings_check.setChecked(instrument.is_enabled())
+        self.trace_btn = QPushButton("Export Trace...")
         
         # Initialize labels
         self.data_label = QLabel("No file selected")
@@ -39,9 +141,38 @@ class BrakeCurveApp(QMainWindow):
         self.cf1_file = None
         self.data = None
         self.cf1_params = None
+        self.pipeline = AnalysisPipeline()
+        self.curve_data = None
+        self.curve_line = None
+        self.curve_lod = None  # Min/max pyramid of the displayed curve
+        self.curve_lods = {}  # Pyramids of the plotted recording by smoothing factor
         self.animation_timer = QTimer()
         self.animation_timer.timeout.connect(self.update_animation)
-        self.animation_index = 0
+        self.animator = None
+        self.follower = None
+        self.overlay_window = None
+        # Results of earlier analyses, keyed by DATA content, parameters and threshold
+        self.results = ResultStore()
+        self.content_hash = None  # Of the loaded DATA file; None while the data comes from follow mode
+        self.follow_timer = QTimer()
+        self.follow_timer.timeout.connect(self.poll_follow)
+        
+        # Loading and analysis run in the background; results come back through signals
+        self.jobs = JobRunner(parent=self)
+        self.jobs.progress.connect(self.on_job_progress)
+        self.jobs.finished.connect(self.on_job_finished)
+        self.jobs.failed.connect(self.on_job_failed)
+        self.plot_pending = False  # Generate Curve was pressed while the DATA file was loading
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        
+        # Stage timings (see instrument.py)
+        self.timings_label = QLabel()
+        self.statusBar().addPermanentWidget(self.timings_label)
+        self.timings_timer = QTimer()
+        self.timings_timer.timeout.connect(self.update_timings)
         
         # Add threshold input
         self.threshold_spin = QDoubleSpinBox()
@@ -122,6 +253,13 @@ class BrakeCurveApp(QMainWindow):
         self.cf1_btn.clicked.connect(self.select_cf1_file)
         self.plot_btn.clicked.connect(self.plot_curve)
         self.animate_btn.clicked.connect(self.toggle_animation)
+        self.follow_btn.toggled.connect(self.toggle_follow)
+        self.compare_btn.clicked.connect(self.open_overlay)
+        self.prev_candidate_btn.clicked.connect(lambda: self.step_candidate(-1))
+        self.next_candidate_btn.clicked.connect(lambda: self.step_candidate(1))
+        self.smooth_check.toggled.connect(self.toggle_smoothing)
+        self.timings_check.toggled.connect(self.toggle_timings)
+        self.trace_btn.clicked.connect(self.export_trace)
         
         # Create main widget and layout
         main_widget = QWidget()
@@ -163,7 +301,7 @@ class BrakeCurveApp(QMainWindow):
         param_layout.setSpacing(15)
         
         # Create parameter widgets with consistent layout
-        def create_param_widget(label_text, spin_box, default_value, value_range):
+        def create_param_widget(label_text, spin_box, default_value, value_range, connect=True):
             widget = QWidget()
             layout = QHBoxLayout(widget)
             layout.setContentsMargins(0, 0, 0, 0)
@@ -171,7 +309,8 @@ class BrakeCurveApp(QMainWindow):
             label.setMinimumWidth(150)
             spin_box.setRange(*value_range)
             spin_box.setValue(default_value)
-            spin_box.valueChanged.connect(self.update_parameters)
+            if connect:
+                spin_box.valueChanged.connect(self.update_parameters)
             layout.addWidget(label)
             layout.addWidget(spin_box)
             return widget
@@ -187,8 +326,10 @@ class BrakeCurveApp(QMainWindow):
             "Impact Threshold:", 
             self.threshold_spin, 
             2.0, 
-            (0.1, 10.0)
+            (0.1, 10.0),
+            connect=False
         )
+        self.threshold_spin.valueChanged.connect(self.update_threshold)
         param_layout.addWidget(speed_widget)
         param_layout.addWidget(motor_widget)
         param_layout.addWidget(holes_widget)
@@ -218,7 +359,18 @@ class BrakeCurveApp(QMainWindow):
         control_layout.setSpacing(10)
         
         control_layout.addWidget(self.plot_btn)
+        
+        # Jump between the impact candidates, strongest first
+        candidate_layout = QHBoxLayout()
+        candidate_layout.addWidget(self.prev_candidate_btn)
+        candidate_layout.addWidget(self.next_candidate_btn)
+        control_layout.addLayout(candidate_layout)
+        control_layout.addWidget(self.smooth_check)
         control_layout.addWidget(self.animate_btn)
+        control_layout.addWidget(self.follow_btn)
+        control_layout.addWidget(self.compare_btn)
+        control_layout.addWidget(self.timings_check)
+        control_layout.addWidget(self.trace_btn)
         control_group.setLayout(control_layout)
         
         # Add groups to left panel
@@ -232,84 +384,206 @@ class BrakeCurveApp(QMainWindow):
         right_layout = QVBoxLayout(right_panel)
         right_layout.setContentsMargins(20, 20, 20, 20)
         
+        # The matplotlib canvas is created by init_plot_area once the window is shown
+        self.figure = None
+        self.canvas = None
+        self.toolbar = None
+        self.ax = None
+        self.plot_layout = right_layout
+        self.plot_placeholder = QLabel("Loading plot...")
+        self.plot_placeholder.setAlignment(Qt.AlignCenter)
+        right_layout.addWidget(self.plot_placeholder)
+        
+        # Add panels to main layout
+        layout.addWidget(left_panel)
+        layout.addWidget(right_panel, stretch=1)
+        
+        # Add draggable impact line functionality
+        self.impact_line = None
+        self.impact_text = None
+        self.dragging_impact = False
+        self.drag_background = None
+        
+        self.toggle_timings(self.timings_check.isChecked())
+
+    def init_plot_area(self):
+        """
+        Create the matplotlib figure and canvas.
+        Importing matplotlib is the slowest part of startup, so this runs after the window is shown.
+        """
+        if self.canvas is not None:
+            return
+        
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+        from matplotlib.figure import Figure
+        
         # Create matplotlib figure with better styling
         self.figure = Figure(figsize=(10, 8), dpi=100)
         self.canvas = FigureCanvas(self.figure)
+        # Every full redraw, including those requested with draw_idle, is a 'canvas.draw' span
+        self.canvas.draw = traced('canvas.draw', 'render')(self.canvas.draw)
         self.ax = self.figure.add_subplot(111)
         self.ax.grid(True, linestyle='--', alpha=0.7)
         self.ax.set_xlabel('Time (s)', fontsize=10)
         self.ax.set_ylabel('Speed (mm/s)', fontsize=10)
         self.ax.set_title('Brake Curve', fontsize=12, pad=15)
         
-        right_layout.addWidget(self.canvas)
+        self.plot_layout.replaceWidget(self.plot_placeholder, self.canvas)
+        self.plot_placeholder.deleteLater()
+        self.plot_placeholder = None
+        # Zoom and pan
+        self.toolbar = NavigationToolbar(self.canvas, self)
+        self.plot_layout.insertWidget(0, self.toolbar)
         
-        # Add panels to main layout
-        layout.addWidget(left_panel)
-        layout.addWidget(right_panel, stretch=1)
-        
-        # Add draggable impact line functionality
-        self.impact_line = None
-        self.dragging_impact = False
         self.canvas.mpl_connect('button_press_event', self.on_mouse_press)
         self.canvas.mpl_connect('button_release_event', self.on_mouse_release)
         self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)
+        self.canvas.mpl_connect('resize_event', lambda event: self.show_curve_view())
+
+    def on_job_progress(self, kind, percent):
+        self.statusBar().showMessage(f"{JOB_LABELS.get(kind, kind)}...")
+        self.progress_bar.setValue(percent)
+        self.progress_bar.show()
+
+    def on_job_finished(self, kind, result):
+        handlers = {
+            'data': self.on_data_loaded,
+            'cf1': self.on_cf1_loaded,
+            'plot': self.on_curve_computed,
+        }
+        handlers[kind](result)
+        self.update_job_status()
+
+    def on_job_failed(self, kind, message):
+        if message:
+            print(f"Error in {JOB_LABELS.get(kind, kind).lower()}: {message}")
+            self.statusBar().showMessage(f"{JOB_LABELS.get(kind, kind)} failed: {message}", 5000)
+        if kind == 'data':
+            self.plot_pending = False
+        self.update_job_status()
+
+    def update_job_status(self):
+        if not self.jobs.is_busy():
+            self.progress_bar.hide()
+            self.statusBar().clearMessage()
+
+    def toggle_timings(self, enabled):
+        """Start or stop recording stage timings"""
+        instrument.enable(enabled)
+        self.trace_btn.setEnabled(enabled)
+        if enabled:
+            self.timings_timer.start(TIMINGS_INTERVAL_MS)
+            self.update_timings()
+        else:
+            self.timings_timer.stop()
+            self.timings_label.clear()
+
+    def update_timings(self):
+        """Show the duration of the most recent stages in the status bar"""
+        timings = list(instrument.last_timings().items())[-TIMINGS_SHOWN:]
+        self.timings_label.setText("  |  ".join(f"{name} {seconds*1000:.1f} ms" for name, seconds in timings))
+
+    def export_trace(self):
+        """Save the recorded timings as a Chrome trace (chrome://tracing, ui.perfetto.dev)"""
+        file_name, _ = QFileDialog.getSaveFileName(self, "Export Trace", "brake_curve_trace.json",
+                                                   "Trace Files (*.json);;All Files (*)")
+        if not file_name:
+            return
+        try:
+            count = instrument.export_chrome_trace(file_name)
+            self.statusBar().showMessage(f"Exported {count} timing events to {file_name.split('/')[-1]}", 5000)
+        except OSError as e:
+            print(f"Error exporting trace: {str(e)}")
 
     def select_data_file(self):
         file_name, _ = QFileDialog.getOpenFileName(self, "Select DATA File", "", "DATA Files (*.data);;All Files (*)")
         if file_name:
-            self.data_file = file_name
-            self.data_label.setText(file_name.split('/')[-1])
-            self.data = self.read_data_file()
+            self.load_data_file(file_name)
+
+    def load_data_file(self, file_name):
+        """Start loading a DATA file in the background; a load or plot still running is cancelled"""
+        if self.follower is not None:
+            self.follow_btn.setChecked(False)
+        self.data_file = file_name
+        self.data_label.setText(f"Loading {file_name.split('/')[-1]}...")
+        self.jobs.cancel('plot')
+        cf1_params = dict(self.cf1_params) if self.cf1_params else None
+        self.jobs.submit('data', load_data_job, file_name, self.results, cf1_params, self.threshold_spin.value())
+
+    def on_data_loaded(self, result):
+        file_name, data, pipeline, self.content_hash = result
+        self.data_label.setText(file_name.split('/')[-1])
+        # The pipeline's array: a cached recording arrives as a memory map, which set_data wraps
+        self.data = pipeline.data
+        if self.cf1_params:
+            pipeline.set_params(self.cf1_params)
+        pipeline.set_threshold(self.threshold_spin.value())
+        self.pipeline = pipeline
+        # The plotted curve belongs to the previous file until the next Generate Curve
+        self.curve_data = None
+        self.curve_line = None
+        self.curve_lod = None
+        self.curve_lods = {}
+        self.clear_braking()
+        if self.plot_pending:
+            self.plot_pending = False
+            self.plot_curve()
 
     def select_cf1_file(self):
         file_name, _ = QFileDialog.getOpenFileName(self, "Select CF1 File", "", "CF1 Files (*.CF1);;All Files (*)")
         if file_name:
-            try:
-                self.cf1_file = file_name
-                self.cf1_label.setText(file_name.split('/')[-1])
-                self.cf1_params = self.read_cf1_file()
+            self.cf1_label.setText(f"Loading {file_name.split('/')[-1]}...")
+            self.jobs.submit('cf1', load_cf1_job, file_name)
+
+    def on_cf1_loaded(self, result):
+        file_name, cf1_params = result
+        try:
+            self.cf1_file = file_name
+            self.cf1_label.setText(file_name.split('/')[-1])
+            self.cf1_params = cf1_params
+            
+            if self.cf1_params:
+                print("CF1 parameters read:", self.cf1_params)  # Debug print
+                
+                # Update parameter values from CF1 file with explicit type conversion
+                p251 = int(self.cf1_params.get('P0251', 670))
+                p360 = int(self.cf1_params.get('P0360', 1500))
+                p361 = int(self.cf1_params.get('P0361', 4))
+                p544 = int(self.cf1_params.get('P0544', 5017))
                 
-                if self.cf1_params:
-                    print("CF1 parameters read:", self.cf1_params)  # Debug print
-                    
-                    # Update parameter values from CF1 file with explicit type conversion
-                    p251 = int(self.cf1_params.get('P0251', 670))
-                    p360 = int(self.cf1_params.get('P0360', 1500))
-                    p361 = int(self.cf1_params.get('P0361', 4))
-                    p544 = int(self.cf1_params.get('P0544', 5017))
-                    
-                    print(f"Setting values - P251: {p251}, P360: {p360}, P361: {p361}, P544: {p544}")  # Debug print
-                    
-                    # Block signals temporarily to prevent multiple updates
-                    self.speed_spin.blockSignals(True)
-                    self.motor_spin.blockSignals(True)
-                    self.holes_spin.blockSignals(True)
-                    self.pulses_spin.blockSignals(True)
-                    
-                    # Set values
-                    self.speed_spin.setValue(p251)
-                    self.motor_spin.setValue(p360)
-                    self.holes_spin.setValue(p361)
-                    self.pulses_spin.setValue(p544)
-                    
-                    # Unblock signals
-                    self.speed_spin.blockSignals(False)
-                    self.motor_spin.blockSignals(False)
-                    self.holes_spin.blockSignals(False)
-                    self.pulses_spin.blockSignals(False)
-                    
-                    # Update calculated values display
-                    self.update_parameters()
-                    
-                    # Update parameter group title to show file name
-                    param_group = self.findChild(QGroupBox, "param_group")
-                    if param_group:
-                        param_group.setTitle(f"Parameters (from {file_name.split('/')[-1]})")
-                    
-            except Exception as e:
-                print(f"Error loading CF1 file: {str(e)}")
-                import traceback
-                print(f"Traceback: {traceback.format_exc()}")
+                print(f"Setting values - P251: {p251}, P360: {p360}, P361: {p361}, P544: {p544}")  # Debug print
+                
+                # Block signals temporarily to prevent multiple updates
+                self.speed_spin.blockSignals(True)
+                self.motor_spin.blockSignals(True)
+                self.holes_spin.blockSignals(True)
+                self.pulses_spin.blockSignals(True)
+                
+                # Set values
+                self.speed_spin.setValue(p251)
+                self.motor_spin.setValue(p360)
+                self.holes_spin.setValue(p361)
+                self.pulses_spin.setValue(p544)
+                
+                # Unblock signals
+                self.speed_spin.blockSignals(False)
+                self.motor_spin.blockSignals(False)
+                self.holes_spin.blockSignals(False)
+                self.pulses_spin.blockSignals(False)
+                
+                # Update calculated values display
+                self.update_parameters()
+                
+                # Update parameter group title to show file name
+                param_group = self.findChild(QGroupBox, "param_group")
+                if param_group:
+                    param_group.setTitle(f"Parameters (from {file_name.split('/')[-1]})")
+                
+        except Exception as e:
+            print(f"Error loading CF1 file: {str(e)}")
+            import traceback
+            print(f"Traceback: {traceback.format_exc()}")
 
     def update_parameters(self):
         if not self.cf1_params:
@@ -352,9 +626,27 @@ class BrakeCurveApp(QMainWindow):
         except Exception as e:
             print(f"Error calculating parameters: {str(e)}")
             self.calc_label.setText("Error calculating parameters")
+        
+        # Rescale the plotted curve and braking distance to the new parameters
+        self.pipeline.set_params(self.cf1_params)
+        self.refresh_analysis()
 
     def plot_curve(self):
         try:
+            self.init_plot_area()
+            if self.animator is not None:
+                self.stop_animation()
+            
+            if self.follower is not None:
+                # Stopping follow mode plots the complete recording
+                self.follow_btn.setChecked(False)
+                return
+            
+            if self.jobs.is_busy('data'):
+                # Plot the new file as soon as it has been read
+                self.plot_pending = True
+                return
+            
             # Check if data is available
             if self.data is None or self.cf1_params is None:
                 print("Error: Missing data or parameters")
@@ -373,107 +665,367 @@ class BrakeCurveApp(QMainWindow):
             print(f"First few time differences: {self.data[:5]}")
             print(f"Last few time differences: {self.data[-5:]}")
                 
-            self.ax.clear()
-            curve_data = self.generate_brake_curve(self.data, self.cf1_params)
+            if self.pipeline.data is not self.data:
+                self.pipeline.set_data(self.data)
+            self.pipeline.set_params(self.cf1_params)
+            self.pipeline.set_threshold(self.threshold_spin.value())
+            self.pipeline.set_smoothing(self.curve_smoothing())
+            self.jobs.submit('plot', plot_job, self.pipeline.copy(), self.results, self.content_hash)
+            
+        except Exception as e:
+            print(f"Error in plot_curve: {str(e)}")
+            import traceback
+            print(f"Traceback: {traceback.format_exc()}")
+
+    def on_curve_computed(self, result):
+        """Adopt the pipeline computed by plot_job and draw its curve"""
+        try:
+            pipeline, curve_lod = result
+            if pipeline.data is not self.data:
+                return
+            # The pyramid was built for the curve variant of the smoothing at that time
+            self.curve_lods = {pipeline.smoothing: curve_lod}
+            # Parameters, threshold or smoothing may have been edited while the curve was computed
+            pipeline.set_params(self.cf1_params)
+            pipeline.set_smoothing(self.curve_smoothing())
+            if pipeline.threshold != self.threshold_spin.value():
+                # Only a new threshold clears a manual impact point restored from the result store
+                pipeline.set_threshold(self.threshold_spin.value())
+            self.pipeline = pipeline
+            curve_data = self.pipeline.display_curve()
             
             if curve_data['x'].size == 0 or curve_data['y'].size == 0:
                 print("Error: No valid curve data generated")
                 return
             
-            # Plot main curve - convert speeds from mm/s to m/s for display only
-            self.ax.plot(curve_data['x'], curve_data['y']/10000)  # Divide by 1000 to convert mm/s to m/s
-            self.ax.grid(True)
-            self.ax.set_xlabel('Time (s)')
-            self.ax.set_ylabel('Speed (m/s)')
-            
-            # Update title with parameters
-            title = (f'Brake Curve\n'
-                    f'P251: {self.cf1_params.get("P0251")} mm/s, '
-                    f'P360: {self.cf1_params.get("P0360")} rpm\n'
-                    f'P361: {self.cf1_params.get("P0361")}, '
-                    f'P544: {self.cf1_params.get("P0544")}')
-            
-            # Calculate impact points
-            impact_data = DataProcessor.calculate_impact_points(
-                self.data, 
-                self.threshold_spin.value()
-            )
-            
-            if impact_data:
-                impact_index = impact_data['impact_index']
-                non_zero_count = impact_data['non_zero_count']
-                debug_info = impact_data['debug_info']
-                
-                # Draw impact line and store reference
-                adjusted_index = max(0, impact_index - 2)  # Ensure index doesn't go below 0
-                impact_time = curve_data['x'][adjusted_index]
-                self.impact_line = self.ax.axvline(x=impact_time, color='red', 
-                                                 linestyle='--', label='Impact Point')
+            with span('plot_curve.display'):
+                # Plot main curve - convert speeds from mm/s to m/s for display only
+                self.ensure_plot_artists()
+                self.select_curve_lod(curve_data)
+                self.ax.set_autoscale_on(True)
+                self.fit_curve_view()
                 
-                # Store curve data for manual adjustment
+                # Store curve data for manual adjustment and animation
                 self.curve_data = curve_data
-                
-                # Calculate braking distance
-                distance_per_pulse = DataProcessor.calculate_distance_per_pulse(self.cf1_params)
-                braking_pulses = non_zero_count - adjusted_index
-                braking_distance = braking_pulses * distance_per_pulse
-                
-                # Update braking distance display
-                self.update_braking_info(adjusted_index, non_zero_count, impact_time, 
-                                       braking_distance, debug_info)
-                
-                # Update plot title
-                title = self.ax.get_title().split('\n')[0]  # Keep first line
-                self.ax.set_title(f"{title}\nImpact at {impact_time:.2f}s, Braking Distance: {braking_distance:.2f}cm")
+                self.show_braking()
             
-            self.ax.set_title(title)
-            self.ax.legend()
             self.canvas.draw()
             
-            # Store curve data for animation
-            self.curve_data = curve_data
             print("\nCurve statistics:")
             print(f"Time range: {curve_data['x'].min():.3f} - {curve_data['x'].max():.3f} s")
             print(f"Speed range: {curve_data['y'].min():.3f} - {curve_data['y'].max():.3f} m/s")
             print(f"Total points plotted: {len(curve_data['x'])}")
             
         except Exception as e:
-            print(f"Error in plot_curve: {str(e)}")
+            print(f"Error drawing curve: {str(e)}")
             import traceback
             print(f"Traceback: {traceback.format_exc()}")
 
-    def toggle_animation(self):
-        if self.animation_timer.isActive():
-            self.animation_timer.stop()
-            self.animate_btn.setText("Animate Curve")
-        else:
-            self.animation_index = 0
-            self.animation_timer.start(50)  # 50ms interval
-            self.animate_btn.setText("Stop Animation")
-
-    def update_animation(self):
-        if not hasattr(self, 'curve_data'):
-            self.animation_timer.stop()
+    def ensure_plot_artists(self):
+        """Create the curve, impact line and impact label once; later plots only update their data"""
+        if self.curve_line is not None and self.curve_line.axes is self.ax and self.curve_line in self.ax.lines:
             return
-            
+        
+        from matplotlib.transforms import blended_transform_factory
+        
         self.ax.clear()
-        end_idx = min(self.animation_index + 10, len(self.curve_data['x']))
-        self.ax.plot(self.curve_data['x'][:end_idx], self.curve_data['y'][:end_idx])
+        # Clearing the axes also drops its callbacks
+        self.ax.callbacks.connect('xlim_changed', lambda ax: self.show_curve_view())
         self.ax.grid(True)
         self.ax.set_xlabel('Time (s)')
         self.ax.set_ylabel('Speed (m/s)')
-        self.ax.set_title('Brake Curve')
-        
-        # Set fixed axis limits
-        self.ax.set_xlim(0, max(self.curve_data['x']))
-        self.ax.set_ylim(0, max(self.curve_data['y']) * 1.1)
+        self.curve_line, = self.ax.plot([], [])
+        self.impact_line = self.ax.axvline(x=0, color='red', linestyle='--', label='Impact Point')
+        # Label at the top of the impact line, shown while it is dragged
+        self.impact_text = self.ax.text(0, 1.0, '', color='red', fontsize=9, va='bottom', ha='center',
+                                        transform=blended_transform_factory(self.ax.transData, self.ax.transAxes))
+        self.impact_text.set_visible(False)
+        self.ax.legend(loc='upper right')
+
+    def fit_curve_view(self):
+        """Autoscale to the whole curve unless the user has zoomed, then show the visible range"""
+        if self.ax.get_autoscale_on():
+            # relim only sees the line data, so give it the whole curve first
+            self.curve_line.set_data(*self.curve_lod.view(width=self.ax.bbox.width))
+            self.ax.relim()
+            self.ax.autoscale_view()
+        self.show_curve_view()
+
+    def show_curve_view(self):
+        """
+        Give the curve line only the points needed for the visible x-range at the current plot width.
+        Detection and braking always use the full-resolution curve_data.
+        """
+        if self.curve_lod is None or self.curve_line is None:
+            return
+        x_min, x_max = sorted(self.ax.get_xlim())
+        self.curve_line.set_data(*self.curve_lod.view(x_min, x_max, self.ax.bbox.width))
+
+    def clear_braking(self):
+        """Hide the impact point and braking information of a plot that no longer belongs to the data"""
+        self.braking_label.setText("")
+        if self.ax is None:
+            return
+        if self.impact_line is not None:
+            self.impact_line.set_visible(False)
+        self.ax.set_title(self.curve_title() if self.cf1_params else "")
+        self.canvas.draw_idle()
+
+    def curve_title(self, braking=None):
+        """Plot title with the parameters and, if available, the impact point"""
+        return curve_title(self.cf1_params, braking)
+
+    def show_braking(self):
+        """Move the impact line and update the braking information from the pipeline"""
+        braking = self.pipeline.braking()
+        if braking:
+            impact_time = braking['impact_time']
+            self.impact_line.set_xdata([impact_time, impact_time])
+            self.impact_line.set_visible(True)
+            impact_data = None if braking['manual'] else self.pipeline.impact()
+            candidate = self.current_candidate(braking)
+            if impact_data is None and candidate is not None:
+                impact_data = candidate
+            self.update_braking_info(braking['index'], braking['non_zero_count'], impact_time,
+                                     braking['braking_distance'],
+                                     impact_data['debug_info'] if impact_data else None,
+                                     candidate)
+        else:
+            self.impact_line.set_visible(False)
+            self.braking_label.setText("No impact point detected")
+        self.ax.set_title(self.curve_title(braking))
+
+    def current_candidate(self, braking):
+        """Impact candidate at the shown impact point, None if there is none or they are not analyzed yet"""
+        if braking is None or not self.pipeline.is_cached('impact_analysis'):
+            return None
+        for candidate in self.pipeline.candidates():
+            if max(0, candidate['impact_index'] - 2) == braking['index']:
+                return candidate
+        return None
+
+    def step_candidate(self, step):
+        """Move the impact point to the next (step 1) or previous (step -1) impact candidate"""
+        try:
+            if self.curve_data is None or self.follower is not None:
+                return
+            candidates = self.pipeline.candidates()
+            if not candidates:
+                self.statusBar().showMessage(
+                    f"No impact candidates at threshold {self.pipeline.threshold}", 3000)
+                return
+            
+            current = self.current_candidate(self.pipeline.braking())
+            if current is None:
+                rank = 0 if step > 0 else len(candidates) - 1
+            else:
+                rank = (current['rank'] + step) % len(candidates)
+            
+            # The detected impact point is not a manual one
+            index = max(0, candidates[rank]['impact_index'] - 2)
+            impact_data = self.pipeline.impact()
+            if impact_data and index == max(0, impact_data['impact_index'] - 2):
+                index = None
+            self.set_impact_index(index)
+            self.show_braking()
+            self.canvas.draw_idle()
+            
+        except Exception as e:
+            print(f"Error selecting impact candidate: {str(e)}")
+
+    def refresh_analysis(self):
+        """Update the plotted curve and impact point from the cached pipeline without replotting"""
+        try:
+            if self.follower is not None:
+                self.follower.set_distance_per_pulse(self.pipeline.distance_per_pulse())
+                self.follower.set_threshold(self.pipeline.threshold)
+                self.show_follow()
+                return
+            
+            if self.curve_data is None or self.curve_line is None:
+                return
+            
+            curve_data = self.pipeline.display_curve()
+            if curve_data['y'].size == 0:
+                return
+            if curve_data is not self.curve_data:
+                self.select_curve_lod(curve_data)
+                self.curve_data = curve_data
+                self.show_curve_view()
+                self.ax.relim()
+                self.ax.autoscale_view()
+            
+            self.show_braking()
+            self.canvas.draw_idle()
+            
+        except Exception as e:
+            print(f"Error refreshing analysis: {str(e)}")
+
+    def select_curve_lod(self, curve_data):
+        """
+        Display the pyramid of the current curve variant, building it on first use.
+        Smoothing moves the extremes, so each smoothing factor has its own pyramid. New parameters
+        only rescale the speeds by a positive factor (the smoothing is linear), so an existing
+        pyramid of the same variant stays valid and only gets the new speeds.
+        """
+        y = curve_data['y']/10000  # Convert mm/s to m/s for display only
+        curve_lod = self.curve_lods.get(self.pipeline.smoothing)
+        if curve_lod is None:
+            curve_lod = MinMaxPyramid(curve_data['x'], y)
+            self.curve_lods[self.pipeline.smoothing] = curve_lod
+        else:
+            curve_lod.set_y(y)
+        self.curve_lod = curve_lod
+
+    def curve_smoothing(self):
+        """Smoothing factor of the displayed curve: the configured one while Smooth Curve is checked"""
+        return CALCULATION_CONFIG['curve_smoothing'] if self.smooth_check.isChecked() else 0
+
+    def toggle_smoothing(self):
+        """Show the smoothed or the original curve; the impact point and braking distance do not change"""
+        self.pipeline.set_smoothing(self.curve_smoothing())
+        self.refresh_analysis()
+
+    def update_threshold(self):
+        """Move the impact line to the impact point of the new threshold without replotting"""
+        self.pipeline.set_threshold(self.threshold_spin.value())
+        self.refresh_analysis()
+
+    def toggle_follow(self, checked):
+        if checked:
+            self.start_follow()
+        else:
+            self.stop_follow()
+
+    def start_follow(self):
+        """Watch the selected DATA file and plot it while it is being written"""
+        self.init_plot_area()
+        if self.data_file is None or not self.cf1_params:
+            print("Error: Select a DATA file and CF1 parameters before following")
+            self.follow_btn.setChecked(False)
+            return
+        if self.animator is not None:
+            self.stop_animation()
+        self.jobs.cancel()
+        self.plot_pending = False
         
-        self.canvas.draw()
+        self.pipeline.set_params(self.cf1_params)
+        self.pipeline.set_threshold(self.threshold_spin.value())
+        self.follower = DataFollower(self.data_file, self.pipeline.threshold, self.pipeline.distance_per_pulse())
+        # The followed data is not the hashed file contents
+        self.content_hash = None
+        self.curve_data = None
+        self.curve_line = None
+        self.curve_lod = None
+        self.curve_lods = {}
+        self.follow_btn.setText("Stop Following")
+        self.statusBar().showMessage(f"Following {self.data_file.split('/')[-1]}")
+        self.poll_follow()
+        if self.follower is not None:
+            self.follow_timer.start(FOLLOW_INTERVAL_MS)
+
+    def stop_follow(self):
+        """Read the rest of the file and switch to the normal analysis of the complete recording"""
+        self.follow_timer.stop()
+        follower = self.follower
+        if follower is None:
+            return
+        self.follower = None
+        self.follow_btn.setText("Follow DATA File")
+        self.statusBar().clearMessage()
+        try:
+            follower.poll(final=True)
+        except Exception as e:
+            print(f"Error reading DATA file: {str(e)}")
+        self.data = follower.data.copy()
+        self.plot_curve()
+
+    def poll_follow(self):
+        """Timer slot: parse what was appended and refresh the plot"""
+        try:
+            if self.follower.poll():
+                self.show_follow()
+        except Exception as e:
+            print(f"Error following DATA file: {str(e)}")
+            self.follow_btn.setChecked(False)
+            return
+        if self.follower.finished:
+            # The filter has stopped, nothing written from now on is used
+            self.follow_btn.setChecked(False)
+
+    def show_follow(self):
+        """Plot the data read so far and the impact point found so far"""
+        follower = self.follower
+        if len(follower.data) == 0:
+            return
+        self.ensure_plot_artists()
+        time_points = follower.time_points
+        speeds = follower.speeds/10000
+        if self.curve_lod is None:
+            self.curve_lod = MinMaxPyramid(time_points, speeds)
+        else:
+            self.curve_lod.extend(time_points, speeds)
+        self.fit_curve_view()
         
-        self.animation_index = end_idx
-        if end_idx >= len(self.curve_data['x']):
+        impact_data = follower.impact()
+        braking = None
+        if impact_data:
+            braking = DataProcessor.calculate_braking(time_points, impact_data['impact_index'],
+                                                      impact_data['non_zero_count'], follower.distance_per_pulse)
+            impact_time = braking['impact_time']
+            self.impact_line.set_xdata([impact_time, impact_time])
+            self.impact_line.set_visible(True)
+            self.update_braking_info(braking['index'], impact_data['non_zero_count'], impact_time,
+                                     braking['braking_distance'], impact_data['debug_info'])
+        else:
+            self.impact_line.set_visible(False)
+            self.braking_label.setText(f"Following: {len(follower.data)} data points, no impact point yet")
+        self.ax.set_title(self.curve_title(braking))
+        self.canvas.draw_idle()
+
+    def open_overlay(self):
+        """Open the window comparing many recordings; it uses the current threshold and CF1 file"""
+        if self.overlay_window is None:
+            from overlay import OverlayWindow
+            self.overlay_window = OverlayWindow(self.threshold_spin.value(), self.cf1_file)
+        self.overlay_window.show()
+        self.overlay_window.raise_()
+
+    def toggle_animation(self):
+        self.init_plot_area()
+        if self.animator is not None:
+            self.stop_animation()
+        elif self.curve_data is not None and self.curve_line is not None:
+            self.animator = CurveAnimator(self.canvas, self.ax, self.curve_line,
+                                          self.curve_data['x'], self.curve_data['y']/10000)
+            self.animator.start()
+            self.animation_timer.start(self.animator.interval_ms)
+            self.animate_btn.setText("Stop Animation")
+
+    def stop_animation(self):
+        self.animation_timer.stop()
+        if self.animator is not None:
+            self.animator.stop()
+            self.animator = None
+        self.animate_btn.setText("Animate Curve")
+
+    def update_animation(self):
+        if self.animator is None:
             self.animation_timer.stop()
-            self.animate_btn.setText("Animate Curve")
+            return
+        
+        if self.animator.step():
+            self.stop_animation()
+        else:
+            self.animation_timer.setInterval(self.animator.interval_ms)
+
+    def closeEvent(self, event):
+        # Jobs cannot be interrupted mid-read; let them end before the window goes away
+        self.follow_timer.stop()
+        self.timings_timer.stop()
+        self.jobs.cancel()
+        self.jobs.wait()
+        super().closeEvent(event)
 
     def read_data_file(self):
         return DataProcessor.read_data_file(self.data_file)
@@ -486,20 +1038,41 @@ class BrakeCurveApp(QMainWindow):
 
     def on_mouse_press(self, event):
         """Handle mouse press events"""
-        if event.inaxes != self.ax or not self.impact_line:
+        if self.animator is not None or self.follower is not None:
+            return
+        if self.curve_data is None:
+            return
+        if event.inaxes != self.ax or not self.impact_line or not self.impact_line.get_visible():
+            return
+        # Leave the mouse to the toolbar while zoom or pan is active
+        if self.toolbar is not None and self.toolbar.mode:
             return
         
         # Check if click is near the impact line
         impact_x = self.impact_line.get_xdata()[0]
-        if abs(event.xdata - impact_x) < (max(self.curve_data['x']) * 0.01):  # Within 1% of total time range
+        if abs(event.xdata - impact_x) < (self.curve_data['x'][-1] * 0.01):  # Within 1% of total time range
             self.dragging_impact = True
+            
+            # Draw everything except the impact line and its label once, and keep it as background
+            self.impact_line.set_animated(True)
+            self.impact_text.set_animated(True)
+            self.impact_text.set_visible(True)
+            self.canvas.draw()
+            self.drag_background = self.canvas.copy_from_bbox(self.ax.bbox)
+            self.blit_impact_line(impact_x)
 
     def on_mouse_release(self, event):
         """Handle mouse release events"""
         if self.dragging_impact:
             self.dragging_impact = False
+            self.drag_background = None
+            self.impact_line.set_animated(False)
+            self.impact_text.set_animated(False)
+            self.impact_text.set_visible(False)
             if event.inaxes == self.ax:
                 self.update_impact_point(event.xdata)
+            else:
+                self.canvas.draw()
 
     def on_mouse_move(self, event):
         """Handle mouse movement events"""
@@ -507,37 +1080,33 @@ class BrakeCurveApp(QMainWindow):
             return
         
         # Update impact line position
-        self.impact_line.set_xdata([event.xdata, event.xdata])
-        self.canvas.draw()
+        self.blit_impact_line(event.xdata)
+
+    def blit_impact_line(self, x):
+        """Redraw only the impact line and its label over the cached background"""
+        index = DataProcessor.nearest_index(self.curve_data['x'], x)
+        self.impact_line.set_xdata([x, x])
+        self.impact_text.set_x(x)
+        self.impact_text.set_text(f"{x:.3f} s (Data #{index + 1})")
+        
+        self.canvas.restore_region(self.drag_background)
+        self.ax.draw_artist(self.impact_line)
+        self.ax.draw_artist(self.impact_text)
+        self.canvas.blit(self.ax.bbox)
 
     def update_impact_point(self, new_time):
         """Update impact point and recalculate braking distance"""
         try:
-            if not hasattr(self, 'curve_data') or self.curve_data is None:
+            if self.curve_data is None:
                 return
             
             # Find the nearest data point index
             time_array = self.curve_data['x']
-            new_index = np.abs(time_array - new_time).argmin()
+            new_index = DataProcessor.nearest_index(time_array, new_time)
             
-            # Calculate braking distance
-            non_zero_count = np.sum(self.data != 0)
-            distance_per_pulse = DataProcessor.calculate_distance_per_pulse(self.cf1_params)
-            braking_pulses = non_zero_count - new_index
-            braking_distance = braking_pulses * distance_per_pulse
-            
-            # Update display using the common update method
-            self.update_braking_info(
-                index=new_index,
-                non_zero_count=non_zero_count,
-                impact_time=new_time,
-                braking_distance=braking_distance,
-                debug_info=None  # No debug info for manual adjustment
-            )
-            
-            # Update plot title
-            title = self.ax.get_title().split('\n')[0]  # Keep first line
-            self.ax.set_title(f"{title}\nImpact at {new_time:.2f}s, Braking Distance: {braking_distance:.2f}cm")
+            # Recalculate braking distance at the manual impact point
+            self.set_impact_index(int(new_index))
+            self.show_braking()
             self.canvas.draw()
             
         except Exception as e:
@@ -545,7 +1114,15 @@ class BrakeCurveApp(QMainWindow):
             import traceback
             print(f"Traceback: {traceback.format_exc()}")
 
-    def update_braking_info(self, index, non_zero_count, impact_time, braking_distance, debug_info=None):
+    def set_impact_index(self, index):
+        """Use a manual impact point (None: the detected one) and remember it in the result store"""
+        self.pipeline.set_impact_index(index)
+        if self.content_hash is not None:
+            self.results.set_manual_impact(self.content_hash, self.pipeline.params, self.pipeline.threshold,
+                                           self.pipeline.impact_index)
+
+    def update_braking_info(self, index, non_zero_count, impact_time, braking_distance, debug_info=None,
+                            candidate=None):
         """Update braking information display"""
         # Calculate brake pulses
         braking_pulses = non_zero_count - index
@@ -559,6 +1136,10 @@ class BrakeCurveApp(QMainWindow):
             f"Impact Time: {impact_time:.3f} s"
         )
         
+        if candidate is not None:
+            info_text += (f"\nCandidate {candidate['rank'] + 1} of {len(self.pipeline.candidates())} "
+                          f"(margin {candidate['margin']:.3f})")
+        
         if debug_info:  # Add debug info if available (for automatic detection)
             info_text += (
                 f"\nImpact Detection Values:\n"
@@ -572,7 +1153,14 @@ class BrakeCurveApp(QMainWindow):
         self.braking_label.setText(info_text)
 
 if __name__ == '__main__':
+    # The comparison window analyzes recordings in worker processes, also in the frozen build
+    multiprocessing.freeze_support()
+    # Show the analysis diagnostics on the console
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logging.getLogger('data_processor').setLevel(logging.DEBUG)
     app = QApplication(sys.argv)
     window = BrakeCurveApp()
     window.show()
+    # Build the plot area right after the first window has been painted
+    QTimer.singleShot(0, window.init_plot_area)
     sys.exit(app.exec_()) 
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""
+Overlay of many brake recordings on shared axes.
+
+DATA files are analyzed on a process pool with the batch analysis (each with its CF1 file,
+resolved like batch.py does). Curves appear as soon as their recording is done; every curve is
+drawn through its own min/max pyramid, so dozens of long recordings stay responsive. Curves
+are kept in float32 (see recording.py). A table lists the braking distance of every recording.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+                             QFileDialog, QTableWidget, QTableWidgetItem, QCheckBox, QSplitter,
+                             QProgressBar, QHeaderView, QAbstractItemView)
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import Qt
+
+import batch
+from curve_lod import MinMaxPyramid
+from workers import JobRunner, JobCancelled
+
+# Summary table columns
+COLUMNS = ('Recording', 'CF1', 'Impact (s)', 'Brake Pulses', 'Braking Distance (cm)', 'Error')
+
+
+def load_overlay_job(job, tasks, workers=None):
+    """
+    Analyze recordings on a process pool
+    Publishes (row, curve_lod) for each recording as soon as it is done
+    Returns: Number of recordings
+    """
+    if not tasks:
+        return 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=batch._init_worker) as executor:
+        futures = [executor.submit(batch._analyze_curve_task, task) for task in tasks]
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                row, curve_data = future.result()
+                curve_lod = None
+                if curve_data is not None:
+                    # Speeds as displayed by the main window (m/s), converted in place
+                    curve_data['y'] /= 10000
+                    curve_lod = MinMaxPyramid(curve_data['x'], curve_data['y'])
+                job.publish((row, curve_lod))
+                job.report(100 * done / len(tasks))
+        except JobCancelled:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return len(tasks)
+
+
+class OverlayWindow(QMainWindow):
+    def __init__(self, threshold=2.0, default_cf1=None, parent=None):
+        """
+        Args:
+            threshold: Impact threshold for every recording
+            default_cf1: CF1 file for recordings without a CF1 file of their own
+        """
+        super().__init__(parent)
+        self.setWindowTitle('Compare Brake Curves')
+        self.setGeometry(150, 150, 1300, 850)
+        self.threshold = threshold
+        self.default_cf1 = default_cf1
+        self.recordings = []  # Dicts with row, curve_lod, line, marker and color
+
+        self.add_btn = QPushButton("Add DATA Files")
+        self.cf1_btn = QPushButton("Default CF1 File")
+        self.clear_btn = QPushButton("Clear")
+        self.align_check = QCheckBox("Align at impact point")
+        self.cf1_label = QLabel(self._cf1_text())
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.hide()
+
+        self.add_btn.clicked.connect(self.select_data_files)
+        self.cf1_btn.clicked.connect(self.select_default_cf1)
+        self.clear_btn.clicked.connect(self.clear)
+        self.align_check.toggled.connect(self.redraw_curves)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSortingEnabled(True)
+        self.table.itemSelectionChanged.connect(self.highlight_selection)
+
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+        from matplotlib.figure import Figure
+        from matplotlib import colormaps
+
+        self.figure = Figure(figsize=(10, 6), dpi=100)
+        self.canvas = FigureCanvas(self.figure)
+        self.toolbar = NavigationToolbar(self.canvas, self)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.grid(True)
+        self.ax.set_ylabel('Speed (m/s)')
+        self.ax.callbacks.connect('xlim_changed', lambda ax: self.show_curve_views())
+        self.canvas.mpl_connect('resize_event', lambda event: self.show_curve_views())
+        self.colors = colormaps['tab20'].colors
+        self._update_xlabel()
+
+        buttons = QHBoxLayout()
+        for widget in (self.add_btn, self.cf1_btn, self.clear_btn, self.align_check):
+            buttons.addWidget(widget)
+        buttons.addWidget(self.cf1_label, stretch=1)
+
+        plot_widget = QWidget()
+        plot_layout = QVBoxLayout(plot_widget)
+        plot_layout.addWidget(self.toolbar)
+        plot_layout.addWidget(self.canvas)
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(plot_widget)
+        splitter.addWidget(self.table)
+        splitter.setSizes([600, 250])
+
+        main_widget = QWidget()
+        layout = QVBoxLayout(main_widget)
+        layout.addLayout(buttons)
+        layout.addWidget(splitter)
+        self.setCentralWidget(main_widget)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+
+        self.jobs = JobRunner(parent=self)
+        self.jobs.partial.connect(lambda kind, value: self.add_recording(*value))
+        self.jobs.progress.connect(self.on_progress)
+        self.jobs.finished.connect(lambda kind, count: self.on_done(f"{count} recordings analyzed"))
+        self.jobs.failed.connect(lambda kind, message: self.on_done(f"Loading failed: {message}" if message else ""))
+        self._pending_tasks = []
+
+    def _cf1_text(self):
+        name = os.path.basename(self.default_cf1) if self.default_cf1 else "none"
+        return f"Default CF1: {name}"
+
+    def select_default_cf1(self):
+        file_name, _ = QFileDialog.getOpenFileName(self, "Select CF1 File", "", "CF1 Files (*.CF1);;All Files (*)")
+        if file_name:
+            self.default_cf1 = file_name
+            self.cf1_label.setText(self._cf1_text())
+
+    def select_data_files(self):
+        file_names, _ = QFileDialog.getOpenFileNames(self, "Select DATA Files", "", "DATA Files (*.data);;All Files (*)")
+        if file_names:
+            self.load_files(file_names)
+
+    def load_files(self, file_names):
+        """Analyze DATA files in the background and add them to the overlay as they finish"""
+        loaded = {recording['row']['data_file'] for recording in self.recordings}
+        # Recordings of a load still running are submitted again together with the new ones
+        tasks = {task[0]: task for task in self._pending_tasks}
+        for path in (os.path.abspath(name) for name in file_names):
+            if path not in loaded and path not in tasks:
+                tasks[path] = (path, batch.resolve_cf1(path, None, self.default_cf1), self.threshold)
+        self._pending_tasks = list(tasks.values())
+        self.jobs.submit('overlay', load_overlay_job, self._pending_tasks)
+
+    def clear(self):
+        self.jobs.cancel()
+        self._pending_tasks = []
+        self.recordings = []
+        self.table.setRowCount(0)
+        for line in list(self.ax.lines):
+            line.remove()
+        self.ax.relim()
+        self.ax.set_autoscale_on(True)
+        self.ax.autoscale_view()
+        self.progress_bar.hide()
+        self.statusBar().clearMessage()
+        self.canvas.draw_idle()
+
+    def on_progress(self, kind, percent):
+        self.progress_bar.setValue(percent)
+        self.progress_bar.show()
+        self.statusBar().showMessage("Analyzing recordings...")
+
+    def on_done(self, message):
+        self._pending_tasks = []
+        self.progress_bar.hide()
+        self.statusBar().showMessage(message, 5000)
+
+    def _offset(self, recording):
+        """x shift of a recording: its impact time when aligning at the impact point"""
+        if self.align_check.isChecked() and recording['row']['impact_time'] is not None:
+            return recording['row']['impact_time']
+        return 0.0
+
+    def _update_xlabel(self):
+        self.ax.set_xlabel('Time from impact point (s)' if self.align_check.isChecked() else 'Time (s)')
+
+    def add_recording(self, row, curve_lod):
+        """Add one analyzed recording to the plot and the table"""
+        color = self.colors[len(self.recordings) % len(self.colors)]
+        recording = {'row': row, 'curve_lod': curve_lod, 'color': color, 'line': None, 'marker': None}
+        self.recordings.append(recording)
+        self._pending_tasks = [task for task in self._pending_tasks if task[0] != row['data_file']]
+
+        if curve_lod is not None:
+            label = os.path.basename(row['data_file'])
+            recording['line'], = self.ax.plot([], [], color=color, linewidth=1, label=label)
+            if row['curve_impact_index'] is not None:
+                recording['marker'], = self.ax.plot([], [], 'o', color=color, markersize=6)
+            self._place_recording(recording)
+            if self.ax.get_autoscale_on():
+                self.ax.relim()
+                self.ax.autoscale_view()
+            self.show_curve_views()
+            self.canvas.draw_idle()
+
+        self._add_table_row(len(self.recordings) - 1, recording)
+
+    def _place_recording(self, recording):
+        """Put the full-range view of a curve and its impact marker on the axes"""
+        offset = self._offset(recording)
+        x, y = recording['curve_lod'].view(width=self.ax.bbox.width)
+        recording['line'].set_data(x - offset, y)
+        if recording['marker'] is not None:
+            index = recording['row']['curve_impact_index']
+            recording['marker'].set_data([recording['curve_lod'].x[index] - offset],
+                                         [recording['curve_lod'].y[index]])
+
+    def _add_table_row(self, index, recording):
+        row = recording['row']
+        values = (
+            os.path.basename(row['data_file']),
+            os.path.basename(row['cf1_file']) if row['cf1_file'] else '',
+            row['impact_time'],
+            row['brake_pulses'],
+            row['braking_distance'],
+            row['error'] or ''
+        )
+        self.table.setSortingEnabled(False)
+        table_row = self.table.rowCount()
+        self.table.insertRow(table_row)
+        for column, value in enumerate(values):
+            item = QTableWidgetItem()
+            if isinstance(value, float):
+                # Numeric sort, shown with two decimals
+                item.setData(Qt.DisplayRole, round(value, 3 if column == 2 else 2))
+            elif isinstance(value, int):
+                item.setData(Qt.DisplayRole, value)
+            else:
+                item.setText(value)
+            item.setData(Qt.UserRole, index)
+            self.table.setItem(table_row, column, item)
+        self.table.item(table_row, 0).setBackground(QColor.fromRgbF(*recording['color']))
+        self.table.setSortingEnabled(True)
+
+    def show_curve_views(self):
+        """Give every curve only the points needed for the visible x-range"""
+        x_min, x_max = sorted(self.ax.get_xlim())
+        width = self.ax.bbox.width
+        for recording in self.recordings:
+            if recording['line'] is None:
+                continue
+            offset = self._offset(recording)
+            x, y = recording['curve_lod'].view(x_min + offset, x_max + offset, width)
+            recording['line'].set_data(x - offset, y)
+
+    def redraw_curves(self):
+        """Re-place all curves after switching the time alignment"""
+        self._update_xlabel()
+        for recording in self.recordings:
+            if recording['line'] is not None:
+                self._place_recording(recording)
+        self.ax.set_autoscale_on(True)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.show_curve_views()
+        self.canvas.draw_idle()
+
+    def highlight_selection(self):
+        """Emphasize the curves of the selected table rows"""
+        selected = {item.data(Qt.UserRole) for item in self.table.selectedItems()}
+        for index, recording in enumerate(self.recordings):
+            if recording['line'] is None:
+                continue
+            emphasized = not selected or index in selected
+            recording['line'].set_linewidth(2.5 if selected and index in selected else 1)
+            recording['line'].set_alpha(1.0 if emphasized else 0.25)
+            if recording['marker'] is not None:
+                recording['marker'].set_alpha(1.0 if emphasized else 0.25)
+        self.canvas.draw_idle()
+
+    def closeEvent(self, event):
+        self.jobs.cancel()
+        self.jobs.wait()
+        super().closeEvent(event)
@@ -0,0 +1,217 @@
+"""
+Cached analysis pipeline for one recording.
+
+Every stage is computed on first use and kept until one of its inputs changes:
+
+    data ──────┬── time_axis ─────────────┬── curve
+               └── impact_analysis ─┐     │
+    threshold ──────────────────────┴── impact ──┬── braking
+    params ──────── distance_per_pulse ───┴──────┘
+    impact_index (manual) ───────────────────────┘
+
+Editing a CF1 parameter therefore only recomputes the distance per pulse, the speeds
+and the braking distance; the time axis and the impact detection are reused.
+The impact candidates (every impact event, not just the first) depend on the same inputs as impact.
+The displayed curve is the curve smoothed with the smoothing factor (see DataProcessor.smooth_curve),
+kept as its own stage so redraws and threshold changes do not smooth again.
+
+A pipeline is not thread-safe; background jobs compute on a copy(). restore() fills stages
+from an entry of the result store (result_store.py) instead of computing them.
+curve_title() is the plot title shared by the GUI and export.py.
+"""
+import numpy as np
+
+from data_processor import DataProcessor, ImpactAnalysis
+from instrument import span
+from recording import CurveParams
+
+# Stage -> inputs and stages it depends on
+DEPENDENCIES = {
+    'time_axis': ('data',),
+    'impact_analysis': ('data',),
+    'impact': ('impact_analysis', 'threshold'),
+    'candidates': ('impact_analysis', 'threshold'),
+    'distance_per_pulse': ('params',),
+    'curve': ('time_axis', 'distance_per_pulse'),
+    'smoothed_curve': ('curve', 'smoothing'),
+    'braking': ('time_axis', 'impact', 'distance_per_pulse', 'impact_index'),
+}
+
+
+def curve_title(cf1_params, braking=None, name=None):
+    """Plot title with the parameters and, if available, the impact point"""
+    title = (f'Brake Curve{f": {name}" if name else ""}\n'
+             f'P251: {cf1_params.get("P0251")} mm/s, '
+             f'P360: {cf1_params.get("P0360")} rpm, '
+             f'P361: {cf1_params.get("P0361")}, '
+             f'P544: {cf1_params.get("P0544")}')
+    if braking:
+        title += (f"\nImpact at {braking['impact_time']:.2f}s, "
+                  f"Braking Distance: {braking['braking_distance']:.2f}cm")
+    return title
+
+
+class AnalysisPipeline:
+    def __init__(self, data=None, cf1_params=None, threshold=2.0):
+        self._cache = {}
+        self.data = None
+        self.params = CurveParams()
+        self.threshold = threshold
+        self.impact_index = None  # Manual impact point overriding the detected one
+        self.smoothing = 0  # Smoothing factor of the displayed curve, 0 for none
+        if data is not None:
+            self.set_data(data)
+        if cf1_params is not None:
+            self.set_params(cf1_params)
+
+    def _invalidate(self, name):
+        """Drop everything computed from the given input or stage"""
+        for stage, inputs in DEPENDENCIES.items():
+            if name in inputs and stage in self._cache:
+                del self._cache[stage]
+                self._invalidate(stage)
+            elif name in inputs:
+                self._invalidate(stage)
+
+    def _get(self, stage, compute):
+        if stage not in self._cache:
+            with span(f'pipeline.{stage}'):
+                self._cache[stage] = compute()
+        return self._cache[stage]
+
+    def is_cached(self, stage):
+        return stage in self._cache
+
+    def copy(self):
+        """Independent pipeline with the same inputs, sharing the stages computed so far"""
+        other = AnalysisPipeline(threshold=self.threshold)
+        other.data = self.data
+        other.params = self.params.copy()
+        other.impact_index = self.impact_index
+        other.smoothing = self.smoothing
+        other._cache = dict(self._cache)
+        return other
+
+    def set_data(self, data):
+        """New DATA array: everything is recomputed on next use"""
+        self.data = None if data is None else np.asarray(data)
+        self.impact_index = None
+        self._invalidate('data')
+        self._invalidate('impact_index')
+
+    def set_params(self, cf1_params):
+        """New CF1 parameters; only the distance-dependent stages are dropped, and only on a change"""
+        params = CurveParams.from_mapping(cf1_params)
+        if params != self.params:
+            self.params = params
+            self._invalidate('params')
+
+    def set_threshold(self, threshold):
+        """New impact threshold; clears a manual impact point"""
+        if threshold != self.threshold or self.impact_index is not None:
+            self.threshold = threshold
+            self.impact_index = None
+            self._invalidate('threshold')
+            self._invalidate('impact_index')
+
+    def set_smoothing(self, smoothing):
+        """Smoothing factor of the displayed curve (0: none); the analysis is not affected"""
+        if smoothing != self.smoothing:
+            self.smoothing = smoothing
+            self._invalidate('smoothing')
+
+    def set_impact_index(self, index):
+        """Use a manually chosen impact point (curve index) instead of the detected one; None to reset"""
+        if index != self.impact_index:
+            self.impact_index = index
+            self._invalidate('impact_index')
+
+    def restore(self, stored):
+        """
+        Take the results of an earlier analysis of the same data, parameters and threshold
+        Args:
+            stored: Entry returned by ResultStore.get; stages it does not hold are computed on use
+        """
+        if stored['manual_impact_index'] is not None:
+            self.set_impact_index(stored['manual_impact_index'])
+        if stored['curve'] is not None:
+            self._cache['curve'] = stored['curve']
+        if stored['analyzed']:
+            self._cache['impact'] = stored['impact']
+            if self.impact_index is None:
+                braking = stored['braking']
+                if braking is not None:
+                    braking = dict(braking, non_zero_count=stored['non_zero_count'], manual=False)
+                self._cache['braking'] = braking
+
+    def time_axis(self):
+        """Tuple (t_seconds, time_points) of the DATA array"""
+        return self._get('time_axis', lambda: DataProcessor.time_axis(self.data))
+
+    def impact_analysis(self):
+        return self._get('impact_analysis', lambda: ImpactAnalysis(self.data))
+
+    def impact(self):
+        """Detected impact for the current threshold, in the format of calculate_impact_points"""
+        return self._get('impact', lambda: self.impact_analysis().result(self.threshold))
+
+    def candidates(self):
+        """All impact events for the current threshold, strongest first (see ImpactAnalysis.candidates)"""
+        return self._get('candidates', lambda: self.impact_analysis().candidates(self.threshold))
+
+    def distance_per_pulse(self):
+        return self._get('distance_per_pulse',
+                         lambda: DataProcessor.calculate_distance_per_pulse(self.params))
+
+    def curve(self):
+        """Curve data as returned by generate_brake_curve"""
+        return self._get('curve', self._compute_curve)
+
+    def _compute_curve(self):
+        distance_per_pulse = self.distance_per_pulse()
+        if self.data is None or len(self.data) == 0 or distance_per_pulse <= 0:
+            return {'x': np.array([]), 'y': np.array([])}
+        t_seconds, time_points = self.time_axis()
+        return {
+            'x': time_points,
+            'y': DataProcessor.speeds_from_seconds(t_seconds, distance_per_pulse)
+        }
+
+    def display_curve(self):
+        """Curve to draw: the smoothed curve when a smoothing factor is set, else the curve itself"""
+        if not self.smoothing:
+            return self.curve()
+        return self._get('smoothed_curve', lambda: DataProcessor.smooth_curve(self.curve(), self.smoothing))
+
+    def braking(self):
+        """
+        Braking result at the manual impact point, or else at the detected one
+        Returns: Dictionary from calculate_braking plus non_zero_count and manual, or None
+        """
+        return self._get('braking', self._compute_braking)
+
+    def _compute_braking(self):
+        if self.data is None or len(self.data) == 0:
+            return None
+        _, time_points = self.time_axis()
+        non_zero_count = np.count_nonzero(self.data)
+        distance_per_pulse = self.distance_per_pulse()
+
+        if self.impact_index is not None:
+            index = int(np.clip(self.impact_index, 0, len(time_points) - 1))
+            braking_pulses = non_zero_count - index
+            braking = {
+                'index': index,
+                'impact_time': time_points[index],
+                'braking_pulses': braking_pulses,
+                'braking_distance': braking_pulses * distance_per_pulse
+            }
+        else:
+            impact_data = self.impact()
+            if not impact_data:
+                return None
+            braking = DataProcessor.calculate_braking(time_points, impact_data['impact_index'],
+                                                      non_zero_count, distance_per_pulse)
+        braking['non_zero_count'] = non_zero_count
+        braking['manual'] = self.impact_index is not None
+        return braking
@@ -0,0 +1,143 @@
+"""
+Compact in-memory representation of recordings.
+
+A Recording keeps the filtered values of a DATA file in the smallest unsigned integer type that
+holds them (uint16 for ordinary recordings, uint32 for slow ones) instead of int64, and the time
+axis and speeds of the curve share one (2, n) float array, float64 by default or float32 to halve
+it. The float64 curve is identical to generate_brake_curve; braking results always use a float64
+time axis.
+
+CurveParams holds the four CF1 parameters of the curve in slots and can be used wherever a
+parameter dictionary is expected.
+"""
+from collections.abc import Mapping
+
+import numpy as np
+
+from data_processor import DataProcessor, KEY_PARAMETERS
+
+# Integer types tried for the values of a recording, smallest first
+COMPACT_DTYPES = (np.dtype(np.uint16), np.dtype(np.uint32))
+
+# Float types of the curve buffer
+CURVE_DTYPES = (np.dtype(np.float64), np.dtype(np.float32))
+
+
+def compact_array(values):
+    """
+    Values in the smallest type of COMPACT_DTYPES that holds them (int64 if none does)
+    Returns the input itself when it already has that type
+    """
+    values = np.asarray(values)
+    if values.size == 0 or values.dtype == COMPACT_DTYPES[0]:
+        # Nothing is smaller than the first type, so its arrays (e.g. cache memory maps) are not scanned
+        return values.astype(COMPACT_DTYPES[0], copy=False)
+    if values.dtype.kind in 'iu' and values.min() >= 0:
+        high = values.max()
+        for dtype in COMPACT_DTYPES:
+            if high <= np.iinfo(dtype).max:
+                return values.astype(dtype, copy=False)
+    return values.astype(np.int64, copy=False)
+
+
+class CurveParams(Mapping):
+    """P0251, P0360, P0361 and P0544 with dictionary-style access; missing parameters are 0"""
+    __slots__ = KEY_PARAMETERS
+
+    def __init__(self, P0251=0, P0360=0, P0361=0, P0544=0):
+        self.P0251 = P0251
+        self.P0360 = P0360
+        self.P0361 = P0361
+        self.P0544 = P0544
+
+    @classmethod
+    def from_mapping(cls, cf1_params):
+        """Key parameters of a CF1 parameter dictionary (or of another CurveParams)"""
+        return cls(*(cf1_params.get(key, 0) for key in KEY_PARAMETERS))
+
+    def __getitem__(self, key):
+        if key not in KEY_PARAMETERS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in KEY_PARAMETERS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(KEY_PARAMETERS)
+
+    def __len__(self):
+        return len(KEY_PARAMETERS)
+
+    def copy(self):
+        return CurveParams(*self.values())
+
+    def __repr__(self):
+        return f"CurveParams({', '.join(f'{key}={value!r}' for key, value in self.items())})"
+
+    def __reduce__(self):
+        return CurveParams, tuple(self.values())
+
+
+class Recording:
+    __slots__ = ('source', 'data', 'params', 'curve_dtype', '_curve')
+
+    def __init__(self, data, params=None, source=None, curve_dtype=np.float64):
+        """
+        Args:
+            data: Filtered time differences, e.g. from read_data_file or recording_cache.load_recording
+                  (stored with compact_array)
+            params: CF1 parameters (dictionary or CurveParams)
+            source: Path of the DATA file
+            curve_dtype: np.float64 or np.float32 for the curve buffer
+        """
+        curve_dtype = np.dtype(curve_dtype)
+        if curve_dtype not in CURVE_DTYPES:
+            raise ValueError(f"Unsupported curve type: {curve_dtype}")
+        self.source = source
+        self.data = compact_array(data)
+        self.params = CurveParams() if params is None else CurveParams.from_mapping(params)
+        self.curve_dtype = curve_dtype
+        self._curve = None
+
+    def distance_per_pulse(self):
+        return DataProcessor.calculate_distance_per_pulse(self.params)
+
+    def curve(self):
+        """
+        Curve in the format of generate_brake_curve: time points 'x' (s) and speeds 'y' (mm/s),
+        both rows of one buffer of curve_dtype; empty if the parameters give no distance per pulse
+        """
+        if self._curve is None:
+            self._curve = self._compute_curve()
+        return {'x': self._curve[0], 'y': self._curve[1]}
+
+    def _compute_curve(self):
+        distance_per_pulse = self.distance_per_pulse()
+        data = self.data
+        if distance_per_pulse <= 0 or len(data) == 0:
+            return np.empty((2, 0), dtype=self.curve_dtype)
+        buffer = np.empty((2, len(data)), dtype=self.curve_dtype)
+        t_seconds = data * 0.0125 / 1000
+        if self.curve_dtype == np.float64:
+            np.cumsum(t_seconds, out=buffer[0])
+        else:
+            # Summed in float64 like the reference time axis, then rounded once
+            buffer[0] = np.cumsum(t_seconds)
+        # Same formula as speeds_from_seconds, written straight into the buffer
+        buffer[1] = 0
+        np.divide(distance_per_pulse * 100, t_seconds, out=buffer[1], where=t_seconds > 0)
+        return buffer
+
+    def impact(self, threshold=2.0):
+        """Rule 2 impact detection, see calculate_impact_points"""
+        return DataProcessor.calculate_impact_points(self.data, threshold)
+
+    def braking(self, impact_data):
+        """Braking result (see calculate_braking) for an impact found by impact()"""
+        # A float64 time axis for the impact time, whatever curve_dtype is
+        _, time_points = DataProcessor.time_axis(self.data)
+        return DataProcessor.calculate_braking(time_points, impact_data['impact_index'],
+                                               impact_data['non_zero_count'], self.distance_per_pulse())
@@ -0,0 +1,139 @@
+"""
+Binary sidecar cache of parsed DATA recordings.
+
+The first load of a DATA file parses and filters it with read_data_file and writes the result
+to a small binary file; later loads memory-map that file instead of parsing the text again.
+A cache file records the size and modification time of its source and is ignored (and
+rewritten) as soon as they no longer match.
+
+Cache file layout (little-endian):
+    magic        8 bytes  b'BRKCACHE'
+    version      uint16
+    dtype        uint16   3 = uint16, 1 = uint32, 2 = int64: the smallest that holds the values,
+                          as chosen by recording.compact_array, so a mapped cache needs no conversion
+    reserved     uint32
+    count        uint64   number of values
+    source mtime int64    nanoseconds
+    source size  uint64   bytes
+    values       count * dtype, starting at byte 40
+"""
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from data_processor import DataProcessor
+from instrument import traced
+from recording import compact_array
+
+logger = logging.getLogger(__name__)
+
+CACHE_EXTENSION = '.bcache'
+CACHE_MAGIC = b'BRKCACHE'
+CACHE_VERSION = 2
+_HEADER = struct.Struct('<8sHHIQqQ')
+_DTYPES = {1: np.dtype('<u4'), 2: np.dtype('<i8'), 3: np.dtype('<u2')}
+
+
+def cache_path(data_file, cache_dir=None):
+    """
+    Cache file of a DATA file: next to it, or in cache_dir under a name derived from its full path
+    """
+    if cache_dir is None:
+        return data_file + CACHE_EXTENSION
+    source = os.path.abspath(data_file)
+    digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(source)}-{digest}{CACHE_EXTENSION}")
+
+
+def read_cache(cache_file, source_stat):
+    """
+    Memory-map the values of a cache file
+    Args:
+        cache_file: Path of the cache file
+        source_stat: os.stat result of the DATA file
+    Returns: Read-only array (a memory map for non-empty recordings), or None if the cache
+             file is missing, damaged or out of date
+    """
+    try:
+        with open(cache_file, 'rb') as f:
+            header = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+
+    magic, version, dtype_code, _, count, mtime_ns, size = _HEADER.unpack(header)
+    if magic != CACHE_MAGIC or version != CACHE_VERSION or dtype_code not in _DTYPES:
+        return None
+    if mtime_ns != source_stat.st_mtime_ns or size != source_stat.st_size:
+        return None
+
+    dtype = _DTYPES[dtype_code]
+    if os.path.getsize(cache_file) != _HEADER.size + count * dtype.itemsize:
+        return None
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(cache_file, dtype=dtype, mode='r', offset=_HEADER.size, shape=(count,))
+
+
+def write_cache(cache_file, source_stat, data):
+    """Write a cache file atomically (temporary file, then rename)"""
+    values = compact_array(data)
+    dtype_code = next(code for code, dtype in _DTYPES.items() if dtype == values.dtype.newbyteorder('<'))
+    values = values.astype(_DTYPES[dtype_code], copy=False)
+    header = _HEADER.pack(CACHE_MAGIC, CACHE_VERSION, dtype_code, 0, len(values),
+                          source_stat.st_mtime_ns, source_stat.st_size)
+
+    directory = os.path.dirname(os.path.abspath(cache_file))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=CACHE_EXTENSION + '.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(values.tobytes())
+        os.replace(temp_path, cache_file)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+@traced('load_recording')
+def load_recording(data_file, cache_dir=None, use_cache=True):
+    """
+    Filtered time differences of a DATA file, from its cache when it is up to date
+    Args:
+        data_file: Path of the DATA file
+        cache_dir: Directory for the cache files (default: next to the DATA file)
+        use_cache: Set to False to always parse the DATA file and leave the cache alone
+    Returns: Array of time differences (read-only memory map of the compact type when cached), or None on error
+    """
+    if not use_cache:
+        return DataProcessor.read_data_file(data_file)
+
+    try:
+        # Taken before parsing: a file changed while it is read leaves a cache that is already stale
+        source_stat = os.stat(data_file)
+    except OSError as e:
+        logger.error("Error reading DATA file: %s", e)
+        return None
+
+    cache_file = cache_path(data_file, cache_dir)
+    data = read_cache(cache_file, source_stat)
+    if data is not None:
+        logger.debug("Loaded %d values from %s", len(data), cache_file)
+        return data
+
+    data = DataProcessor.read_data_file(data_file)
+    if data is None:
+        return None
+    try:
+        write_cache(cache_file, source_stat, data)
+        logger.debug("Wrote %s", cache_file)
+    except OSError as e:
+        # Read-only archives, or a cache file still mapped elsewhere on Windows
+        logger.warning("Could not write cache file %s: %s", cache_file, e)
+    return data
@@ -0,0 +1,260 @@
+"""
+Persistent store of analysis results.
+
+Results are kept in an SQLite database, keyed by the content hash of the DATA file, the four
+CF1 parameters of the curve and the impact threshold. An entry holds the impact detection
+result, the braking result, the curve (when the analysis produced one) and a manual impact
+point chosen in the GUI. Entries are evicted least recently used first once the database holds
+more than max_bytes of results.
+
+Content hashes are remembered by path, size and modification time, so an unchanged file is not
+read again to find its entry. The store is best-effort: database errors are logged as warnings
+and make it behave as if it were empty.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from data_processor import KEY_PARAMETERS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.brake_curve', 'results.sqlite')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    content_hash TEXT NOT NULL,
+    p0251 REAL NOT NULL,
+    p0360 REAL NOT NULL,
+    p0361 REAL NOT NULL,
+    p0544 REAL NOT NULL,
+    threshold REAL NOT NULL,
+    analyzed INTEGER NOT NULL DEFAULT 0,  -- 0: only a manual impact point is stored
+    non_zero_count INTEGER,
+    distance_per_pulse REAL,
+    impact TEXT,                          -- JSON, result of calculate_impact_points
+    braking TEXT,                         -- JSON, result of calculate_braking
+    curve BLOB,                           -- float64 time points followed by float64 speeds
+    manual_impact_index INTEGER,
+    size INTEGER NOT NULL DEFAULT 0,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (content_hash, p0251, p0360, p0361, p0544, threshold)
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+"""
+
+# Failures that make the store behave as if it were empty
+_ERRORS = (sqlite3.Error, OSError)
+
+_KEY_COLUMNS = "content_hash, p0251, p0360, p0361, p0544, threshold"
+_KEY_CLAUSE = "content_hash = ? AND p0251 = ? AND p0360 = ? AND p0361 = ? AND p0544 = ? AND threshold = ?"
+
+
+def _json_value(value):
+    """JSON fallback for NumPy scalars"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _dumps(value):
+    return None if value is None else json.dumps(value, default=_json_value)
+
+
+def _loads(text):
+    return None if text is None else json.loads(text)
+
+
+class ResultStore:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            path: SQLite database file (created on first use)
+            max_bytes: Size limit of the stored results
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._ready = False
+
+    def _connect(self):
+        """New connection; one per operation, so the store can be used from any thread or process"""
+        if not self._ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._ready = True
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """Connection committed when the block ends and closed afterwards"""
+        connection = self._connect()
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _key(content_hash, params, threshold):
+        return (content_hash, *(float(params.get(key, 0)) for key in KEY_PARAMETERS), float(threshold))
+
+    def content_hash(self, data_file):
+        """Hash of the DATA file contents, or None if the file cannot be read"""
+        try:
+            path = os.path.abspath(data_file)
+            stat = os.stat(path)
+        except OSError as e:
+            logger.warning("Cannot hash %s: %s", data_file, e)
+            return None
+        try:
+            with self._transaction() as connection:
+                row = connection.execute("SELECT size, mtime_ns, content_hash FROM files WHERE path = ?",
+                                         (path,)).fetchone()
+        except _ERRORS as e:
+            logger.warning("Result store %s: %s", self.path, e)
+            row = None
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        except OSError as e:
+            logger.warning("Cannot hash %s: %s", data_file, e)
+            return None
+        content_hash = digest.hexdigest()
+        try:
+            with self._transaction() as connection:
+                connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                                   (path, stat.st_size, stat.st_mtime_ns, content_hash))
+        except _ERRORS as e:
+            logger.warning("Result store %s: %s", self.path, e)
+        return content_hash
+
+    def get(self, content_hash, params, threshold):
+        """
+        Stored entry for a recording, CF1 parameters and threshold
+        Returns: Dictionary with analyzed (False if only a manual impact point is stored), impact,
+                 braking, non_zero_count, distance_per_pulse, curve ({'x', 'y'} or None) and
+                 manual_impact_index; None if there is no entry
+        """
+        key = self._key(content_hash, params, threshold)
+        try:
+            with self._transaction() as connection:
+                row = connection.execute(
+                    "SELECT analyzed, impact, braking, non_zero_count, distance_per_pulse, curve, "
+                    f"manual_impact_index FROM results WHERE {_KEY_CLAUSE}", key).fetchone()
+                if row is None:
+                    return None
+                connection.execute(f"UPDATE results SET last_used = ? WHERE {_KEY_CLAUSE}", (time.time(), *key))
+        except _ERRORS as e:
+            logger.warning("Result store %s: %s", self.path, e)
+            return None
+
+        analyzed, impact, braking, non_zero_count, distance_per_pulse, curve, manual_impact_index = row
+        curve_data = None
+        if curve is not None:
+            values = np.frombuffer(curve, dtype='<f8').reshape(2, -1).astype(np.float64)
+            curve_data = {'x': values[0], 'y': values[1]}
+        return {
+            'analyzed': bool(analyzed),
+            'impact': _loads(impact),
+            'braking': _loads(braking),
+            'non_zero_count': non_zero_count,
+            'distance_per_pulse': distance_per_pulse,
+            'curve': curve_data,
+            'manual_impact_index': manual_impact_index
+        }
+
+    def put(self, content_hash, params, threshold, impact, braking, non_zero_count, distance_per_pulse,
+            curve_data=None):
+        """
+        Store the analysis of a recording; a stored curve or manual impact point is kept when
+        curve_data is None
+        Args:
+            impact: Result of calculate_impact_points, None if no impact was detected
+            braking: Result of calculate_braking at the detected impact point, or None
+            curve_data: Dictionary with float64 time points 'x' and speeds 'y', optional
+        """
+        key = self._key(content_hash, params, threshold)
+        curve = None
+        if curve_data is not None:
+            curve = np.concatenate((curve_data['x'], curve_data['y'])).astype('<f8').tobytes()
+        values = (_dumps(impact), _dumps(braking), int(non_zero_count), float(distance_per_pulse), curve)
+        try:
+            with self._transaction() as connection:
+                connection.execute(
+                    f"INSERT INTO results ({_KEY_COLUMNS}, analyzed, impact, braking, non_zero_count, "
+                    "distance_per_pulse, curve, last_used) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?) "
+                    f"ON CONFLICT ({_KEY_COLUMNS}) DO UPDATE SET analyzed = 1, impact = excluded.impact, "
+                    "braking = excluded.braking, non_zero_count = excluded.non_zero_count, "
+                    "distance_per_pulse = excluded.distance_per_pulse, curve = ifnull(excluded.curve, curve), "
+                    "last_used = excluded.last_used",
+                    (*key, *values, time.time()))
+                self._update_size(connection, key)
+                self._evict(connection)
+        except _ERRORS as e:
+            logger.warning("Result store %s: %s", self.path, e)
+
+    def set_manual_impact(self, content_hash, params, threshold, index):
+        """Remember a manually chosen impact point (curve index; None to go back to the detected one)"""
+        key = self._key(content_hash, params, threshold)
+        index = None if index is None else int(index)
+        try:
+            with self._transaction() as connection:
+                connection.execute(
+                    f"INSERT INTO results ({_KEY_COLUMNS}, manual_impact_index, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    f"ON CONFLICT ({_KEY_COLUMNS}) DO UPDATE SET "
+                    "manual_impact_index = excluded.manual_impact_index, last_used = excluded.last_used",
+                    (*key, index, time.time()))
+                self._update_size(connection, key)
+        except _ERRORS as e:
+            logger.warning("Result store %s: %s", self.path, e)
+
+    @staticmethod
+    def _update_size(connection, key):
+        connection.execute(
+            "UPDATE results SET size = 100 + ifnull(length(curve), 0) + ifnull(length(impact), 0) "
+            f"+ ifnull(length(braking), 0) WHERE {_KEY_CLAUSE}", key)
+
+    def _evict(self, connection):
+        """Delete least recently used entries until the results fit in max_bytes"""
+        total = connection.execute("SELECT ifnull(sum(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for rowid, size in connection.execute("SELECT rowid, size FROM results ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((rowid,))
+            total -= size
+        connection.executemany("DELETE FROM results WHERE rowid = ?", evicted)
+        logger.debug("Evicted %d results from %s", len(evicted), self.path)
+
+    def clear(self):
+        """Delete all stored results and file hashes"""
+        try:
+            with self._transaction() as connection:
+                connection.execute("DELETE FROM results")
+                connection.execute("DELETE FROM files")
+        except _ERRORS as e:
+            logger.warning("Result store %s: %s", self.path, e)
@@ -0,0 +1,120 @@
+"""
+DataFollower on DATA files appended in chunks against read_data_file on the finished file.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_processor  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+from follow import DataFollower  # noqa: E402
+
+BUNDLED_DATA = os.path.join(ROOT, '20231107022804.data')
+
+data_processor.set_quiet()
+
+
+def _random_values(seed, count=60, max_length=200):
+    """Random time differences around the 16 value prefix, with zeros and drops of more than 50"""
+    rng = np.random.default_rng(seed)
+    arrays = []
+    for _ in range(count):
+        n = int(rng.integers(0, max_length))
+        kind = rng.integers(4)
+        if kind == 0:
+            values = rng.integers(0, 300, size=n)                       # zeros and drops everywhere
+        elif kind == 1:
+            values = np.cumsum(rng.integers(0, 20, size=n)) + 300       # no stop
+        elif kind == 2:
+            values = np.cumsum(rng.integers(1, 20, size=n)) + 300
+            values[rng.integers(n + 1):] = 0                            # zero stop
+        else:
+            values = np.cumsum(rng.integers(1, 20, size=n)) + 300
+            values[rng.integers(n + 1):] -= 60                          # +50 drop
+        arrays.append(values.astype(np.int64))
+    return arrays
+
+
+EDGE_CASES = [
+    [],
+    [300] * 5,                                  # fewer than 16 values
+    [300] * 15 + [0],                           # zero inside the prefix
+    [300] * 10 + [200] + [300] * 10,            # drop inside the prefix is kept
+    [300] * 16 + [0] + [400] * 5,               # zero right after the prefix
+    [300] * 16 + [249] + [400] * 5,             # drop right after the prefix
+    [300] * 16 + [250] + [400] * 5,             # 50 below is not a drop
+    [12345, 678901] * 20,                       # long numbers to split
+]
+
+
+def _content(values, encoding, trailing_newline=True):
+    text = '\r\n'.join(['828'] + [str(v) for v in values] + (['0', ''] if trailing_newline else []))
+    content = text.encode(encoding)
+    return b'\xff\xfe' + content if encoding == 'utf-16-le' else content
+
+
+def _follow(path, content, sizes):
+    """Append content to path in chunks of the given sizes, polling after each chunk"""
+    path.write_bytes(b'')
+    follower = DataFollower(str(path))
+    start, i = 0, 0
+    with open(path, 'ab') as f:
+        while start < len(content):
+            size = sizes[i % len(sizes)]
+            f.write(content[start:start + size])
+            f.flush()
+            follower.poll()
+            start += size
+            i += 1
+    follower.poll(final=True)
+    return follower
+
+
+def _check(follower, path):
+    expected = DataProcessor.read_data_file(str(path))
+    assert np.array_equal(follower.data, expected) and len(follower.data) == len(expected)
+    impact = DataProcessor.calculate_impact_points(expected, follower.threshold)
+    result = follower.impact()
+    assert (result is None) == (impact is None)
+    if impact is not None:
+        assert result['impact_index'] == impact['impact_index']
+
+
+@pytest.mark.parametrize('encoding', ['utf-16-le', 'latin1'])
+@pytest.mark.parametrize('sizes', [(1,), (2,), (3,), (5, 1, 8), (64,)], ids=lambda sizes: '-'.join(map(str, sizes)))
+def test_edge_cases(tmp_path, encoding, sizes):
+    for i, values in enumerate(EDGE_CASES):
+        for trailing_newline in (True, False):
+            path = tmp_path / f'{i}-{trailing_newline}.data'
+            _check(_follow(path, _content(values, encoding, trailing_newline), sizes), path)
+
+
+@pytest.mark.parametrize('encoding', ['utf-16-le', 'latin1'])
+def test_random_chunks(tmp_path, encoding):
+    rng = np.random.default_rng(1)
+    for i, values in enumerate(_random_values(2)):
+        content = _content(values.tolist(), encoding, trailing_newline=bool(rng.integers(2)))
+        sizes = [int(size) for size in rng.integers(1, 40, size=8)]
+        path = tmp_path / f'{i}.data'
+        _check(_follow(path, content, sizes), path)
+
+
+def test_split_crlf(tmp_path):
+    content = _content([300] * 20, 'latin1')
+    cut = content.index(b'\r\n', 10) + 1     # between CR and LF
+    path = tmp_path / 'crlf.data'
+    _check(_follow(path, content, (cut, len(content))), path)
+
+
+def test_bundled_recording(tmp_path):
+    with open(BUNDLED_DATA, 'rb') as f:
+        content = f.read()
+    path = tmp_path / 'bundled.data'
+    _check(_follow(path, content, (4093, 1, 1000, 7)), path)
@@ -0,0 +1,97 @@
+"""
+ImpactAnalysis against calculate_impact_points over a threshold sweep, and the order of its candidates.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_processor  # noqa: E402
+from data_processor import DataProcessor, ImpactAnalysis, WINDOW_SIZE  # noqa: E402
+
+BUNDLED_DATA = os.path.join(ROOT, '20231107022804.data')
+THRESHOLDS = np.round(np.arange(-10, 101) * 0.1, 1)
+
+data_processor.set_quiet()
+
+
+def _random_arrays(seed, count=150, max_length=200):
+    """Filtered-like time differences: noisy, flat runs (zero divisors), steps and several impacts"""
+    rng = np.random.default_rng(seed)
+    arrays = []
+    for _ in range(count):
+        n = int(rng.integers(0, max_length))
+        kind = rng.integers(4)
+        if kind == 0:
+            values = rng.integers(1, 300, size=n)
+        elif kind == 1:
+            values = np.full(n, int(rng.integers(1, 500)))
+        elif kind == 2:
+            values = np.repeat(rng.integers(100, 400, size=n // 2 + 1), 2)[:n]
+        else:
+            steps = rng.integers(1, 3, size=n)
+            if n:
+                steps[rng.integers(n, size=3)] = 40
+            values = np.cumsum(steps) + 300
+        arrays.append(values.astype(np.int64))
+    return arrays
+
+
+ARRAYS = [
+    np.array([], dtype=np.int64),
+    np.array([300] * 5, dtype=np.int64),                 # fewer than 16 samples
+    np.array([300] * 40, dtype=np.int64),                # every divisor is zero
+    np.arange(300, 340, dtype=np.int64),                 # no impact
+] + _random_arrays(1) + [DataProcessor.read_data_file(BUNDLED_DATA)]
+
+
+def _same_impact(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return (a['impact_index'] == b['impact_index'] and a['non_zero_count'] == b['non_zero_count']
+            and a['threshold'] == b['threshold'] and a['debug_info'] == b['debug_info'])
+
+
+@pytest.mark.parametrize('values', ARRAYS, ids=lambda values: f'n{len(values)}')
+def test_result_sweep(values):
+    analysis = ImpactAnalysis(values)
+    _, indices = analysis.sweep(THRESHOLDS)
+    for threshold, index in zip(THRESHOLDS.tolist(), indices.tolist()):
+        expected = DataProcessor.calculate_impact_points(values, threshold)
+        assert _same_impact(analysis.result(threshold), expected)
+        assert index == (expected['impact_index'] if expected else -1)
+
+
+@pytest.mark.parametrize('gap', [0, 4, WINDOW_SIZE])
+@pytest.mark.parametrize('values', ARRAYS, ids=lambda values: f'n{len(values)}')
+def test_candidates_order(values, gap):
+    analysis = ImpactAnalysis(values)
+    for threshold in (0.5, 1.0, 2.0, 5.0):
+        candidates = analysis.candidates(threshold, gap)
+        hits = np.flatnonzero(analysis.third_largest > threshold).tolist()
+
+        # Every hit window belongs to exactly one event; events are more than gap windows apart
+        events = sorted(candidates, key=lambda candidate: candidate['first_window'])
+        assert sum(len([w for w in hits if c['first_window'] <= w <= c['last_window']]) for c in events) == len(hits)
+        for before, after in zip(events, events[1:]):
+            assert after['first_window'] - before['last_window'] > gap
+
+        # Strongest first, ties broken by the earlier event
+        assert [candidate['rank'] for candidate in candidates] == list(range(len(candidates)))
+        keys = [(-candidate['margin'], candidate['first_window']) for candidate in candidates]
+        assert keys == sorted(keys)
+        for candidate in candidates:
+            peak = candidate['peak_window']
+            assert candidate['first_window'] <= peak <= candidate['last_window']
+            assert candidate['margin'] == analysis.third_largest[peak] - threshold
+            assert candidate['impact_index'] == candidate['first_window'] + 13
+
+        # The earliest event is what calculate_impact_points reports
+        expected = DataProcessor.calculate_impact_points(values, threshold)
+        assert _same_impact(events[0] if events else None, expected)
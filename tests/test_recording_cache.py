@@ -0,0 +1,145 @@
+"""
+Invalidation of the binary DATA caches of recording_cache.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_processor  # noqa: E402
+import recording_cache  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+from recording_cache import CACHE_MAGIC, CACHE_VERSION, cache_path, load_recording, read_cache  # noqa: E402
+
+data_processor.set_quiet()
+
+
+def _write_data(path, values):
+    path.write_bytes('\r\n'.join(['828'] + [str(v) for v in values] + ['0', '']).encode('latin1'))
+    return str(path)
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """A DATA file with a cache written by a first load"""
+    path = _write_data(tmp_path / 'recording.data', range(300, 340))
+    load_recording(path)
+    assert read_cache(cache_path(path), os.stat(path)) is not None
+    return path
+
+
+def _header(cache_file):
+    with open(cache_file, 'rb') as f:
+        return recording_cache._HEADER.unpack(f.read(recording_cache._HEADER.size))
+
+
+def _patch_header(cache_file, **fields):
+    names = ('magic', 'version', 'dtype', 'reserved', 'count', 'mtime_ns', 'size')
+    header = dict(zip(names, _header(cache_file)))
+    header.update(fields)
+    with open(cache_file, 'r+b') as f:
+        f.write(recording_cache._HEADER.pack(*(header[name] for name in names)))
+
+
+def _check_reloaded(data_file):
+    """The stale cache is ignored, the DATA file parsed again and a valid cache written"""
+    cache_file = cache_path(data_file)
+    assert read_cache(cache_file, os.stat(data_file)) is None
+    data = load_recording(data_file)
+    expected = DataProcessor.read_data_file(data_file)
+    assert np.array_equal(data, expected)
+    cached = read_cache(cache_file, os.stat(data_file))
+    assert isinstance(cached, np.memmap) and np.array_equal(cached, expected)
+    del cached
+
+
+def test_valid_cache_is_mapped(data_file):
+    data = load_recording(data_file)
+    assert isinstance(data, np.memmap) and data.dtype == np.uint16
+    assert np.array_equal(data, DataProcessor.read_data_file(data_file))
+    magic, version, dtype_code, _, count, _, _ = _header(cache_path(data_file))
+    assert (magic, version, dtype_code, count) == (CACHE_MAGIC, CACHE_VERSION, 3, len(data))
+    del data
+
+
+def test_changed_mtime(data_file):
+    stat = os.stat(data_file)
+    os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    _check_reloaded(data_file)
+    assert _header(cache_path(data_file))[5] == os.stat(data_file).st_mtime_ns
+
+
+def test_changed_size(data_file):
+    stat = os.stat(data_file)
+    with open(data_file, 'ab') as f:
+        f.write(b'999\r\n')
+    # Same modification time: only the size tells the cache is out of date
+    os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    _check_reloaded(data_file)
+
+
+def test_bad_magic(data_file):
+    _patch_header(cache_path(data_file), magic=b'NOTCACHE')
+    _check_reloaded(data_file)
+
+
+@pytest.mark.parametrize('version', [CACHE_VERSION - 1, CACHE_VERSION + 1])
+def test_bad_version(data_file, version):
+    _patch_header(cache_path(data_file), version=version)
+    _check_reloaded(data_file)
+
+
+def test_bad_dtype(data_file):
+    _patch_header(cache_path(data_file), dtype=99)
+    _check_reloaded(data_file)
+
+
+@pytest.mark.parametrize('keep', [0, recording_cache._HEADER.size - 1, recording_cache._HEADER.size, -1])
+def test_truncated(data_file, keep):
+    cache_file = cache_path(data_file)
+    with open(cache_file, 'r+b') as f:
+        f.truncate(keep if keep >= 0 else os.path.getsize(cache_file) + keep)
+    _check_reloaded(data_file)
+
+
+def test_int64_fallback(tmp_path):
+    values = [5_000_000_000 + i for i in range(40)]
+    path = _write_data(tmp_path / 'large.data', values)
+    assert load_recording(path).dtype == np.int64
+    assert _header(cache_path(path))[2] == 2
+    data = load_recording(path)
+    assert isinstance(data, np.memmap) and data.dtype == np.int64
+    assert np.array_equal(data, DataProcessor.read_data_file(path))
+    del data
+
+
+def test_uint32_values(tmp_path):
+    path = _write_data(tmp_path / 'wide.data', [70_000 + i for i in range(40)])
+    load_recording(path)
+    data = load_recording(path)
+    assert _header(cache_path(path))[2] == 1 and data.dtype == np.uint32
+    assert np.array_equal(data, DataProcessor.read_data_file(path))
+    del data
+
+
+def test_empty_recording(tmp_path):
+    path = tmp_path / 'empty.data'
+    path.write_bytes(b'0\r\n')
+    path = str(path)
+    first = load_recording(path)
+    assert len(first) == 0 and len(load_recording(path)) == 0
+    assert _header(cache_path(path))[4] == 0
+
+
+def test_cache_dir(tmp_path, data_file):
+    cache_dir = str(tmp_path / 'cache')
+    load_recording(data_file, cache_dir)
+    cache_file = cache_path(data_file, cache_dir)
+    assert os.path.dirname(cache_file) == cache_dir
+    assert read_cache(cache_file, os.stat(data_file)) is not None
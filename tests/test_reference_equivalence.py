@@ -0,0 +1,110 @@
+"""
+The vectorized engines of DataProcessor against the kept reference implementations.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_processor  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+
+BUNDLED_DATA = os.path.join(ROOT, '20231107022804.data')
+THRESHOLDS = (-1.0, 0.5, 1.0, 2.0, 3.0, 10.0)
+
+data_processor.set_quiet()
+
+
+def _random_arrays(seed, count=300, max_length=120):
+    """Random time differences of all lengths, with zeros, flat runs (zero divisors) and drops"""
+    rng = np.random.default_rng(seed)
+    arrays = []
+    for _ in range(count):
+        n = int(rng.integers(0, max_length))
+        kind = rng.integers(4)
+        if kind == 0:
+            values = rng.integers(0, 300, size=n)
+        elif kind == 1:
+            values = np.full(n, int(rng.integers(1, 500)))
+        elif kind == 2:
+            values = np.repeat(rng.integers(100, 400, size=n // 2 + 1), 2)[:n]
+        else:
+            values = np.cumsum(rng.integers(0, 20, size=n)) + 300
+        arrays.append(values.astype(np.int64))
+    return arrays
+
+
+EDGE_CASES = [
+    np.array([], dtype=np.int64),
+    np.array([300] * 5, dtype=np.int64),                 # fewer than 16 samples
+    np.array([300] * 15 + [0], dtype=np.int64),
+    np.array([300] * 40, dtype=np.int64),                # every divisor is zero
+    np.array([300] * 20 + [0] + [900] * 20, dtype=np.int64),
+    np.array([300] * 20 + [200] + [300] * 5, dtype=np.int64),
+    np.arange(300, 340, dtype=np.int64),                 # no impact
+]
+
+
+def _same_impact(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return (a['impact_index'] == b['impact_index'] and a['non_zero_count'] == b['non_zero_count']
+            and a['debug_info'] == b['debug_info'])
+
+
+@pytest.fixture(params=[False, True], ids=['numpy', 'kernels'])
+def engine(request, monkeypatch):
+    """Run with the NumPy code and with the loops of the Numba kernels (uncompiled when Numba is missing)"""
+    if request.param:
+        monkeypatch.setattr(data_processor, '_jit_kernels', {
+            'filter_end': data_processor._filter_end_loop,
+            'first_impact_window': data_processor._first_impact_window_loop
+        })
+    monkeypatch.setattr(data_processor, '_jit', request.param)
+    return request.param
+
+
+def test_bundled_recording(engine):
+    reference = DataProcessor.read_data_file(BUNDLED_DATA, mode='reference')
+    data = DataProcessor.read_data_file(BUNDLED_DATA)
+    assert data.dtype == reference.dtype and np.array_equal(data, reference)
+    for threshold in THRESHOLDS:
+        assert _same_impact(DataProcessor.calculate_impact_points(data, threshold),
+                            DataProcessor.calculate_impact_points(reference, threshold, mode='reference'))
+
+
+@pytest.mark.parametrize('values', EDGE_CASES + _random_arrays(1), ids=lambda values: f'n{len(values)}')
+def test_filter_end(engine, values):
+    assert DataProcessor.filter_end(values) == len(DataProcessor._filter_reference(values.tolist()))
+
+
+@pytest.mark.parametrize('values', EDGE_CASES + _random_arrays(2), ids=lambda values: f'n{len(values)}')
+def test_calculate_impact_points(engine, values):
+    for threshold in THRESHOLDS:
+        assert _same_impact(DataProcessor.calculate_impact_points(values, threshold),
+                            DataProcessor.calculate_impact_points(values, threshold, mode='reference'))
+
+
+def test_no_impact():
+    values = np.arange(300, 340, dtype=np.int64)
+    assert DataProcessor.calculate_impact_points(values, 2.0) is None
+    assert DataProcessor.calculate_impact_points(values[:10], 2.0) is None
+
+
+@pytest.mark.parametrize('encoding', ['utf-16-le', 'latin1'])
+def test_read_data_file(engine, tmp_path, encoding):
+    for i, values in enumerate(EDGE_CASES + _random_arrays(3, count=50)):
+        path = tmp_path / f'{i}.data'
+        text = '\r\n'.join(['828'] + [str(v) for v in values.tolist()] + ['0', ''])
+        content = text.encode(encoding)
+        path.write_bytes(b'\xff\xfe' + content if encoding == 'utf-16-le' else content)
+
+        reference = DataProcessor.read_data_file(str(path), mode='reference')
+        data = DataProcessor.read_data_file(str(path))
+        assert np.array_equal(data, reference) and len(data) == len(reference)
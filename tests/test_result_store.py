@@ -0,0 +1,179 @@
+"""
+ResultStore on a temporary database: round trip, manual impact points and LRU eviction.
+
+Run with: python -m pytest tests
+"""
+import itertools
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import result_store  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+from result_store import ResultStore  # noqa: E402
+
+BUNDLED_DATA = os.path.join(ROOT, '20231107022804.data')
+PARAMS = {'P0251': 670, 'P0360': 1500, 'P0361': 4, 'P0544': 5017}
+CURVE_POINTS = 50
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / 'results.sqlite'))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing time.time() for the store, so last_used orders every operation"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(result_store.time, 'time', lambda: float(next(ticks)))
+
+
+def _analysis():
+    """impact, braking, non_zero_count, distance_per_pulse and curve of the bundled recording"""
+    data = DataProcessor.read_data_file(BUNDLED_DATA)
+    impact = DataProcessor.calculate_impact_points(data, 2.0)
+    braking = {'impact_time': 1.25, 'braking_distance': 12.5, 'brake_pulses': np.int64(40)}
+    curve = {'x': np.linspace(0, 1, CURVE_POINTS), 'y': np.linspace(700, 0, CURVE_POINTS)}
+    return impact, braking, impact['non_zero_count'], 0.3125, curve
+
+
+def test_put_get(store):
+    impact, braking, non_zero_count, distance_per_pulse, curve = _analysis()
+    store.put('abc', PARAMS, 2.0, impact, braking, non_zero_count, distance_per_pulse, curve)
+
+    entry = store.get('abc', PARAMS, 2.0)
+    assert entry['analyzed'] and entry['manual_impact_index'] is None
+    assert entry['impact']['impact_index'] == impact['impact_index']
+    assert entry['impact']['debug_info'] == impact['debug_info']
+    assert entry['braking'] == {'impact_time': 1.25, 'braking_distance': 12.5, 'brake_pulses': 40}
+    assert entry['non_zero_count'] == non_zero_count and entry['distance_per_pulse'] == distance_per_pulse
+    assert np.array_equal(entry['curve']['x'], curve['x']) and np.array_equal(entry['curve']['y'], curve['y'])
+
+    # Every part of the key counts
+    assert store.get('abd', PARAMS, 2.0) is None
+    assert store.get('abc', PARAMS, 2.5) is None
+    assert store.get('abc', dict(PARAMS, P0361=5), 2.0) is None
+    # Integer and float parameters are the same key
+    assert store.get('abc', {key: float(value) for key, value in PARAMS.items()}, 2.0) is not None
+
+
+def test_put_without_impact(store):
+    store.put('abc', PARAMS, 9.0, None, None, 123, 0.5)
+    entry = store.get('abc', PARAMS, 9.0)
+    assert entry['analyzed'] and entry['impact'] is None and entry['braking'] is None and entry['curve'] is None
+
+
+def test_put_keeps_curve(store):
+    impact, braking, non_zero_count, distance_per_pulse, curve = _analysis()
+    store.put('abc', PARAMS, 2.0, impact, braking, non_zero_count, distance_per_pulse, curve)
+    store.put('abc', PARAMS, 2.0, None, None, 7, 1.0)
+    entry = store.get('abc', PARAMS, 2.0)
+    assert entry['impact'] is None and entry['non_zero_count'] == 7
+    assert np.array_equal(entry['curve']['y'], curve['y'])
+
+
+def test_set_manual_impact(store):
+    # Before the analysis is stored: only the manual point
+    store.set_manual_impact('abc', PARAMS, 2.0, np.int64(42))
+    entry = store.get('abc', PARAMS, 2.0)
+    assert not entry['analyzed'] and entry['manual_impact_index'] == 42 and entry['impact'] is None
+
+    # Storing the analysis keeps the manual point, and the other way round
+    impact, braking, non_zero_count, distance_per_pulse, curve = _analysis()
+    store.put('abc', PARAMS, 2.0, impact, braking, non_zero_count, distance_per_pulse, curve)
+    entry = store.get('abc', PARAMS, 2.0)
+    assert entry['analyzed'] and entry['manual_impact_index'] == 42
+    store.set_manual_impact('abc', PARAMS, 2.0, 17)
+    entry = store.get('abc', PARAMS, 2.0)
+    assert entry['analyzed'] and entry['manual_impact_index'] == 17 and entry['curve'] is not None
+
+    # None goes back to the detected point; other thresholds are not affected
+    store.set_manual_impact('abc', PARAMS, 2.0, None)
+    assert store.get('abc', PARAMS, 2.0)['manual_impact_index'] is None
+    assert store.get('abc', PARAMS, 3.0) is None
+
+
+def _entry_size(store, content_hash):
+    with store._transaction() as connection:
+        return connection.execute("SELECT size FROM results WHERE content_hash = ?", (content_hash,)).fetchone()[0]
+
+
+def _stored(store):
+    with store._transaction() as connection:
+        return sorted(row[0] for row in connection.execute("SELECT content_hash FROM results"))
+
+
+def test_evict_least_recently_used(tmp_path, clock):
+    analysis = _analysis()
+    store = ResultStore(str(tmp_path / 'results.sqlite'))
+    store.put('0', PARAMS, 2.0, *analysis)
+    size = _entry_size(store, '0')
+    assert size == (100 + 16 * CURVE_POINTS + len(result_store._dumps(analysis[0]))
+                    + len(result_store._dumps(analysis[1])))
+
+    # Room for three entries
+    store = ResultStore(store.path, max_bytes=3 * size + size // 2)
+    store.put('1', PARAMS, 2.0, *analysis)
+    store.put('2', PARAMS, 2.0, *analysis)
+    assert _stored(store) == ['0', '1', '2']
+
+    # Reading entry 0 makes entry 1 the least recently used
+    assert store.get('0', PARAMS, 2.0) is not None
+    store.put('3', PARAMS, 2.0, *analysis)
+    assert _stored(store) == ['0', '2', '3']
+
+    # A manual impact point also counts as a use
+    store.set_manual_impact('2', PARAMS, 2.0, 5)
+    store.put('4', PARAMS, 2.0, *analysis)
+    assert _stored(store) == ['2', '3', '4']
+    assert store.get('2', PARAMS, 2.0)['manual_impact_index'] == 5
+
+
+def test_evict_several(tmp_path, clock):
+    analysis = _analysis()
+    store = ResultStore(str(tmp_path / 'results.sqlite'))
+    for content_hash in '01234':
+        store.put(content_hash, PARAMS, 2.0, *analysis)
+    size = _entry_size(store, '0')
+
+    # Lowering the limit evicts the oldest entries on the next put, down to the limit
+    store = ResultStore(store.path, max_bytes=2 * size)
+    store.put('5', PARAMS, 2.0, *analysis)
+    assert _stored(store) == ['4', '5']
+
+    # An entry larger than the limit is evicted right away
+    store = ResultStore(store.path, max_bytes=size // 2)
+    store.put('6', PARAMS, 2.0, *analysis)
+    assert _stored(store) == []
+
+
+def test_content_hash(tmp_path, store):
+    path = tmp_path / 'recording.data'
+    path.write_bytes(b'300\r\n301\r\n')
+    first = store.content_hash(str(path))
+    assert first == store.content_hash(str(path))
+    assert first == ResultStore(store.path).content_hash(str(path))
+
+    path.write_bytes(b'300\r\n302\r\n303\r\n')
+    assert store.content_hash(str(path)) not in (None, first)
+    assert store.content_hash(str(tmp_path / 'missing.data')) is None
+
+
+def test_clear(store):
+    store.put('abc', PARAMS, 2.0, None, None, 1, 1.0)
+    store.clear()
+    assert store.get('abc', PARAMS, 2.0) is None
+
+
+def test_unusable_database(tmp_path):
+    # A directory where the database file should be: the store behaves as if it were empty
+    store = ResultStore(str(tmp_path))
+    store.put('abc', PARAMS, 2.0, None, None, 1, 1.0)
+    store.set_manual_impact('abc', PARAMS, 2.0, 3)
+    assert store.get('abc', PARAMS, 2.0) is None
@@ -0,0 +1,119 @@
+"""
+StreamingImpactDetector against calculate_impact_points on the same streams.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_processor  # noqa: E402
+from data_processor import DataProcessor, StreamingImpactDetector  # noqa: E402
+
+BUNDLED_DATA = os.path.join(ROOT, '20231107022804.data')
+THRESHOLDS = (-1.0, 0.5, 2.0, 10.0)
+SHORT = StreamingImpactDetector.VECTORIZE_MIN // 2
+LONG = StreamingImpactDetector.VECTORIZE_MIN * 3
+
+data_processor.set_quiet()
+
+
+def _random_streams(seed, count=150, max_length=400):
+    """Random time differences with zeros, flat runs (zero divisors) and drops"""
+    rng = np.random.default_rng(seed)
+    streams = []
+    for _ in range(count):
+        n = int(rng.integers(0, max_length))
+        kind = rng.integers(4)
+        if kind == 0:
+            values = rng.integers(0, 300, size=n)
+        elif kind == 1:
+            values = np.full(n, int(rng.integers(1, 500)))
+        elif kind == 2:
+            values = np.repeat(rng.integers(100, 400, size=n // 2 + 1), 2)[:n]
+        else:
+            values = np.cumsum(rng.integers(1, 20, size=n)) + 300
+        streams.append(values.astype(np.int64))
+    return streams
+
+
+EDGE_CASES = [
+    np.array([], dtype=np.int64),
+    np.array([300] * 5, dtype=np.int64),                 # fewer than 16 samples
+    np.array([300, 100, 900, 20, 700] * 3, dtype=np.int64),
+    np.array([300] * 15 + [0], dtype=np.int64),
+    np.array([300] * 100 + [0] + [900, 20] * 60, dtype=np.int64),   # zero stop inside a long chunk
+    np.array([300] * 30 + [0] + [900, 20] * 10, dtype=np.int64),    # zero stop inside a short chunk
+    np.arange(300, 500, dtype=np.int64),                 # no impact
+    np.concatenate((np.arange(300, 330), 330 + 10 * np.arange(1, 30))).astype(np.int64),  # impact at 30
+]
+
+STREAMS = EDGE_CASES + _random_streams(1) + [DataProcessor.read_data_file(BUNDLED_DATA)]
+
+
+def _same_impact(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return (a['impact_index'] == b['impact_index'] and a['non_zero_count'] == b['non_zero_count']
+            and a['threshold'] == b['threshold'] and a['debug_info'] == b['debug_info'])
+
+
+def _chunks(values, sizes):
+    """Split values into consecutive chunks, cycling through sizes"""
+    chunks, start, i = [], 0, 0
+    while start < len(values):
+        size = sizes[i % len(sizes)]
+        chunks.append(values[start:start + size])
+        start += size
+        i += 1
+    return chunks
+
+
+def _stream(values, threshold, chunks=None):
+    detector = StreamingImpactDetector(threshold)
+    if chunks is None:
+        for sample in values.tolist():
+            detector.feed(sample)
+    else:
+        for chunk in chunks:
+            detector.feed_many(chunk)
+    assert detector.count == len(values)
+    return detector.result()
+
+
+@pytest.mark.parametrize('values', STREAMS, ids=lambda values: f'n{len(values)}')
+def test_feed(values):
+    for threshold in THRESHOLDS:
+        assert _same_impact(_stream(values, threshold), DataProcessor.calculate_impact_points(values, threshold))
+
+
+@pytest.mark.parametrize('sizes', [(1,), (SHORT,), (LONG,), (SHORT, LONG, 1), (LONG, 7, 100)],
+                         ids=lambda sizes: '-'.join(map(str, sizes)))
+@pytest.mark.parametrize('values', STREAMS, ids=lambda values: f'n{len(values)}')
+def test_feed_many(values, sizes):
+    for threshold in THRESHOLDS:
+        assert _same_impact(_stream(values, threshold, _chunks(values, sizes)),
+                            DataProcessor.calculate_impact_points(values, threshold))
+
+
+def test_feed_many_random_chunks():
+    rng = np.random.default_rng(2)
+    for values in _random_streams(3, count=100):
+        sizes = [int(size) for size in rng.integers(1, 2 * LONG, size=8)]
+        for threshold in THRESHOLDS:
+            assert _same_impact(_stream(values, threshold, _chunks(values, sizes)),
+                                DataProcessor.calculate_impact_points(values, threshold))
+
+
+def test_feed_returns_impact_once():
+    values = np.concatenate((np.arange(300, 330), 330 + 10 * np.arange(1, 30))).astype(np.int64)
+    expected = DataProcessor.calculate_impact_points(values, 2.0)
+    assert expected is not None
+    detector = StreamingImpactDetector(2.0)
+    hits = [index for index in map(detector.feed, values.tolist()) if index is not None]
+    assert hits == [expected['impact_index']] and detector.finished
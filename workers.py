@@ -0,0 +1,151 @@
+"""
+Background jobs for the GUI.
+
+Work such as reading a DATA file or computing a curve runs on a QThreadPool thread. Each job
+has a kind ('data', 'cf1', 'plot', ...); submitting a job cancels the running job of the same
+kind, and results of cancelled or superseded jobs are dropped instead of reaching the UI.
+Progress, results and errors come back to the GUI thread as Qt signals.
+
+A job function receives its Job as first argument. It may call job.report(percent),
+job.publish(value) to deliver a partial result before it ends, and job.check(), which raises
+JobCancelled once the job has been cancelled. Cancellation is cooperative: a job stops at its
+next check().
+"""
+import itertools
+import logging
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobSignals(QObject):
+    progress = pyqtSignal(object, int)
+    partial = pyqtSignal(object, object)
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, str)
+
+
+class Job(QRunnable):
+    def __init__(self, job_id, kind, fn, args):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.id = job_id
+        self.kind = kind
+        self.fn = fn
+        self.args = args
+        self.signals = JobSignals()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        """Raise JobCancelled if the job has been cancelled"""
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def report(self, percent):
+        """Report progress (0-100); also a cancellation point"""
+        self.check()
+        self.signals.progress.emit(self, int(percent))
+
+    def publish(self, value):
+        """Deliver a partial result; also a cancellation point"""
+        self.check()
+        self.signals.partial.emit(self, value)
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args)
+        except JobCancelled:
+            logger.debug("Job %d (%s) cancelled", self.id, self.kind)
+            self.signals.failed.emit(self, '')
+        except Exception as e:
+            logger.exception("Job %d (%s) failed", self.id, self.kind)
+            self.signals.failed.emit(self, str(e) or type(e).__name__)
+        else:
+            self.signals.finished.emit(self, result)
+
+
+class JobRunner(QObject):
+    """Runs at most one current job per kind and forwards only current results"""
+    progress = pyqtSignal(str, int)
+    partial = pyqtSignal(str, object)
+    finished = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, pool=None, parent=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self.current = {}     # kind -> Job whose result will be delivered
+        self._running = set()  # Keeps jobs (and their signal objects) alive until they end
+        self._ids = itertools.count(1)
+
+    def submit(self, kind, fn, *args):
+        """
+        Run fn(job, *args) on the thread pool, cancelling the current job of the same kind
+        Returns: Job id
+        """
+        self.cancel(kind)
+        job = Job(next(self._ids), kind, fn, args)
+        job.signals.progress.connect(self._on_progress)
+        job.signals.partial.connect(self._on_partial)
+        job.signals.finished.connect(self._on_finished)
+        job.signals.failed.connect(self._on_failed)
+        self.current[kind] = job
+        self._running.add(job)
+        self.pool.start(job)
+        return job.id
+
+    def cancel(self, kind=None):
+        """Cancel the current job of the given kind, or of every kind"""
+        kinds = list(self.current) if kind is None else [kind]
+        for name in kinds:
+            job = self.current.pop(name, None)
+            if job is not None:
+                job.cancel()
+
+    def is_busy(self, kind=None):
+        if kind is None:
+            return bool(self.current)
+        return kind in self.current
+
+    def wait(self, msecs=-1):
+        """Block until every started job has ended; their signals arrive with the next event processing"""
+        return self.pool.waitForDone(msecs)
+
+    def _is_current(self, job):
+        return self.current.get(job.kind) is job
+
+    def _on_progress(self, job, percent):
+        if self._is_current(job):
+            self.progress.emit(job.kind, percent)
+
+    def _on_partial(self, job, value):
+        if self._is_current(job):
+            self.partial.emit(job.kind, value)
+
+    def _on_finished(self, job, result):
+        self._running.discard(job)
+        if not self._is_current(job):
+            logger.debug("Dropping stale result of job %d (%s)", job.id, job.kind)
+            return
+        del self.current[job.kind]
+        self.finished.emit(job.kind, result)
+
+    def _on_failed(self, job, message):
+        self._running.discard(job)
+        if not self._is_current(job):
+            return
+        del self.current[job.kind]
+        self.failed.emit(job.kind, message)